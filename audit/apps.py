@@ -10,5 +10,6 @@ class AuditConfig(AppConfig):
     verbose_name = 'Sistema de Auditoria'
 
     def ready(self):
-        """Importa signals quando o app estiver pronto"""
-        import audit.signals  # noqa
+        """Registra os modelos auditados quando o app estiver pronto"""
+        from audit.signals import register_audited_models
+        register_audited_models()
@@ -0,0 +1,145 @@
+"""
+Modo em lote da auditoria para importações e operações em massa.
+
+Dentro de `bulk()`, os eventos gerados pelos signals (e por chamadas manuais a
+AuditService.log_event) não vão para a fila um a um: são agrupados por
+(event_type, model, action) em um documento-resumo, e todos os resumos são
+gravados com um único insert_many na saída do bloco.
+
+Uso:
+    from audit.bulk import bulk as audit_bulk
+
+    with audit_bulk('import_bidding_pdf'):
+        ...  # centenas de save()/create()
+
+Documento-resumo (um por model/ação):
+    {
+        "event_type": "crud", "action": "update", "model": "Material",
+        "object_id": null, "changes": {},
+        "metadata": {
+            "bulk": true, "label": "import_bidding_pdf", "count": 120,
+            "object_ids": ["1", "2", ...], "changed_fields": {"name": 118},
+            "started_at": ..., "finished_at": ...
+        }
+    }
+
+Os valores antigos/novos de cada campo não são mantidos no resumo, apenas
+quantas vezes cada campo mudou. Saves `raw` (loaddata) também são contados
+quando feitos dentro de um bloco bulk.
+"""
+import logging
+from contextlib import contextmanager
+from threading import local
+
+from decouple import config
+
+from audit.writer import get_audit_writer
+
+logger = logging.getLogger(__name__)
+
+# Limite de IDs guardados por documento-resumo
+AUDIT_BULK_MAX_IDS = config("AUDIT_BULK_MAX_IDS", default=1000, cast=int)
+
+_state = local()
+
+
+class BulkAuditCollector:
+    """Agrupa eventos de auditoria em documentos-resumo por model/ação."""
+
+    def __init__(self, label: str = None, max_ids: int = AUDIT_BULK_MAX_IDS):
+        self.label = label
+        self.max_ids = max_ids
+        self._summaries = {}
+        self.aborted = False
+
+    def add(self, log_entry: dict):
+        """Incorpora um evento ao resumo do seu model/ação."""
+        key = (log_entry.get("event_type"), log_entry.get("model"), log_entry.get("action"))
+        summary = self._summaries.get(key)
+        if summary is None:
+            summary = self._summaries[key] = self._new_summary(log_entry)
+
+        metadata = summary["metadata"]
+        metadata["count"] += 1
+        metadata["finished_at"] = log_entry["timestamp"]
+
+        object_id = log_entry.get("object_id")
+        if object_id is not None:
+            if len(metadata["object_ids"]) < self.max_ids:
+                metadata["object_ids"].append(object_id)
+            else:
+                metadata["object_ids_truncated"] = True
+
+        changed_fields = metadata["changed_fields"]
+        for field_name in log_entry.get("changes") or {}:
+            changed_fields[field_name] = changed_fields.get(field_name, 0) + 1
+
+    def documents(self) -> list:
+        """Retorna os documentos-resumo acumulados."""
+        documents = list(self._summaries.values())
+        if self.aborted:
+            for document in documents:
+                document["metadata"]["aborted"] = True
+        return documents
+
+    def flush(self):
+        """Grava todos os resumos com um único insert_many."""
+        documents = self.documents()
+        self._summaries = {}
+        if not documents:
+            return
+        get_audit_writer().write_batch(documents)
+        logger.debug(
+            f"Auditoria em lote ({self.label}): {len(documents)} resumos, "
+            f"{sum(d['metadata']['count'] for d in documents)} eventos"
+        )
+
+    def _new_summary(self, log_entry: dict) -> dict:
+        summary = {k: v for k, v in log_entry.items() if k not in ("object_id", "changes", "metadata")}
+        summary.update({
+            "object_id": None,
+            "changes": {},
+            "metadata": {
+                "bulk": True,
+                "label": self.label,
+                "count": 0,
+                "object_ids": [],
+                "changed_fields": {},
+                "started_at": log_entry["timestamp"],
+                "finished_at": log_entry["timestamp"],
+            },
+        })
+        return summary
+
+
+def get_bulk_collector():
+    """Retorna o coletor do bloco bulk ativo nesta thread, ou None."""
+    return getattr(_state, "collector", None)
+
+
+@contextmanager
+def bulk(label: str = None):
+    """
+    Agrupa os eventos de auditoria do bloco e grava os resumos na saída.
+
+    Blocos aninhados usam o coletor mais externo. Se o bloco terminar com
+    exceção, os resumos ainda são gravados, marcados com `aborted`.
+    """
+    current = get_bulk_collector()
+    if current is not None:
+        yield current
+        return
+
+    collector = BulkAuditCollector(label=label)
+    _state.collector = collector
+    try:
+        yield collector
+    except BaseException:
+        collector.aborted = True
+        raise
+    finally:
+        _state.collector = None
+        try:
+            collector.flush()
+        except Exception as e:
+            logger.error(f"Erro ao gravar auditoria em lote: {e}")
@@ -0,0 +1,98 @@
+"""
+Registro dos models auditados.
+
+Os receivers de post_save/post_delete são conectados apenas aos models
+registrados (sender=Model), então salvar um model não auditado não passa por
+nenhum receiver de auditoria. Cada model tem sua configuração:
+
+- include_fields: se informado, só esses campos entram no diff
+- exclude_fields: campos que nunca entram no diff (ex.: password)
+- sample_rate: fração (0..1) das criações/atualizações registradas;
+  exclusões são sempre registradas
+
+Uso:
+    from audit.registry import audit_registry
+
+    audit_registry.register(MeuModel, exclude_fields=['token'])
+"""
+import random
+from dataclasses import dataclass, field
+from typing import Optional
+
+from django.db.models.signals import post_delete, post_save
+
+from audit.tracking import install_snapshot
+
+
+@dataclass(frozen=True)
+class AuditOptions:
+    """Configuração de auditoria de um model."""
+    include_fields: Optional[frozenset] = None
+    exclude_fields: frozenset = field(default_factory=frozenset)
+    sample_rate: float = 1.0
+
+    def tracks(self, field_name: str) -> bool:
+        """Indica se o campo entra no diff."""
+        if field_name in self.exclude_fields:
+            return False
+        return self.include_fields is None or field_name in self.include_fields
+
+    def sampled(self) -> bool:
+        """Sorteia se o evento de criação/atualização deve ser registrado."""
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+
+class AuditRegistry:
+    """Mapa model -> AuditOptions, com os receivers conectados por sender."""
+
+    def __init__(self):
+        self._models = {}
+
+    def register(self, model, include_fields=None, exclude_fields=(), sample_rate=1.0):
+        """
+        Passa a auditar o model (idempotente: re-registrar só troca as opções).
+
+        Args:
+            model: Classe do model
+            include_fields: Lista de campos auditados (None = todos)
+            exclude_fields: Lista de campos ignorados no diff
+            sample_rate: Fração das criações/atualizações registradas
+        """
+        from audit.signals import log_create_update, log_delete
+
+        if not 0 <= sample_rate <= 1:
+            raise ValueError(f"sample_rate deve estar entre 0 e 1: {sample_rate}")
+
+        self._models[model] = AuditOptions(
+            include_fields=frozenset(include_fields) if include_fields is not None else None,
+            exclude_fields=frozenset(exclude_fields),
+            sample_rate=sample_rate,
+        )
+        install_snapshot(model)
+        post_save.connect(
+            log_create_update, sender=model, dispatch_uid=f'audit_save_{model._meta.label}'
+        )
+        post_delete.connect(
+            log_delete, sender=model, dispatch_uid=f'audit_delete_{model._meta.label}'
+        )
+
+    def unregister(self, model):
+        """Deixa de auditar o model."""
+        if self._models.pop(model, None) is None:
+            return
+        post_save.disconnect(sender=model, dispatch_uid=f'audit_save_{model._meta.label}')
+        post_delete.disconnect(sender=model, dispatch_uid=f'audit_delete_{model._meta.label}')
+
+    def get_options(self, model) -> Optional[AuditOptions]:
+        """Retorna a configuração do model ou None se não for auditado."""
+        return self._models.get(model)
+
+    def is_registered(self, model) -> bool:
+        return model in self._models
+
+    @property
+    def models(self) -> list:
+        return list(self._models)
+
+
+audit_registry = AuditRegistry()
@@ -2,7 +2,8 @@
 Serviço de auditoria para registrar eventos no MongoDB.
 """
 from datetime import datetime
-from audit.mongodb import MongoDBConnection
+from audit.bulk import get_bulk_collector
+from audit.writer import AUDIT_ASYNC, get_audit_writer
 import logging
 
 logger = logging.getLogger(__name__)
@@ -26,6 +27,10 @@ class AuditService:
     ):
         """
         Registra evento de auditoria no MongoDB.
+
+        O documento é montado na hora e entregue ao AuditLogWriter, que grava
+        em lote em segundo plano (ou imediatamente com AUDIT_ASYNC=False).
+        Dentro de audit.bulk.bulk(), é agregado ao resumo do model/ação.
         
         Args:
             event_type (str): Tipo do evento ('auth', 'crud', 'view')
@@ -38,11 +43,6 @@ class AuditService:
             metadata (dict): Dados adicionais
         """
         try:
-            mongo = MongoDBConnection()
-            if mongo.logs is None:
-                logger.warning("MongoDB não disponível, log não registrado")
-                return
-            
             # Monta documento de log
             log_entry = {
                 'event_type': event_type,
@@ -66,8 +66,15 @@ class AuditService:
                     'method': request.method
                 })
             
-            # Insere no MongoDB
-            mongo.logs.insert_one(log_entry)
+            # Enfileira para gravação em lote no MongoDB
+            collector = get_bulk_collector()
+            writer = get_audit_writer()
+            if collector is not None:
+                collector.add(log_entry)
+            elif AUDIT_ASYNC:
+                writer.enqueue(log_entry)
+            else:
+                writer.write_batch([log_entry])
             logger.debug(f"Audit log criado: {action} em {model_name} (ID: {object_id})")
             
         except Exception as e:
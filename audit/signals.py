@@ -1,9 +1,11 @@
 """
 Signals para auditoria automática de operações CRUD.
 """
-from django.db.models.signals import post_save, post_delete, pre_save
-from django.dispatch import receiver
+from django.apps import apps
+from audit.bulk import get_bulk_collector
+from audit.registry import audit_registry
 from audit.services import AuditService
+from audit.tracking import compute_changes, refresh_snapshot
 from threading import local
 import logging
 
@@ -23,96 +25,64 @@ def set_current_request(request):
     _thread_locals.request = request
 
 
-# Lista de modelos a auditar (TODOS os modelos do sistema)
-AUDITED_MODELS = [
+# Modelos auditados (app_label.Model) e suas opções de auditoria.
+# Para auditar um novo modelo, adicione-o aqui ou chame audit_registry.register.
+AUDITED_MODELS = {
     # Autenticação
-    'ProfessionalUser',
-    
+    'authenticate.ProfessionalUser': {'exclude_fields': ['password', 'last_login']},
+
     # Licitações e Fornecedores
-    'Bidding',
-    'Supplier',
-    'Contact',
-    'Material',
-    'BiddingMaterial',
-    'MaterialBidding',
-    
+    'bidding_procurement.Bidding': {},
+    'bidding_supplier.Supplier': {},
+    'bidding_supplier.Contact': {},
+    'bidding_procurement.Material': {},
+    'bidding_procurement.MaterialBidding': {},
+
     # Estrutura Organizacional
-    'Department',
-    'Position',
-    'Employee',
-    'Direction',
-    'Sector',
-    
+    'organizational_structure.Direction': {},
+    'organizational_structure.Sector': {},
+
     # Relatórios
-    'Report',
-    'Invoice',
-    'MaterialReport',
-    
-    # Adicionar novos modelos aqui conforme necessário
-]
+    'reports.Report': {},
+    'fiscal.Invoice': {},
+    'reports.MaterialReport': {},
+}
 
 
-@receiver(pre_save)
-def capture_old_values(sender, instance, **kwargs):
+def log_create_update(sender, instance, created, **kwargs):
     """
-    Captura valores antigos antes de salvar para comparação.
-    Executado antes de post_save.
+    Registra criação ou atualização de registros.
+
+    Conectado apenas aos models registrados em audit_registry.
     """
-    # Skip durante loaddata
-    if kwargs.get('raw', False):
+    # Skip durante loaddata (dentro de audit.bulk.bulk() é contado no resumo)
+    if kwargs.get('raw', False) and get_bulk_collector() is None:
         return
-    
-    if sender.__name__ not in AUDITED_MODELS:
-        return
-    
-    if instance.pk:
-        try:
-            old_instance = sender.objects.get(pk=instance.pk)
-            instance._old_values = {}
-            for field in instance._meta.fields:
-                instance._old_values[field.name] = getattr(old_instance, field.name, None)
-        except sender.DoesNotExist:
-            instance._old_values = {}
-    else:
-        instance._old_values = {}
 
+    options = audit_registry.get_options(sender)
+    if options is None:
+        return
 
-@receiver(post_save)
-def log_create_update(sender, instance, created, **kwargs):
-    """
-    Registra criação ou atualização de registros.
-    """
-    # Skip durante loaddata
-    if kwargs.get('raw', False):
+    update_fields = kwargs.get('update_fields')
+    if not created and update_fields and not any(options.tracks(f) for f in update_fields):
+        # save(update_fields=['last_login']) e afins: nada auditável mudou
+        refresh_snapshot(instance, update_fields=update_fields)
         return
-    
-    if sender.__name__ not in AUDITED_MODELS:
+
+    if not options.sampled():
+        refresh_snapshot(instance, update_fields=update_fields)
         return
-    
+
     request = get_current_request()
     user = request.user if request and hasattr(request, 'user') and request.user.is_authenticated else None
     
     action = 'create' if created else 'update'
     changes = {}
     
-    # Se foi atualização, captura as mudanças
-    if not created and hasattr(instance, '_old_values'):
-        for field_name, old_value in instance._old_values.items():
-            new_value = getattr(instance, field_name, None)
-            
-            # Ignora campos internos e timestamps automáticos
-            if field_name.startswith('_') or field_name in ['created_at', 'updated_at']:
-                continue
-            
-            # Converte para string para comparação
-            old_str = str(old_value) if old_value is not None else None
-            new_str = str(new_value) if new_value is not None else None
-            
-            if old_str != new_str:
-                changes[field_name] = {
-                    'old': old_str,
-                    'new': new_str
-                }
+    # Se foi atualização, compara com o snapshot carregado do banco (sem SELECT extra)
+    if not created:
+        changes = compute_changes(instance, update_fields=update_fields, options=options)
+    refresh_snapshot(instance, update_fields=update_fields)
     
     # Registra log
     AuditService.log_event(
@@ -126,12 +96,13 @@ def log_create_update(sender, instance, created, **kwargs):
     )
 
 
-@receiver(post_delete)
 def log_delete(sender, instance, **kwargs):
     """
     Registra exclusão de registros.
+
+    Conectado apenas aos models registrados em audit_registry.
     """
-    if sender.__name__ not in AUDITED_MODELS:
+    if not audit_registry.is_registered(sender):
         return
     
     request = get_current_request()
@@ -147,3 +118,14 @@ def log_delete(sender, instance, **kwargs):
         request=request,
         metadata={'deleted_object': str(instance)}
     )
+
+
+def register_audited_models():
+    """Registra os modelos de AUDITED_MODELS (chamado no AuditConfig.ready)."""
+    for label, options in AUDITED_MODELS.items():
+        try:
+            model = apps.get_model(label)
+        except LookupError:
+            logger.warning(f"Modelo auditado não encontrado: {label}")
+            continue
+        audit_registry.register(model, **options)
@@ -0,0 +1,105 @@
+"""
+Rastreamento de alterações sem consulta extra ao banco.
+
+Cada instância de um model auditado guarda em `_audit_snapshot` os valores
+(por attname) com que foi carregada do banco (from_db). O diff de uma
+atualização é calculado comparando a instância com esse snapshot, em vez de
+buscar o registro novamente no pre_save.
+"""
+# Campos que nunca entram no diff (além dos auto_now/auto_now_add)
+IGNORED_FIELDS = {'created_at', 'updated_at'}
+
+
+def install_snapshot(model):
+    """
+    Sobrescreve from_db e refresh_from_db do model para manter o snapshot.
+
+    Idempotente: chamar duas vezes para o mesmo model não empilha wrappers.
+    """
+    if model.__dict__.get('_audit_tracked'):
+        return
+
+    original_from_db = model.from_db.__func__
+    original_refresh = model.refresh_from_db
+
+    def from_db(cls, db, field_names, values):
+        instance = original_from_db(cls, db, field_names, values)
+        instance._audit_snapshot = dict(zip(field_names, values))
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        original_refresh(self, using=using, fields=fields, **kwargs)
+        refresh_snapshot(self, update_fields=fields)
+
+    model.from_db = classmethod(from_db)
+    model.refresh_from_db = refresh_from_db
+    model._audit_tracked = True
+
+
+def compute_changes(instance, update_fields=None, options=None) -> dict:
+    """
+    Calcula as mudanças da instância em relação ao snapshot carregado.
+
+    Args:
+        instance: Instância sendo salva
+        update_fields: Se informado (save(update_fields=...)), só esses campos
+        options: AuditOptions do model (campos incluídos/excluídos)
+
+    Returns:
+        Dict {campo: {'old': str, 'new': str}} com os campos alterados.
+        Chaves estrangeiras entram pelo attname com os ids crus
+        ({'supplier_id': {'old': 3, 'new': 7}}): o texto do objeto
+        relacionado exigiria uma consulta por FK.
+    """
+    snapshot = getattr(instance, '_audit_snapshot', None)
+    if not snapshot:
+        return {}
+
+    changes = {}
+    for field in _diff_fields(instance, update_fields):
+        if options is not None and not options.tracks(field.name):
+            continue
+        if field.attname not in snapshot or field.attname not in instance.__dict__:
+            continue  # campo adiado (only/defer) em um dos lados
+
+        old_value = snapshot[field.attname]
+        new_value = instance.__dict__[field.attname]
+
+        if field.is_relation:
+            if old_value != new_value:
+                changes[field.attname] = {'old': old_value, 'new': new_value}
+            continue
+
+        # Converte para string para comparação
+        old_str = str(old_value) if old_value is not None else None
+        new_str = str(new_value) if new_value is not None else None
+
+        if old_str != new_str:
+            changes[field.name] = {
+                'old': old_str,
+                'new': new_str
+            }
+    return changes
+
+
+def _diff_fields(instance, update_fields):
+    for field in instance._meta.concrete_fields:
+        if field.name in IGNORED_FIELDS or field.name.startswith('_'):
+            continue
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+            continue
+        if update_fields is not None and field.name not in update_fields and field.attname not in update_fields:
+            continue
+        yield field
+
+
+def refresh_snapshot(instance, update_fields=None):
+    """Após salvar, o estado atual passa a ser a base do próximo diff."""
+    snapshot = getattr(instance, '_audit_snapshot', None)
+    if snapshot is None:
+        snapshot = instance._audit_snapshot = {}
+    for field in instance._meta.concrete_fields:
+        if update_fields is not None and field.name not in update_fields and field.attname not in update_fields:
+            continue
+        if field.attname in instance.__dict__:
+            snapshot[field.attname] = instance.__dict__[field.attname]
@@ -0,0 +1,240 @@
+"""
+Escrita assíncrona e em lote dos logs de auditoria no MongoDB.
+
+Os eventos entram em uma fila em memória (limitada) e uma thread em segundo
+plano os grava com insert_many quando o lote atinge AUDIT_BATCH_SIZE ou a
+cada AUDIT_FLUSH_INTERVAL segundos. Assim o tempo de resposta do MongoDB
+(até 2s de socketTimeoutMS) sai do caminho da requisição.
+
+- Fila cheia: o evento é descartado e contabilizado em `dropped`.
+- MongoDB fora do ar: o lote é gravado em AUDIT_SPILL_FILE (JSON lines) e
+  reenviado no próximo flush bem-sucedido.
+- Encerramento do processo: a fila é esvaziada via atexit.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import tempfile
+import threading
+from datetime import datetime
+
+from decouple import config
+
+from audit.mongodb import MongoDBConnection
+
+logger = logging.getLogger(__name__)
+
+AUDIT_ASYNC = config("AUDIT_ASYNC", default=True, cast=bool)
+AUDIT_QUEUE_MAX = config("AUDIT_QUEUE_MAX", default=1000, cast=int)
+AUDIT_BATCH_SIZE = config("AUDIT_BATCH_SIZE", default=50, cast=int)
+AUDIT_FLUSH_INTERVAL = config("AUDIT_FLUSH_INTERVAL", default=2.0, cast=float)
+AUDIT_SPILL_FILE = config(
+    "AUDIT_SPILL_FILE",
+    default=os.path.join(tempfile.gettempdir(), "sisinfo_audit_spill.jsonl"),
+)
+
+
+class AuditLogWriter:
+    """
+    Fila limitada com flusher em segundo plano para os logs de auditoria.
+
+    Uso:
+        writer = get_audit_writer()
+        writer.enqueue(log_entry)
+        writer.stats()  # {'depth': 0, 'dropped': 0, ...}
+    """
+
+    def __init__(
+        self,
+        maxsize: int = AUDIT_QUEUE_MAX,
+        batch_size: int = AUDIT_BATCH_SIZE,
+        flush_interval: float = AUDIT_FLUSH_INTERVAL,
+        spill_file: str = AUDIT_SPILL_FILE,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spill_file = spill_file
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._flush_lock = threading.Lock()
+        self._thread_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._stopped = False
+        self._counters = {
+            "enqueued": 0,
+            "written": 0,
+            "dropped": 0,
+            "spilled": 0,
+            "replayed": 0,
+            "discarded": 0,  # MongoDB não configurado
+        }
+
+    # --- API pública ---
+
+    def enqueue(self, log_entry: dict) -> bool:
+        """
+        Adiciona um evento à fila sem bloquear.
+
+        Returns:
+            False se a fila estava cheia e o evento foi descartado
+        """
+        try:
+            self._queue.put_nowait(log_entry)
+        except queue.Full:
+            self._count("dropped")
+            logger.warning("Fila de auditoria cheia, evento descartado")
+            return False
+
+        self._count("enqueued")
+        self._ensure_thread()
+        if self._queue.qsize() >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def flush(self):
+        """Grava imediatamente tudo o que está na fila."""
+        with self._flush_lock:
+            while True:
+                batch = self._drain(self.batch_size)
+                if not batch:
+                    break
+                self.write_batch(batch)
+
+    def write_batch(self, batch: list):
+        """Grava um lote com insert_many; em caso de falha, grava no arquivo de spill."""
+        if not batch:
+            return
+
+        mongo = MongoDBConnection()
+        if mongo.logs is None:
+            self._count("discarded", len(batch))
+            logger.warning("MongoDB não disponível, log não registrado")
+            return
+
+        try:
+            mongo.logs.insert_many(batch, ordered=False)
+        except Exception as e:
+            logger.error(f"Erro ao gravar {len(batch)} audit logs, salvando em {self.spill_file}: {e}")
+            self._spill(batch)
+            return
+
+        self._count("written", len(batch))
+        logger.debug(f"{len(batch)} audit logs gravados")
+        self._replay_spill(mongo)
+
+    def stats(self) -> dict:
+        """Retorna profundidade da fila e contadores do writer."""
+        with self._stats_lock:
+            stats = dict(self._counters)
+        stats["depth"] = self._queue.qsize()
+        return stats
+
+    def shutdown(self):
+        """Para o flusher e grava o que restou na fila (chamado no atexit)."""
+        self._stopped = True
+        self._wakeup.set()
+        self.flush()
+
+    # --- Internos ---
+
+    def _count(self, name: str, amount: int = 1):
+        with self._stats_lock:
+            self._counters[name] += amount
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._thread_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._run, name="audit-log-writer", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopped:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Erro no flusher de auditoria: {e}")
+
+    def _drain(self, limit: int) -> list:
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _spill(self, batch: list):
+        try:
+            with open(self.spill_file, "a", encoding="utf-8") as f:
+                for log_entry in batch:
+                    # insert_many já pode ter atribuído um _id antes de falhar
+                    log_entry = {k: v for k, v in log_entry.items() if k != "_id"}
+                    f.write(json.dumps(log_entry, default=_json_default) + "\n")
+            self._count("spilled", len(batch))
+        except OSError as e:
+            self._count("dropped", len(batch))
+            logger.error(f"Erro ao gravar spill de auditoria: {e}")
+
+    def _replay_spill(self, mongo):
+        """Reenvia os logs salvos em disco enquanto o MongoDB estava fora."""
+        if not os.path.exists(self.spill_file):
+            return
+
+        replay_file = f"{self.spill_file}.replay"
+        try:
+            os.replace(self.spill_file, replay_file)
+            with open(replay_file, encoding="utf-8") as f:
+                batch = [_restore_entry(json.loads(line)) for line in f if line.strip()]
+        except (OSError, ValueError) as e:
+            logger.error(f"Erro ao ler spill de auditoria: {e}")
+            return
+
+        try:
+            if batch:
+                mongo.logs.insert_many(batch, ordered=False)
+        except Exception as e:
+            logger.error(f"Erro ao reenviar spill de auditoria: {e}")
+            self._spill(batch)
+        else:
+            self._count("replayed", len(batch))
+            logger.info(f"{len(batch)} audit logs reenviados do spill")
+        finally:
+            os.remove(replay_file)
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    return str(value)
+
+
+def _restore_entry(log_entry: dict) -> dict:
+    timestamp = log_entry.get("timestamp")
+    if isinstance(timestamp, dict) and "$date" in timestamp:
+        log_entry["timestamp"] = datetime.fromisoformat(timestamp["$date"])
+    return log_entry
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_audit_writer() -> AuditLogWriter:
+    """Retorna o writer do processo (criado sob demanda e registrado no atexit)."""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = AuditLogWriter()
+                atexit.register(_writer.shutdown)
+    return _writer
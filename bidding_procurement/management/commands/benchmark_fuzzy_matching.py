@@ -0,0 +1,131 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from bidding_procurement.models import Material
+from bidding_procurement.utils.fuzzy_matcher import FuzzyIndex, FuzzyMatcher
+
+WORDS = [
+    'CIMENTO', 'PORTLAND', 'AREIA', 'MEDIA', 'LAVADA', 'BRITA', 'TIJOLO', 'CERAMICO', 'FURADO',
+    'TUBO', 'PVC', 'SOLDAVEL', 'ESGOTO', 'JOELHO', 'LUVA', 'REGISTRO', 'GAVETA', 'ESFERA',
+    'TINTA', 'ACRILICA', 'LATEX', 'BRANCA', 'FOSCA', 'CABO', 'FLEXIVEL', 'COBRE', 'DISJUNTOR',
+    'MONOPOLAR', 'BIPOLAR', 'LAMPADA', 'LED', 'TUBULAR', 'PARAFUSO', 'SEXTAVADO', 'ZINCADO',
+    'PREGO', 'CABECA', 'ARAME', 'RECOZIDO', 'TELHA', 'FIBROCIMENTO', 'CAIXA', 'DAGUA',
+    'POLIETILENO', 'FITA', 'ISOLANTE', 'VEDA', 'ROSCA', 'LIXA', 'MADEIRA', 'FERRO', 'GALVANIZADO',
+]
+UNITS = ['50KG', '25MM', '32MM', '1/2"', '3/4"', '18L', '3,6L', '2,5MM2', '6MM2', '100M', '9W', '20W']
+
+
+def _material_name(rng):
+    words = rng.sample(WORDS, rng.randint(2, 5))
+    return ' '.join(words + [rng.choice(UNITS)])
+
+
+def _typo(rng, name):
+    chars = list(name)
+    for _ in range(rng.randint(0, 3)):
+        i = rng.randrange(len(chars))
+        op = rng.randrange(3)
+        if op == 0:
+            chars.insert(i, rng.choice('ABCDEIOU '))
+        elif op == 1 and len(chars) > 1:
+            chars.pop(i)
+        else:
+            chars[i] = rng.choice('ABCDEIOU')
+    return ''.join(chars)
+
+
+class Command(BaseCommand):
+    help = 'Compara a busca fuzzy linear (FuzzyMatcher) com o FuzzyIndex em milhares de materiais'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--materials',
+            type=int,
+            default=10000,
+            help='Quantidade de nomes sintéticos no índice (padrão: 10000)'
+        )
+        parser.add_argument(
+            '--queries',
+            type=int,
+            default=50,
+            help='Quantidade de buscas (padrão: 50; a varredura linear leva ~1 s por busca em 10k nomes)'
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=0.9,
+            help='Similaridade mínima, como no import_bidding_pdf (padrão: 0.9)'
+        )
+        parser.add_argument(
+            '--from-db',
+            action='store_true',
+            help='Usa os nomes de Material do banco em vez de nomes sintéticos'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Semente dos dados sintéticos (padrão: 42)'
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        threshold = options['threshold']
+
+        if options['from_db']:
+            names = list(Material.objects.values_list('name', flat=True))
+        else:
+            names = [_material_name(rng) for _ in range(options['materials'])]
+        if not names:
+            self.stdout.write(self.style.ERROR("Nenhum material para indexar"))
+            return
+
+        # Metade das buscas são nomes existentes com erros de digitação,
+        # metade são materiais novos (o caso comum de uma importação)
+        queries = []
+        for i in range(options['queries']):
+            queries.append(_typo(rng, rng.choice(names)) if i % 2 == 0 else _material_name(rng))
+
+        self.stdout.write(
+            f"Benchmark de matching fuzzy: {len(names)} nomes, {len(queries)} buscas, threshold {threshold:.2f}\n"
+        )
+
+        start = time.perf_counter()
+        index = FuzzyIndex(names)
+        build_time = time.perf_counter() - start
+
+        matcher = FuzzyMatcher(threshold=threshold)
+        start = time.perf_counter()
+        linear = [matcher.find_similar(query, names) for query in queries]
+        linear_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        indexed = [index.search(query, threshold=threshold) for query in queries]
+        indexed_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        top3 = [index.search(query, threshold=threshold, limit=3) for query in queries]
+        top3_time = time.perf_counter() - start
+
+        mismatches = sum(1 for a, b in zip(linear, indexed) if a != b)
+        mismatches += sum(1 for a, b in zip(linear, top3) if a[:3] != b)
+        matched = sum(1 for result in linear if result)
+
+        self.stdout.write(f"{'método':<28} {'total (s)':>10} {'ms/busca':>10}")
+        for label, elapsed in (
+            ('FuzzyMatcher (linear)', linear_time),
+            ('FuzzyIndex', indexed_time),
+            ('FuzzyIndex (top 3)', top3_time),
+        ):
+            self.stdout.write(f"{label:<28} {elapsed:>10.2f} {elapsed / len(queries) * 1000:>10.2f}")
+        self.stdout.write(f"{'montagem do índice':<28} {build_time:>10.2f}")
+
+        self.stdout.write(f"\nBuscas com match: {matched}/{len(queries)}")
+        if indexed_time:
+            self.stdout.write(f"Ganho: {linear_time / indexed_time:.1f}x")
+        if mismatches:
+            self.stdout.write(self.style.ERROR(f"{mismatches} busca(s) com resultado diferente da varredura linear!"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Resultados idênticos à varredura linear"))
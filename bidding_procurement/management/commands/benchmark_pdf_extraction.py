@@ -0,0 +1,231 @@
+import os
+import pickle
+import random
+import sys
+import tempfile
+import time
+import traceback
+
+import pdfplumber
+from django.core.management.base import BaseCommand, CommandError
+
+from bidding_procurement.utils.pdf_extractor import BiddingPDFExtractor
+
+WORDS = [
+    'CIMENTO', 'PORTLAND', 'AREIA', 'MEDIA', 'LAVADA', 'BRITA', 'TIJOLO', 'CERAMICO', 'TUBO',
+    'PVC', 'SOLDAVEL', 'JOELHO', 'REGISTRO', 'TINTA', 'ACRILICA', 'CABO', 'FLEXIVEL', 'DISJUNTOR',
+    'LAMPADA', 'LED', 'PARAFUSO', 'ZINCADO', 'ARAME', 'TELHA', 'FITA', 'ISOLANTE', 'LIXA',
+]
+UNITS = ['UN', 'PC', 'CX', 'KG']
+LINES_PER_PAGE = 60
+
+
+def _pdf_string(text):
+    encoded = text.encode('cp1252')
+    return encoded.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+
+def write_synthetic_bidding_pdf(path, pages=500, seed=42, process_number=321):
+    """
+    Grava um PDF de licitação sintético no layout que o BiddingPDFExtractor
+    espera: cabeçalho na primeira página, um fornecedor novo a cada 10
+    páginas e linhas de materiais com código, unidade, quantidade e preços.
+
+    Returns:
+        Quantidade de linhas de materiais gravadas
+    """
+    rng = random.Random(seed)
+    page_lines = []
+    materials = 0
+    for number in range(pages):
+        lines = []
+        if number == 0:
+            lines += [
+                f'Proc. Administrativo : {process_number}    Nº Proc. Licitatório : 45/26',
+                'Modalidade : PREGÃO ELETRÔNICO Nº Modalidade Licit. : 12',
+                'Prazo de Validade : 31/12/2026',
+                'Objeto / Descrição : AQUISIÇÃO DE MATERIAIS DE CONSTRUÇÃO',
+            ]
+        if number % 10 == 0:
+            supplier = number // 10 + 1
+            lines.append(f'Fornecedor / Proponente : {supplier} - FORNECEDOR {supplier} LTDA')
+        while len(lines) < LINES_PER_PAGE:
+            materials += 1
+            code = f'{rng.randrange(1000):03d}.{rng.randrange(1000):03d}.{rng.randrange(1000):03d}'
+            name = ' '.join(rng.sample(WORDS, rng.randint(2, 4)))
+            quantity = rng.randint(1, 500)
+            cents = rng.randint(100, 99999)
+            total = cents * quantity
+            lines.append(
+                f'{materials} {code} {name} MARCA GENERICA {rng.choice(UNITS)} {quantity} '
+                f'{cents // 100},{cents % 100:02d} {total // 100},{total % 100:02d}'
+            )
+        lines.append(f'Fiorilli Software - Página {number + 1}')
+        page_lines.append(lines)
+
+    # Objetos: 1 catálogo, 2 árvore de páginas, 3 fonte, depois página e conteúdo de cada página
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        b'<< /Type /Pages /Kids [' + b' '.join(
+            f'{4 + 2 * i} 0 R'.encode() for i in range(pages)
+        ) + f'] /Count {pages} >>'.encode(),
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>',
+    ]
+    for i, lines in enumerate(page_lines):
+        stream = b'BT /F1 8 Tf 12 TL 20 820 Td ' + b' '.join(
+            b'(' + _pdf_string(line) + b') Tj T*' for line in lines
+        ) + b' ET'
+        objects.append(
+            f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] '
+            f'/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>'.encode()
+        )
+        objects.append(f'<< /Length {len(stream)} >>\nstream\n'.encode() + stream + b'\nendstream')
+
+    with open(path, 'wb') as f:
+        f.write(b'%PDF-1.4\n')
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(f.tell())
+            f.write(f'{number} 0 obj\n'.encode() + body + b'\nendobj\n')
+        xref = f.tell()
+        f.write(f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'.encode())
+        for offset in offsets:
+            f.write(f'{offset:010d} 00000 n \n'.encode())
+        f.write(f'trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n'.encode())
+    return materials
+
+
+def _legacy_text_passes(path, workers):
+    """
+    Leitura de texto do extrator antigo: duas passadas completas com +=, com
+    o cache de layout de todas as páginas mantido até o fim.
+    """
+    with pdfplumber.open(path) as pdf:
+        for _ in range(2):
+            full_text = ""
+            for page in pdf.pages:
+                page_text = page.extract_text()
+                if page_text:
+                    full_text += page_text + "\n"
+
+
+def _extract(path, workers):
+    return BiddingPDFExtractor(path, workers=workers).extract()
+
+
+def _measure(func, path, workers):
+    """
+    Executa func(path, workers) em um processo filho e retorna (segundos,
+    pico de RSS em KB, resultado). O pico vem do ru_maxrss do filho, que
+    inclui os objetos de layout do pdfminer/pdfplumber.
+
+    Raises:
+        RuntimeError: func falhou no filho (traceback na saída de erro)
+    """
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        # O filho nunca volta para o handle(): sai sempre por os._exit
+        code = 1
+        try:
+            os.close(read_fd)
+            start = time.perf_counter()
+            result = func(path, workers)
+            elapsed = time.perf_counter() - start
+            with os.fdopen(write_fd, 'wb') as pipe:
+                pickle.dump((elapsed, result), pipe)
+            code = 0
+        except BaseException:
+            traceback.print_exc()
+            sys.stderr.flush()
+        finally:
+            os._exit(code)
+
+    os.close(write_fd)
+    with os.fdopen(read_fd, 'rb') as pipe:
+        output = pipe.read()
+    _, status, usage = os.wait4(pid, 0)
+    if status != 0 or not output:
+        raise RuntimeError(f'processo de medição falhou ({func.__name__}, status {status})')
+    elapsed, result = pickle.loads(output)
+    return elapsed, usage.ru_maxrss, result
+
+
+class Command(BaseCommand):
+    help = 'Mede páginas/segundo do BiddingPDFExtractor em um PDF sintético (ou em um PDF informado)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pages',
+            type=int,
+            default=500,
+            help='Páginas do PDF sintético (padrão: 500)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Processos da extração paralela (padrão: número de CPUs)'
+        )
+        parser.add_argument(
+            '--file',
+            type=str,
+            help='Usa este PDF em vez do sintético'
+        )
+        parser.add_argument(
+            '--skip-legacy',
+            action='store_true',
+            help='Não mede a leitura antiga (duas passadas de texto)'
+        )
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as tmp:
+            if options['file']:
+                path = options['file']
+                if not os.path.exists(path):
+                    raise CommandError(f'Arquivo não encontrado: {path}')
+            else:
+                path = os.path.join(tmp, 'licitacao.pdf')
+                write_synthetic_bidding_pdf(path, pages=options['pages'])
+
+            with pdfplumber.open(path) as pdf:
+                pages = len(pdf.pages)
+            self.stdout.write(
+                f"Benchmark de extração: {pages} páginas, {os.path.getsize(path) / 1024:.0f} KB, "
+                f"{os.cpu_count()} CPU(s)\n"
+            )
+
+            plan = []
+            if not options['skip_legacy']:
+                plan.append(('legado (2 passadas)', _legacy_text_passes, 1))
+            plan.append(('uma passada', _extract, 1))
+            if options['workers'] > 1:
+                plan.append((f"uma passada, {options['workers']} processos", _extract, options['workers']))
+
+            runs = []
+            for label, func, workers in plan:
+                try:
+                    runs.append((label, *_measure(func, path, workers)))
+                except RuntimeError as e:
+                    self.stdout.write(self.style.ERROR(f"[ERRO] {label}: {e}"))
+
+        if not runs:
+            raise CommandError('Nenhuma medição concluída')
+
+        self.stdout.write(f"{'método':<28} {'tempo (s)':>10} {'páginas/s':>10} {'pico RSS':>10} {'materiais':>10}")
+        for label, elapsed, peak_kb, data in runs:
+            materials = len(data['materials']) if data else '-'
+            self.stdout.write(
+                f"{label:<28} {elapsed:>10.2f} {pages / elapsed:>10.1f} "
+                f"{peak_kb / 1024:>8.0f}MB {materials:>10}"
+            )
+        self.stdout.write(
+            "\n(pico RSS do processo principal; na extração paralela cada processo do pool lê só a sua faixa de páginas)"
+        )
+
+        results = [data for _, _, _, data in runs if data is not None]
+        if len(results) > 1:
+            if all(data == results[0] for data in results[1:]):
+                self.stdout.write(self.style.SUCCESS("Extração paralela idêntica à sequencial"))
+            else:
+                self.stdout.write(self.style.ERROR("Extração paralela diferente da sequencial!"))
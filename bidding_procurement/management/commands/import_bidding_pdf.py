@@ -1,13 +1,25 @@
 from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
+from audit.bulk import bulk as audit_bulk
 from bidding_procurement.models import Bidding, Material, MaterialBidding
 from bidding_supplier.models import Supplier
+from bidding_procurement.utils.bulk_write import (
+    get_or_create_materials, get_or_create_suppliers, rename_suppliers, upsert_material_biddings,
+)
 from bidding_procurement.utils.pdf_extractor import BiddingPDFExtractor
-from bidding_procurement.utils.fuzzy_matcher import find_similar_suppliers
+from bidding_procurement.utils.fuzzy_matcher import FuzzyIndex
+from core.cache import CachedLists
 from datetime import datetime
+from decimal import Decimal
 
 
 class Command(BaseCommand):
+    """
+    Importa uma licitação de PDF em etapas: extração, resolução de
+    fornecedores e materiais contra consultas carregadas uma vez (nomes
+    existentes + FuzzyIndex) e gravação em lote (bulk_create/bulk_update),
+    com a invalidação de cache de cada lista feita uma vez no fim.
+    """
     help = 'Importa licitação de um arquivo PDF'
 
     def add_arguments(self, parser):
@@ -45,7 +57,28 @@ class Command(BaseCommand):
             raise CommandError('Não foi possível identificar o processo administrativo no PDF')
         
         # Processar importação
-        with transaction.atomic():
+        self.import_data(data, interactive, auto_merge)
+    
+    def import_data(self, data, interactive=False, auto_merge=False) -> dict:
+        """
+        Grava os dados extraídos de um PDF em uma única transação.
+        
+        Usado também pelo import_bidding_pdfs (um PDF por vez, não interativo).
+        
+        Returns:
+            Relatório da importação: licitação criada/atualizada, contagens de
+            criados/atualizados e itens ambíguos (similares encontrados, mas
+            não usados automaticamente: no modo interativo seriam perguntados)
+        """
+        self.report = {
+            'administrative_process': data['administrative_process'],
+            'bidding': None,
+            'created': {'suppliers': 0, 'materials': 0, 'material_biddings': 0},
+            'updated': {'suppliers': 0, 'material_biddings': 0},
+            'ambiguous': [],
+            'skipped_materials': 0,
+        }
+        with CachedLists.deferred(), audit_bulk('import_bidding_pdf'), transaction.atomic():
             bidding = self._process_bidding(data, interactive)
             suppliers_map = self._process_suppliers(data, interactive, auto_merge)
             materials_created = self._process_materials(data, bidding, suppliers_map, interactive)
@@ -54,6 +87,7 @@ class Command(BaseCommand):
             self.stdout.write(f'✓ Licitação: {bidding.name}')
             self.stdout.write(f'✓ Fornecedores: {len(suppliers_map)} processados')
             self.stdout.write(f'✓ Materiais: {materials_created} vinculados')
+        return self.report
     
     def _process_bidding(self, data, interactive):
         """Cria ou atualiza licitação."""
@@ -65,6 +99,7 @@ class Command(BaseCommand):
             if interactive:
                 response = input('Atualizar dados? [S/n]: ')
                 if response.lower() == 'n':
+                    self.report['bidding'] = 'unchanged'
                     return bidding
             
             # Atualizar
@@ -75,6 +110,7 @@ class Command(BaseCommand):
             bidding.object_description = data['object_description']
             bidding.save()
             
+            self.report['bidding'] = 'updated'
             self.stdout.write(self.style.SUCCESS('✓ Licitação atualizada'))
             
         except Bidding.DoesNotExist:
@@ -90,12 +126,13 @@ class Command(BaseCommand):
                 status='1'
             )
             
+            self.report['bidding'] = 'created'
             self.stdout.write(self.style.SUCCESS(f'✓ Licitação criada: {bidding.name}'))
         
         return bidding
     
     def _process_suppliers(self, data, interactive, auto_merge):
-        """Processa fornecedores do PDF."""
+        """Resolve os fornecedores do PDF e grava as alterações em lote."""
         suppliers_map = {}  # Map: nome_fornecedor -> Supplier object
         
         if not data['suppliers']:
@@ -104,14 +141,23 @@ class Command(BaseCommand):
         
         self.stdout.write(f'\n=== PROCESSANDO FORNECEDORES ===')
         
-        # Obter fornecedores existentes
-        existing_suppliers = list(Supplier.objects.values_list('company', flat=True))
+        # Fornecedores existentes carregados e indexados uma vez para todas as buscas
+        existing = {s.company: s for s in Supplier.objects.only('id', 'company', 'trade', 'slug')}
+        supplier_index = FuzzyIndex(existing)
+        renames = []  # (Supplier existente, nome do PDF)
+        to_create = []  # nomes do PDF
         
         for supplier_name in data['suppliers']:
             self.stdout.write(f'\nFornecedor: {supplier_name}')
             
+            # Mesmo nome já cadastrado
+            if supplier_name.upper() in existing:
+                suppliers_map[supplier_name] = existing[supplier_name.upper()]
+                self.stdout.write(self.style.SUCCESS(f'  ✓ Usando fornecedor existente'))
+                continue
+            
             # Procurar similares
-            similar = find_similar_suppliers(supplier_name, existing_suppliers, threshold=0.8)
+            similar = supplier_index.search(supplier_name, threshold=0.8, limit=3)
             
             if similar:
                 self.stdout.write(self.style.WARNING(f'  Fornecedores similares encontrados:'))
@@ -121,26 +167,15 @@ class Command(BaseCommand):
                 if interactive:
                     response = input(f'  Usar fornecedor existente "{similar[0][0]}"? [S/n]: ')
                     if response.lower() != 'n':
-                        supplier = Supplier.objects.get(company=similar[0][0])
-                        # Atualizar nome para padronizar com PDF (apenas se diferente)
-                        if supplier.company != supplier_name:
-                            supplier.company = supplier_name
-                            supplier.save()
-                            self.stdout.write(self.style.SUCCESS(f'  ✓ Usando fornecedor existente (nome atualizado)'))
-                        else:
-                            self.stdout.write(self.style.SUCCESS(f'  ✓ Usando fornecedor existente'))
-                        suppliers_map[supplier_name] = supplier
+                        suppliers_map[supplier_name] = existing[similar[0][0]]
+                        # Atualizar nome para padronizar com PDF
+                        renames.append((existing[similar[0][0]], supplier_name))
+                        self.stdout.write(self.style.SUCCESS(f'  ✓ Usando fornecedor existente (nome atualizado)'))
                         continue
                 elif auto_merge and similar[0][1] >= 0.9:  # Auto-merge se >90% similar
-                    supplier = Supplier.objects.get(company=similar[0][0])
-                    # Atualizar nome para padronizar com PDF (apenas se diferente)
-                    if supplier.company != supplier_name:
-                        supplier.company = supplier_name
-                        supplier.save()
-                        self.stdout.write(self.style.SUCCESS(f'  ✓ Auto-merge: usando fornecedor existente (nome atualizado)'))
-                    else:
-                        self.stdout.write(self.style.SUCCESS(f'  ✓ Auto-merge: usando fornecedor existente'))
-                    suppliers_map[supplier_name] = supplier
+                    suppliers_map[supplier_name] = existing[similar[0][0]]
+                    renames.append((existing[similar[0][0]], supplier_name))
+                    self.stdout.write(self.style.SUCCESS(f'  ✓ Auto-merge: usando fornecedor existente (nome atualizado)'))
                     continue
             
             # Criar novo fornecedor
@@ -148,15 +183,23 @@ class Command(BaseCommand):
                 response = input(f'  Criar novo fornecedor "{supplier_name}"? [S/n]: ')
                 if response.lower() == 'n':
                     continue
+            elif similar:
+                self._add_ambiguous('supplier', supplier_name, similar)
             
-            supplier = Supplier.objects.create(company=supplier_name)
-            self.stdout.write(self.style.SUCCESS(f'  ✓ Fornecedor criado'))
-            suppliers_map[supplier_name] = supplier
+            to_create.append(supplier_name)
+            self.stdout.write(self.style.SUCCESS(f'  ✓ Fornecedor será criado'))
+        
+        # Gravação em lote
+        self.report['updated']['suppliers'] = rename_suppliers(renames)
+        created = get_or_create_suppliers(to_create)
+        self.report['created']['suppliers'] = len({name.upper() for name in to_create} - existing.keys())
+        for supplier_name in to_create:
+            suppliers_map[supplier_name] = created[supplier_name.upper()]
         
         return suppliers_map
     
     def _process_materials(self, data, bidding, suppliers_map, interactive):
-        """Processa materiais do PDF e cria MaterialBidding."""
+        """Resolve os materiais do PDF e cria/atualiza os MaterialBidding em lote."""
         if not data['materials']:
             self.stdout.write(self.style.WARNING('\n⚠ Nenhum material encontrado no PDF'))
             return 0
@@ -164,11 +207,13 @@ class Command(BaseCommand):
         self.stdout.write(f'\n=== PROCESSANDO MATERIAIS ===')
         self.stdout.write(f'Total de materiais: {len(data["materials"])}')
         
-        from bidding_procurement.utils.fuzzy_matcher import find_similar_materials
-        
-        materials_created = 0
-        existing_materials = list(Material.objects.values_list('name', flat=True))
+        # Materiais existentes carregados uma vez (nomes repetidos: o mais antigo)
+        existing = {}
+        for material in Material.objects.only('id', 'name').order_by('pk'):
+            existing.setdefault(material.name, material)
+        material_index = FuzzyIndex(existing)
         
+        resolved = []  # (Material existente ou nome a criar, dados do PDF, Supplier)
         for mat_data in data['materials']:
             description = mat_data['description']
             supplier_name = mat_data['supplier']
@@ -176,46 +221,53 @@ class Command(BaseCommand):
             # Verificar se fornecedor foi processado
             if supplier_name not in suppliers_map:
                 self.stdout.write(self.style.WARNING(f'  ⚠ Fornecedor não encontrado: {supplier_name}'))
+                self.report['skipped_materials'] += 1
                 continue
             
-            supplier = suppliers_map[supplier_name]
-            
             # Procurar material similar
-            similar = find_similar_materials(description, existing_materials, threshold=0.9)
+            similar = material_index.search(description, threshold=0.9, limit=1)
+            material = description
             
             if similar and interactive:
                 self.stdout.write(f'\nMaterial: {description[:60]}...')
                 self.stdout.write(f'  Similar encontrado: {similar[0][0]} ({similar[0][1]:.0%})')
                 response = input('  Usar material existente? [S/n]: ')
                 if response.lower() != 'n':
-                    material = Material.objects.get(name=similar[0][0])
-                else:
-                    material = Material.objects.create(name=description)
+                    material = existing[similar[0][0]]
             elif similar and similar[0][1] >= 0.95:  # Auto-merge se >95% similar
-                material = Material.objects.get(name=similar[0][0])
-            else:
-                # Criar novo material
-                material = Material.objects.create(name=description)
+                material = existing[similar[0][0]]
+            elif similar:
+                self._add_ambiguous('material', description, similar)
             
-            # Criar ou atualizar MaterialBidding
-            mat_bidding, created = MaterialBidding.objects.get_or_create(
+            resolved.append((material, mat_data, suppliers_map[supplier_name]))
+        
+        # Gravação em lote: materiais novos, depois os vínculos com a licitação
+        new_names = [material for material, _, _ in resolved if isinstance(material, str)]
+        created_materials = get_or_create_materials(new_names)
+        self.report['created']['materials'] = len({name.upper() for name in new_names} - existing.keys())
+        rows = []
+        for material, mat_data, supplier in resolved:
+            if isinstance(material, str):
+                material = created_materials[material.upper()]
+            rows.append(MaterialBidding(
                 material=material,
-                bidding=bidding,
-                defaults={
-                    'supplier': supplier,
-                    'price': mat_data['unit_price'],
-                    'quantity': mat_data['quantity'],
-                    'status': '1'
-                }
-            )
-            
-            if not created:
-                # Atualizar se já existe
-                mat_bidding.supplier = supplier
-                mat_bidding.price = mat_data['unit_price']
-                mat_bidding.quantity = mat_data['quantity']
-                mat_bidding.save()
-            
-            materials_created += 1
+                supplier=supplier,
+                price=Decimal(str(mat_data['unit_price'])),
+                quantity=mat_data['quantity'],
+                status='1',
+            ))
         
-        return materials_created
+        created, updated = upsert_material_biddings(bidding, rows)
+        self.report['created']['material_biddings'] = created
+        self.report['updated']['material_biddings'] = updated
+        self.stdout.write(f'  {created} vínculo(s) criado(s), {updated} atualizado(s)')
+        return created + updated
+    
+    def _add_ambiguous(self, kind, name, similar):
+        """Registra um item criado como novo apesar de ter similares."""
+        self.report['ambiguous'].append({
+            'kind': kind,
+            'name': name,
+            'action': 'created',
+            'candidates': [{'name': sim_name, 'score': round(score, 3)} for sim_name, score in similar],
+        })
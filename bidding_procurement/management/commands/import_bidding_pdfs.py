@@ -0,0 +1,161 @@
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from io import StringIO
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bidding_procurement.management.commands.import_bidding_pdf import Command as ImportBiddingPDFCommand
+from bidding_procurement.utils.pdf_extractor import extract_bidding_pdf
+
+
+class Command(BaseCommand):
+    """
+    Importa um lote de PDFs de licitação sem interação.
+
+    A extração (CPU) roda em um pool de processos, um PDF por processo; a
+    gravação fica no processo principal, que importa cada PDF assim que sua
+    extração termina, um de cada vez e cada um em sua própria transação
+    (import_bidding_pdf.Command.import_data). Um PDF com erro não interrompe
+    os demais.
+
+    Ao final é emitido um resumo JSON por arquivo: licitação criada ou
+    atualizada, criados/atualizados e itens ambíguos (similares encontrados,
+    mas não usados automaticamente: revisar após a carga).
+    """
+    help = 'Importa todos os PDFs de licitação de um diretório e emite um resumo JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', type=str, help='Diretório com os PDFs')
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Processos para a extração dos PDFs (padrão: número de CPUs)'
+        )
+        parser.add_argument(
+            '--auto-merge',
+            action='store_true',
+            help='Mescla fornecedores com similaridade >= 90%% (como no import_bidding_pdf)'
+        )
+        parser.add_argument(
+            '--recursive',
+            action='store_true',
+            help='Inclui os PDFs dos subdiretórios'
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            help='Grava o resumo JSON neste arquivo (padrão: saída padrão, com o progresso na saída de erro)'
+        )
+
+    def handle(self, *args, **options):
+        directory = Path(options['directory'])
+        if not directory.is_dir():
+            raise CommandError(f'Diretório não encontrado: {directory}')
+
+        pattern = '**/*' if options['recursive'] else '*'
+        files = sorted(p for p in directory.glob(pattern) if p.is_file() and p.suffix.lower() == '.pdf')
+        if not files:
+            raise CommandError(f'Nenhum PDF encontrado em {directory}')
+
+        # Com o JSON na saída padrão, o progresso vai para a saída de erro
+        log = self.stdout if options['output'] else self.stderr
+        workers = max(1, min(options['workers'], len(files)))
+        log.write(f'Importando {len(files)} PDF(s) de {directory} ({workers} processo(s) de extração)')
+
+        start = time.perf_counter()
+        results = []
+        # spawn: os processos de extração não herdam conexões do banco nem as
+        # threads do processo principal (ex.: writer da auditoria)
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            futures = {pool.submit(extract_bidding_pdf, str(path)): path for path in files}
+            for future in as_completed(futures):
+                path = futures[future]
+                entry = self._import(path, future, options['auto_merge'], options['verbosity'], log)
+                results.append(entry)
+
+        results.sort(key=lambda entry: entry['file'])
+        summary = {
+            'directory': str(directory),
+            'elapsed_seconds': round(time.perf_counter() - start, 2),
+            'totals': self._totals(results),
+            'files': results,
+        }
+        output = json.dumps(summary, ensure_ascii=False, indent=2)
+
+        if options['output']:
+            Path(options['output']).write_text(output + '\n', encoding='utf-8')
+            totals = summary['totals']
+            style = self.style.SUCCESS if not totals['errors'] else self.style.WARNING
+            log.write(style(
+                f"\n{totals['imported']} importado(s), {totals['errors']} com erro, "
+                f"{totals['ambiguous']} item(ns) ambíguo(s). Resumo em {options['output']}"
+            ))
+        else:
+            self.stdout.write(output)
+
+    def _import(self, path, future, auto_merge, verbosity, log) -> dict:
+        """Importa um PDF já extraído; devolve a entrada do resumo."""
+        entry = {'file': str(path), 'status': 'ok'}
+
+        try:
+            data = future.result()
+        except Exception as e:
+            log.write(self.style.ERROR(f'✗ {path.name}: erro ao extrair PDF: {e}'))
+            return {**entry, 'status': 'error', 'stage': 'extract', 'error': str(e)}
+
+        entry['materials_in_pdf'] = len(data['materials'])
+        if not data['administrative_process']:
+            log.write(self.style.ERROR(f'✗ {path.name}: processo administrativo não identificado'))
+            return {**entry, 'status': 'error', 'stage': 'extract',
+                    'error': 'Não foi possível identificar o processo administrativo no PDF'}
+
+        importer_output = StringIO()
+        importer = ImportBiddingPDFCommand(stdout=importer_output)
+        try:
+            entry.update(importer.import_data(data, auto_merge=auto_merge))
+        except Exception as e:
+            log.write(self.style.ERROR(f'✗ {path.name}: erro ao importar ({e}); nada gravado deste arquivo'))
+            return {**entry, 'status': 'error', 'stage': 'import', 'error': str(e)}
+        finally:
+            if verbosity > 1:
+                log.write(importer_output.getvalue())
+
+        log.write(self.style.SUCCESS(
+            f"✓ {path.name}: licitação {data['administrative_process']} ({entry['bidding']}), "
+            f"{entry['created']['material_biddings']} vínculo(s) criado(s), "
+            f"{entry['updated']['material_biddings']} atualizado(s), {len(entry['ambiguous'])} ambíguo(s)"
+        ))
+        return entry
+
+    @staticmethod
+    def _totals(results) -> dict:
+        """Soma as contagens dos arquivos importados."""
+        totals = {
+            'files': len(results),
+            'imported': 0,
+            'errors': 0,
+            'biddings': {'created': 0, 'updated': 0},
+            'created': {'suppliers': 0, 'materials': 0, 'material_biddings': 0},
+            'updated': {'suppliers': 0, 'material_biddings': 0},
+            'ambiguous': 0,
+            'skipped_materials': 0,
+        }
+        for entry in results:
+            if entry['status'] != 'ok':
+                totals['errors'] += 1
+                continue
+            totals['imported'] += 1
+            if entry['bidding'] in totals['biddings']:
+                totals['biddings'][entry['bidding']] += 1
+            for group in ('created', 'updated'):
+                for key, value in entry[group].items():
+                    totals[group][key] += value
+            totals['ambiguous'] += len(entry['ambiguous'])
+            totals['skipped_materials'] += entry['skipped_materials']
+        return totals
@@ -0,0 +1,32 @@
+from django.db import models
+from django.db.models import BooleanField, Case, ExpressionWrapper, F, Q, Value, When
+from django.db.models.functions import Greatest
+
+
+class MaterialBiddingQuerySet(models.QuerySet):
+    def with_usage(self):
+        """
+        Anota o uso do limite de compra, calculado no banco:
+
+        - usage_permille: uso em décimos de percentual (625 = 62,5%),
+          arredondado; aritmética inteira, igual no PostgreSQL e no SQLite
+        - available_qty: quantidade ainda disponível para compra
+        - near_limit_flag / at_limit_flag: >= 80% usado / limite atingido
+
+        As propriedades usage_percentage, available_for_purchase,
+        is_near_limit e is_at_limit usam essas anotações quando presentes.
+        """
+        return self.annotate(
+            usage_permille=Case(
+                When(
+                    quantity__gt=0,
+                    then=(F('quantity_purchased') * 1000 + F('quantity') / 2) / F('quantity'),
+                ),
+                default=Value(0),
+            ),
+            available_qty=Greatest(F('quantity') - F('quantity_purchased'), Value(0)),
+            near_limit_flag=ExpressionWrapper(Q(usage_permille__gte=800), output_field=BooleanField()),
+            at_limit_flag=ExpressionWrapper(
+                Q(quantity_purchased__gte=F('quantity')), output_field=BooleanField()
+            ),
+        )
@@ -4,6 +4,7 @@ from django.db import models
 from django.shortcuts import reverse as r
 from django.template.defaultfilters import slugify
 
+from bidding_procurement.managers import MaterialBiddingQuerySet
 from bidding_supplier.models import Supplier
 
 STATUS_CHOICES = (("1", "Ativo"), ("2", "Inativo"))
@@ -306,6 +307,8 @@ class MaterialBidding(models.Model):
     
     created_at = models.DateTimeField("incluído em", auto_now_add=True)
     updated_at = models.DateTimeField("atualizado em", auto_now=True)
+
+    objects = MaterialBiddingQuerySet.as_manager()
     
     def __str__(self):
         return f"{self.material.name} - {self.bidding.name} (R$ {self.price})"
@@ -314,11 +317,15 @@ class MaterialBidding(models.Model):
     @property
     def available_for_purchase(self):
         """Quantidade ainda disponível para compra (limite - comprado)."""
+        if 'available_qty' in self.__dict__:
+            return self.available_qty
         return max(0, (self.quantity or 0) - (self.quantity_purchased or 0))
     
     @property
     def usage_percentage(self):
         """Percentual do limite de compra já utilizado."""
+        if 'usage_permille' in self.__dict__:
+            return self.usage_permille / 10
         if not self.quantity or self.quantity == 0:
             return 0
         return round((self.quantity_purchased / self.quantity) * 100, 1)
@@ -326,22 +333,35 @@ class MaterialBidding(models.Model):
     @property
     def is_near_limit(self):
         """Verifica se está próximo do limite (>= 80% usado)."""
+        if 'near_limit_flag' in self.__dict__:
+            return self.near_limit_flag
         return self.usage_percentage >= 80
     
     @property
     def is_at_limit(self):
         """Verifica se atingiu o limite de compras."""
+        if 'at_limit_flag' in self.__dict__:
+            return self.at_limit_flag
         return self.quantity_purchased >= self.quantity
 
     def get_available_quantity(self):
         """
         Calcula quantidade disponível (licitada - usada em laudos).
+
+        Lê do resumo pré-calculado (fiscal.MaterialBalance); sem resumo
+        ainda gravado, calcula a partir dos laudos.
         
         Returns:
             int: Quantidade disponível para uso
         """
+        from django.core.exceptions import ObjectDoesNotExist
         from reports.models import MaterialReport
         from django.db.models import Sum
+
+        try:
+            return self.balance.available
+        except ObjectDoesNotExist:
+            pass
         
         used = MaterialReport.objects.filter(
             material_bidding=self
@@ -0,0 +1,258 @@
+"""
+Gravação em lote de materiais, fornecedores e vínculos para
+importação/sincronização de PDFs.
+
+bulk_create/bulk_update não chamam save() nem disparam signals, então o que
+eles fariam por objeto é feito aqui uma vez por lote:
+
+- nome em maiúsculas (Material.save, Supplier.save)
+- slug único (signal generate_material_slug), calculado contra todos os
+  slugs existentes com uma consulta
+- auditoria: um evento por objeto, agregados pelo audit_bulk em volta
+- invalidação do cache de materiais/fornecedores (core.signals), uma vez
+  por lote (dentro de CachedLists.deferred(), uma vez no fim)
+- resumo de saldo (fiscal.MaterialBalance) dos MaterialBidding criados
+"""
+from django.template.defaultfilters import slugify
+from django.utils import timezone
+
+from audit.services import AuditService
+from bidding_procurement.models import Material, MaterialBidding
+from bidding_supplier.models import Supplier
+from core.cache import CachedLists
+
+MATERIAL_BIDDING_FIELDS = ['supplier_id', 'price', 'quantity']
+
+
+def unique_slugs(names, taken: set, max_length: int = 50) -> list:
+    """
+    Slugs únicos para os nomes, no mesmo formato do signal
+    (base, base-1, base-2...). `taken` é atualizado com os novos slugs.
+    """
+    slugs = []
+    for name in names:
+        base = slugify(name)[:max_length]
+        slug = base
+        counter = 1
+        while slug in taken:
+            slug = f"{base}-{counter}"
+            counter += 1
+        taken.add(slug)
+        slugs.append(slug)
+    return slugs
+
+
+def log_bulk_audit(model_name: str, objects, action: str, changes=None):
+    """
+    Registra os eventos que os signals de auditoria gerariam por objeto.
+
+    Args:
+        model_name: Nome do model (ex.: 'Material')
+        objects: Instâncias afetadas
+        action: 'create', 'update' ou 'delete'
+        changes: Callable(obj) -> dict de mudanças, opcional
+    """
+    for obj in objects:
+        AuditService.log_event(
+            'crud', None, model_name, obj.pk, action,
+            changes=changes(obj) if changes else None,
+        )
+
+
+def get_or_create_materials(names) -> dict:
+    """
+    Materiais pelos nomes (em maiúsculas, como Material.save grava),
+    criando os que não existem com um único bulk_create.
+
+    Returns:
+        Dict nome em maiúsculas -> Material
+    """
+    upper_names = list(dict.fromkeys(name.upper() for name in names))
+    materials = {m.name: m for m in Material.objects.filter(name__in=upper_names)}
+
+    missing = [name for name in upper_names if name not in materials]
+    if missing:
+        taken = set(Material.objects.values_list('slug', flat=True))
+        created = Material.objects.bulk_create([
+            Material(name=name, slug=slug)
+            for name, slug in zip(missing, unique_slugs(missing, taken))
+        ])
+        log_bulk_audit('Material', created, 'create')
+        CachedLists.invalidate_materials()
+        materials.update((m.name, m) for m in created)
+
+    return materials
+
+
+def rename_materials(renames) -> int:
+    """
+    Renomeia materiais com um único bulk_update.
+
+    Args:
+        renames: Lista de (Material, novo nome)
+
+    Returns:
+        Quantidade de materiais alterados
+    """
+    changed = []
+    old_names = {}
+    for material, new_name in renames:
+        new_name = new_name.upper()
+        if material.name == new_name:
+            continue
+        old_names[material.pk] = material.name
+        material.name = new_name
+        changed.append(material)
+
+    if changed:
+        Material.objects.bulk_update(changed, ['name'], batch_size=500)
+        log_bulk_audit(
+            'Material', changed, 'update',
+            changes=lambda m: {'name': {'old': old_names[m.pk], 'new': m.name}},
+        )
+        CachedLists.invalidate_materials()
+    return len(changed)
+
+
+def create_material_biddings(material_biddings) -> list:
+    """
+    Cria os vínculos material/licitação com um único bulk_create e já grava
+    o MaterialBalance deles (o signal de post_save não é disparado).
+
+    Returns:
+        MaterialBidding criados
+    """
+    from fiscal.services.balance import MaterialBalanceService
+
+    created = MaterialBidding.objects.bulk_create(material_biddings, batch_size=500)
+    if created:
+        log_bulk_audit('MaterialBidding', created, 'create')
+        MaterialBalanceService.refresh([mb.pk for mb in created])
+    return created
+
+
+def get_or_create_suppliers(names) -> dict:
+    """
+    Fornecedores pelas razões sociais (em maiúsculas, como Supplier.save
+    grava), criando os que faltam com bulk_create. Conflitos na razão social
+    (única) viram no-op, então o lote não falha se outro processo criou o
+    mesmo fornecedor.
+
+    Returns:
+        Dict razão social em maiúsculas -> Supplier
+    """
+    companies = list(dict.fromkeys(name.upper() for name in names))
+    existing = set(Supplier.objects.filter(company__in=companies).values_list('company', flat=True))
+
+    missing = [company for company in companies if company not in existing]
+    if missing:
+        # Supplier.save: nome fantasia = razão social, slug do nome fantasia
+        Supplier.objects.bulk_create(
+            [Supplier(company=company, trade=company, slug=slugify(company)) for company in missing],
+            update_conflicts=True,
+            unique_fields=['company'],
+            update_fields=['company'],
+            batch_size=500,
+        )
+
+    suppliers = {s.company: s for s in Supplier.objects.filter(company__in=companies)}
+    if missing:
+        log_bulk_audit('Supplier', [suppliers[c] for c in missing if c in suppliers], 'create')
+        CachedLists.invalidate_suppliers()
+    return suppliers
+
+
+def rename_suppliers(renames) -> int:
+    """
+    Padroniza a razão social de fornecedores existentes com um bulk_update.
+
+    Args:
+        renames: Lista de (Supplier, nova razão social); o último vence
+
+    Returns:
+        Quantidade de fornecedores alterados
+    """
+    changed = {}
+    old_names = {}
+    now = timezone.now()
+    for supplier, new_name in renames:
+        new_name = new_name.upper()
+        if supplier.company == new_name:
+            continue
+        old_names.setdefault(supplier.pk, supplier.company)
+        supplier.company = new_name
+        supplier.update_at = now
+        changed[supplier.pk] = supplier
+
+    if changed:
+        Supplier.objects.bulk_update(changed.values(), ['company', 'update_at'], batch_size=500)
+        log_bulk_audit(
+            'Supplier', changed.values(), 'update',
+            changes=lambda s: {'company': {'old': old_names[s.pk], 'new': s.company}},
+        )
+        CachedLists.invalidate_suppliers()
+    return len(changed)
+
+
+def upsert_material_biddings(bidding, rows) -> tuple:
+    """
+    Cria ou atualiza (fornecedor, preço, quantidade) os vínculos da licitação
+    com um bulk_create(update_conflicts=True) em lotes, pela unicidade
+    material/licitação. Vínculos novos entram ativos; o status dos
+    existentes não é alterado.
+
+    Args:
+        bidding: Bidding
+        rows: Lista de MaterialBidding não salvos (material, supplier, price
+            em Decimal, quantity); para o mesmo material, o último vence
+
+    Returns:
+        (criados, atualizados)
+    """
+    from fiscal.services.balance import MaterialBalanceService
+
+    rows = list({row.material_id: row for row in rows}.values())
+    if not rows:
+        return 0, 0
+
+    material_ids = [row.material_id for row in rows]
+    existing = {
+        values['material_id']: values
+        for values in MaterialBidding.objects.filter(bidding=bidding, material_id__in=material_ids)
+        .values('pk', 'material_id', *MATERIAL_BIDDING_FIELDS)
+    }
+
+    for row in rows:
+        row.bidding = bidding
+    MaterialBidding.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['material', 'bidding'],
+        update_fields=['supplier', 'price', 'quantity', 'updated_at'],
+        batch_size=500,
+    )
+
+    # IDs relidos: nem todo backend devolve a PK das linhas em conflito
+    pks = dict(
+        MaterialBidding.objects.filter(bidding=bidding, material_id__in=material_ids)
+        .values_list('material_id', 'pk')
+    )
+    for row in rows:
+        row.pk = pks[row.material_id]
+
+    created = [row for row in rows if row.material_id not in existing]
+    updated = [row for row in rows if row.material_id in existing]
+
+    def changes(row):
+        old = existing[row.material_id]
+        field_changes = {}
+        for field_name in MATERIAL_BIDDING_FIELDS:
+            new = getattr(row, field_name)
+            if old[field_name] != new:
+                field_changes[field_name] = {'old': str(old[field_name]), 'new': str(new)}
+        return field_changes
+
+    log_bulk_audit('MaterialBidding', created, 'create')
+    log_bulk_audit('MaterialBidding', updated, 'update', changes=changes)
+    MaterialBalanceService.refresh(pks.values())
+    return len(created), len(updated)
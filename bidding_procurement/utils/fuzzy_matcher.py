@@ -1,8 +1,40 @@
 """
 Utilitário para matching fuzzy de nomes (fornecedores e materiais).
+
+- FuzzyMatcher: compara um nome contra uma lista (varredura linear).
+- FuzzyIndex: índice reutilizável para muitas buscas na mesma lista. Pré-
+  normaliza os nomes uma vez, monta um índice invertido de trigramas e
+  descarta candidatos por limites superiores exatos do score antes de rodar
+  o SequenceMatcher. Os scores (e a ordem) são os mesmos do FuzzyMatcher.
 """
+import heapq
+import math
+from collections import Counter, defaultdict
 from difflib import SequenceMatcher
-from typing import List, Tuple, Optional
+from typing import Callable, Iterable, List, Tuple, Optional
+
+TRIGRAM = 3
+
+
+def normalize_name(text: str) -> str:
+    """
+    Normaliza texto para comparação.
+    
+    - Remove espaços extras
+    - Converte para minúsculas
+    - Remove pontuação comum
+    """
+    text = text.lower()
+    text = text.replace('.', '')
+    text = text.replace(',', '')
+    text = text.replace('-', ' ')
+    text = ' '.join(text.split())  # Remove espaços múltiplos
+    
+    return text
+
+
+def _trigrams(text: str) -> Counter:
+    return Counter(text[i:i + TRIGRAM] for i in range(len(text) - TRIGRAM + 1))
 
 
 class FuzzyMatcher:
@@ -70,24 +102,212 @@ class FuzzyMatcher:
         return matches[0] if matches else None
     
     def _normalize(self, text: str) -> str:
+        """Normaliza texto para comparação (ver normalize_name)."""
+        return normalize_name(text)
+    
+    def are_similar(self, str1: str, str2: str) -> bool:
+        """Verifica se duas strings são similares (acima do threshold)."""
+        return self.similarity(str1, str2) >= self.threshold
+
+
+class FuzzyIndex:
+    """
+    Índice para buscar nomes similares em uma lista fixa.
+    
+    O score é o mesmo do FuzzyMatcher: SequenceMatcher(None, busca,
+    existente).ratio() sobre os nomes normalizados, ou seja 2·M / (la + lb),
+    com M caracteres casados. Antes do SequenceMatcher, cada candidato passa
+    por limites superiores de M que nunca descartam um match válido:
+    
+    - tamanho: M <= min(la, lb)
+    - trigramas (lema dos q-gramas): cada inserção/remoção destrói no máximo
+      3 trigramas, então M >= m exige pelo menos
+      max(la, lb) - 2 - 3·(la + lb - 2m) trigramas em comum. Quando esse
+      mínimo é <= 0 (nomes curtos), todos os nomes daquele tamanho são
+      candidatos, mesmo sem trigramas em comum
+    - caracteres: M <= interseção dos multiconjuntos de caracteres
+      (o mesmo limite do quick_ratio)
+    
+    Uso:
+        index = FuzzyIndex(Material.objects.values_list('name', flat=True))
+        index.search('CIMENTO CP II 50KG', threshold=0.9, limit=3)
+    """
+    
+    def __init__(self, names: Iterable[str] = (), normalizer: Callable[[str], str] = normalize_name):
+        """
+        Args:
+            names: Nomes indexados
+            normalizer: Normalização aplicada aos nomes e às buscas
         """
-        Normaliza texto para comparação.
+        self.normalizer = normalizer
+        self.names = []
+        self._normalized = []
+        self._chars = []
+        self._by_length = defaultdict(list)
+        self._postings = defaultdict(list)  # trigrama -> [(posição, contagem)]
+        self._positions = defaultdict(list)  # trigrama -> [posição]
+        self._last_shared = None  # (busca normalizada, trigramas em comum)
+        for name in names:
+            self.add(name)
+    
+    def __len__(self):
+        return len(self.names)
+    
+    def add(self, name: str):
+        """Adiciona um nome ao índice."""
+        position = len(self.names)
+        normalized = self.normalizer(name)
+        self.names.append(name)
+        self._normalized.append(normalized)
+        self._chars.append(Counter(normalized))
+        self._by_length[len(normalized)].append(position)
+        for gram, count in _trigrams(normalized).items():
+            self._postings[gram].append((position, count))
+            self._positions[gram].append(position)
+        self._last_shared = None
+    
+    def search(
+        self,
+        name: str,
+        threshold: float = 0.8,
+        limit: int = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Nomes com similaridade >= threshold, do mais para o menos similar
+        (empates na ordem em que foram adicionados), como
+        FuzzyMatcher.find_similar.
         
-        - Remove espaços extras
-        - Converte para minúsculas
-        - Remove pontuação comum
+        Args:
+            name: Nome a procurar
+            threshold: Similaridade mínima
+            limit: Retorna só os `limit` melhores (top-k)
+        
+        Returns:
+            Lista de tuplas (nome, score)
         """
-        text = text.lower()
-        text = text.replace('.', '')
-        text = text.replace(',', '')
-        text = text.replace('-', ' ')
-        text = ' '.join(text.split())  # Remove espaços múltiplos
+        return [(self.names[position], score) for position, score in self.search_positions(name, threshold, limit)]
+    
+    def search_positions(
+        self,
+        name: str,
+        threshold: float = 0.8,
+        limit: int = None
+    ) -> List[Tuple[int, float]]:
+        """Como search, mas com a posição do nome no índice: (posição, score)."""
+        query = self.normalizer(name)
+        la = len(query)
+        
+        shared = self._shared_trigrams(query)
+        query_chars = list(Counter(query).items())
+        
+        # (limite superior, posição) dos candidatos que sobrevivem aos filtros
+        candidates = []
+        for lb, positions in self._by_length.items():
+            total = la + lb
+            if total == 0:
+                bound = 1.0
+            else:
+                bound = 2 * min(la, lb) / total
+            if bound < threshold:
+                continue
+            required = self._required_trigrams(la, lb, threshold)
+            pool = positions if required <= 0 else (
+                p for p in positions if shared.get(p, 0) >= required
+            )
+            for position in pool:
+                if total:
+                    chars = self._chars[position]
+                    common = 0
+                    for char, count in query_chars:
+                        other = chars.get(char)
+                        if other:
+                            common += count if count < other else other
+                    bound = 2 * common / total
+                    if bound < threshold:
+                        continue
+                candidates.append((bound, position))
         
-        return text
+        # Maiores limites primeiro: com limit, para assim que nenhum
+        # candidato restante puder entrar no top-k
+        candidates.sort(key=lambda c: (-c[0], c[1]))
+        heap = []  # (score, -posição): o pior do top-k fica no topo
+        matcher = SequenceMatcher(None, query, '')
+        for bound, position in candidates:
+            if limit and len(heap) == limit and bound < heap[0][0]:
+                break
+            matcher.set_seq2(self._normalized[position])
+            score = matcher.ratio()
+            if score < threshold:
+                continue
+            item = (score, -position)
+            if not limit:
+                heap.append(item)
+            elif len(heap) < limit:
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
+        
+        heap.sort(key=lambda item: (-item[0], -item[1]))
+        return [(-neg_position, score) for score, neg_position in heap]
     
-    def are_similar(self, str1: str, str2: str) -> bool:
-        """Verifica se duas strings são similares (acima do threshold)."""
-        return self.similarity(str1, str2) >= self.threshold
+    def best_match(self, name: str, threshold: float = 0.8) -> Optional[Tuple[str, float]]:
+        """Melhor match (nome, score) ou None."""
+        matches = self.search(name, threshold=threshold, limit=1)
+        return matches[0] if matches else None
+    
+    def substring_positions(self, name: str) -> List[int]:
+        """
+        Posições dos nomes que contêm o nome buscado ou estão contidos nele
+        (após normalização), em ordem de inserção.
+        """
+        query = self.normalizer(name)
+        found = set()
+        
+        # Nomes que contêm a busca: todos os trigramas da busca aparecem neles
+        grams = _trigrams(query)
+        if grams:
+            rarest = min(grams, key=lambda gram: len(self._postings.get(gram, ())))
+            pool = (position for position, _ in self._postings.get(rarest, ()))
+        else:
+            pool = range(len(self.names))
+        found.update(p for p in pool if query in self._normalized[p])
+        
+        # Nomes contidos na busca: todos os trigramas deles aparecem na busca
+        # (nomes com menos de 3 caracteres não têm trigramas: verificados direto)
+        for position, count in self._shared_trigrams(query).items():
+            if count == len(self._normalized[position]) - TRIGRAM + 1 and self._normalized[position] in query:
+                found.add(position)
+        for lb in range(min(TRIGRAM, len(query) + 1)):
+            found.update(p for p in self._by_length.get(lb, ()) if self._normalized[p] in query)
+        
+        return sorted(found)
+    
+    def _shared_trigrams(self, query: str) -> Counter:
+        """
+        Trigramas em comum (interseção de multiconjuntos) por posição. O
+        resultado da última busca é reaproveitado (search_positions e
+        substring_positions costumam ser chamados com o mesmo nome).
+        """
+        if self._last_shared and self._last_shared[0] == query:
+            return self._last_shared[1]
+        shared = Counter()
+        for gram, query_count in _trigrams(query).items():
+            if query_count == 1:
+                # Caso comum: contagem em C, sem min() por posição
+                shared.update(self._positions.get(gram, ()))
+            else:
+                for position, count in self._postings.get(gram, ()):
+                    shared[position] += min(query_count, count)
+        self._last_shared = (query, shared)
+        return shared
+    
+    @staticmethod
+    def _required_trigrams(la: int, lb: int, threshold: float) -> float:
+        """Mínimo de trigramas em comum para que o score possa atingir threshold."""
+        # M >= threshold·(la+lb)/2  =>  inserções/remoções <= (1-threshold)·(la+lb);
+        # a folga evita descartar por arredondamento de ponto flutuante
+        edits = math.floor((1 - threshold) * (la + lb) + 1e-9)
+        return max(la, lb) - (TRIGRAM - 1) - TRIGRAM * edits
 
 
 # Funções de conveniência
@@ -1,17 +1,69 @@
 """
 Utilitário para extração de dados de PDFs de licitação.
+
+O texto é lido uma única vez, página a página: cada página é analisada assim
+que é extraída (informações administrativas, fornecedores e linhas de
+materiais), sem montar o texto completo em memória. Em PDFs grandes as
+páginas são distribuídas entre processos (pdfplumber é CPU-bound e não
+libera o GIL).
 """
-import pdfplumber
+import os
 import re
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from typing import Dict, List, Optional
+from itertools import repeat
+from typing import Dict, Iterator, List, Optional
+
+import pdfplumber
+
+# A partir de quantas páginas vale a pena abrir um pool de processos
+PARALLEL_MIN_PAGES = 100
+
+PROC_ADMIN_RE = re.compile(r'Proc\.\s*Administrativo\s*:\s*(\d+)')
+PROC_LICIT_RE = re.compile(r'Nº\s*Proc\.\s*Licitatório\s*:\s*\d+/(\d+)')
+MODALITY_RE = re.compile(r'Modalidade\s*:\s*([^\n]+?)Nº', re.IGNORECASE)
+# Sem "Nº", a modalidade só vale na última linha do documento (o "$" do
+# antigo texto completo); por página, é a última linha da última página com texto
+MODALITY_AT_END_RE = re.compile(r'Modalidade\s*:\s*([^\n]+?)$', re.IGNORECASE)
+MODALITY_NUMBER_RE = re.compile(r'Nº\s*Modalidade\s*Licit\.\s*:\s*(\d+)')
+VALIDITY_RE = re.compile(r'Prazo\s*de\s*Validade\s*:\s*(\d{2}/\d{2}/\d{4})')
+OBJECT_RE = re.compile(r'Objeto\s*/\s*Descrição\s*:\s*([^\n]+)', re.IGNORECASE)
+
+# Padrão: "Fornecedor / Proponente : NUMERO - NOME"
+SUPPLIER_RE = re.compile(r'Fornecedor\s*/?\s*Proponente\s*:\s*\d+\s*-\s*([^\n]+)', re.IGNORECASE)
+SECTION_RE = re.compile(r'Fornecedor\s*/?\s*Proponente\s*:')
+SECTION_NAME_RE = re.compile(r'^\s*\d+\s*-\s*([^\n]+)')
+
+# Linha de material: Item Código Descrição [Unidade] Qtd Preço_Unit Preço_Total
+CODE_RE = re.compile(r'(\d{3}\.\d{3}\.\d{3})')
+DESCRIPTION_RE = re.compile(r'\d{3}\.\d{3}\.\d{3}\s+(.+?)(?:UN|PC|CX|M|KG|L)\s+')
+DESCRIPTION_NO_UNIT_RE = re.compile(r'\d{3}\.\d{3}\.\d{3}\s+(.+?)\s+\d+\s+[\d,]+')
+PRICE_RE = re.compile(r'(?:UN|PC|CX|M|KG|L)?\s+(\d+)\s+([\d.,]+)\s+([\d.,]+)')
+BRAND_RE = re.compile(r'MARCA\s+([A-Z\s]+)', re.IGNORECASE)
+
+
+def _extract_page_range(pdf_path: str, start: int, stop: int) -> List[str]:
+    """Texto das páginas [start, stop) (executado nos processos do pool)."""
+    texts = []
+    with pdfplumber.open(pdf_path, pages=range(start + 1, stop + 1)) as pdf:
+        for page in pdf.pages:
+            texts.append(page.extract_text() or "")
+            page.close()
+    return texts
 
 
 class BiddingPDFExtractor:
     """Extrai dados estruturados de PDFs de licitação."""
     
-    def __init__(self, pdf_path: str):
+    def __init__(self, pdf_path: str, workers: Optional[int] = None):
+        """
+        Args:
+            pdf_path: Caminho do PDF
+            workers: Processos para extrair o texto de PDFs com pelo menos
+                PARALLEL_MIN_PAGES páginas (padrão: número de CPUs; 1 desliga)
+        """
         self.pdf_path = pdf_path
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
         self.data = {
             "administrative_process": "",
             "bidding_name": "",
@@ -25,168 +77,167 @@ class BiddingPDFExtractor:
     
     def extract(self) -> Dict:
         """Extrai todos os dados do PDF."""
+        self._reset_state()
+        for page_text in self.iter_page_texts():
+            self._parse_page(page_text)
+        self._finish_administrative_info()
+        return self.data
+    
+    def iter_page_texts(self) -> Iterator[str]:
+        """
+        Texto de cada página, em ordem, extraído sob demanda.
+        
+        Com workers > 1 e pelo menos PARALLEL_MIN_PAGES páginas, faixas de
+        páginas são extraídas em paralelo por um pool de processos.
+        """
         with pdfplumber.open(self.pdf_path) as pdf:
-            full_text = self._extract_full_text(pdf)
-            
-            # Extrair informações administrativas
-            self._extract_administrative_info(full_text)
-            
-            # Extrair fornecedores
-            self._extract_suppliers(full_text)
-            
-            # Extrair materiais (se houver tabelas)
-            self._extract_materials(pdf)
+            page_count = len(pdf.pages)
+            if self.workers <= 1 or page_count < PARALLEL_MIN_PAGES:
+                for page in pdf.pages:
+                    yield page.extract_text() or ""
+                    page.close()  # libera o cache de layout da página
+                return
         
-        return self.data
+        # Algumas faixas por processo para equilibrar páginas mais pesadas
+        chunk_size = -(-page_count // (self.workers * 4))
+        starts = range(0, page_count, chunk_size)
+        stops = [min(start + chunk_size, page_count) for start in starts]
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            for texts in pool.map(_extract_page_range, repeat(self.pdf_path), starts, stops):
+                yield from texts
     
-    def _extract_full_text(self, pdf) -> str:
-        """Extrai texto completo do PDF."""
-        full_text = ""
-        for page in pdf.pages:
-            page_text = page.extract_text()
-            if page_text:
-                full_text += page_text + "\n"
-        return full_text
+    def _reset_state(self):
+        """Estado da análise incremental das páginas."""
+        # Primeira ocorrência de cada campo administrativo no documento
+        self._admin_matches = {}
+        self._modality_at_end = None
+        self._admin_patterns = {
+            'proc_admin': PROC_ADMIN_RE,
+            'proc_licit': PROC_LICIT_RE,
+            'modality': MODALITY_RE,
+            'modality_number': MODALITY_NUMBER_RE,
+            'validity': VALIDITY_RE,
+            'object': OBJECT_RE,
+        }
+        self._seen_suppliers = set()
+        # Fornecedor da seção corrente (uma seção pode continuar na página seguinte)
+        self._section_supplier = None
+        self.data["suppliers"] = []
+        self.data["materials"] = []
     
-    def _extract_administrative_info(self, text: str):
-        """Extrai informações administrativas do cabeçalho."""
+    def _parse_page(self, text: str):
+        """Analisa uma página: cabeçalho, fornecedores e linhas de materiais."""
+        if not text:
+            return
+        
+        if len(self._admin_matches) < len(self._admin_patterns):
+            for field, pattern in self._admin_patterns.items():
+                if field not in self._admin_matches:
+                    match = pattern.search(text)
+                    if match:
+                        self._admin_matches[field] = match.group(1)
+        
+        if 'modality' not in self._admin_matches:
+            match = MODALITY_AT_END_RE.search(text)
+            self._modality_at_end = match.group(1) if match else None
+        
+        self._extract_suppliers(text)
+        
+        # Dividir por seções de fornecedores; o trecho antes do primeiro
+        # cabeçalho da página pertence à seção que veio da página anterior
+        sections = SECTION_RE.split(text)
+        self._extract_materials(sections[0])
+        for section in sections[1:]:
+            fornecedor_match = SECTION_NAME_RE.search(section)
+            supplier_name = fornecedor_match.group(1).strip() if fornecedor_match else None
+            if supplier_name and 'fiorilli' in supplier_name.lower():
+                supplier_name = None
+            self._section_supplier = supplier_name
+            self._extract_materials(section)
+    
+    def _finish_administrative_info(self):
+        """Monta as informações administrativas a partir das primeiras ocorrências."""
+        matches = self._admin_matches
+        
         # Processo Administrativo
-        proc_admin = re.search(r'Proc\.\s*Administrativo\s*:\s*(\d+)', text)
-        if proc_admin:
-            proc_num = proc_admin.group(1)
-            # Tentar extrair ano do processo licitatório
-            proc_licit = re.search(r'Nº\s*Proc\.\s*Licitatório\s*:\s*\d+/(\d+)', text)
-            year = proc_licit.group(1) if proc_licit else datetime.now().strftime('%y')
+        if 'proc_admin' in matches:
+            proc_num = matches['proc_admin']
+            # Ano do processo licitatório, se houver
+            year = matches.get('proc_licit') or datetime.now().strftime('%y')
             self.data["administrative_process"] = f"{proc_num}/{year}"
             self.data["bidding_name"] = f"Processo Licitatório {proc_num}/{year}"
         
-        # Modalidade
-        modal_match = re.search(r'Modalidade\s*:\s*([^\n]+?)(?:Nº|$)', text, re.IGNORECASE)
-        if modal_match:
-            self.data["modality"] = modal_match.group(1).strip()
+        modality = matches.get('modality') or self._modality_at_end
+        if modality:
+            self.data["modality"] = modality.strip()
         
-        # Número da Modalidade
-        modal_num = re.search(r'Nº\s*Modalidade\s*Licit\.\s*:\s*(\d+)', text)
-        if modal_num:
-            self.data["modality_number"] = int(modal_num.group(1))
+        if 'modality_number' in matches:
+            self.data["modality_number"] = int(matches['modality_number'])
         
-        # Data de Validade
-        validity = re.search(r'Prazo\s*de\s*Validade\s*:\s*(\d{2}/\d{2}/\d{4})', text)
-        if validity:
+        if 'validity' in matches:
             try:
-                self.data["validity_date"] = datetime.strptime(validity.group(1), '%d/%m/%Y').date()
-            except:
+                self.data["validity_date"] = datetime.strptime(matches['validity'], '%d/%m/%Y').date()
+            except ValueError:
                 pass
         
-        # Objeto/Descrição
-        obj_match = re.search(r'Objeto\s*/\s*Descrição\s*:\s*([^\n]+)', text, re.IGNORECASE)
-        if obj_match:
-            self.data["object_description"] = obj_match.group(1).strip()
+        if 'object' in matches:
+            self.data["object_description"] = matches['object'].strip()
     
     def _extract_suppliers(self, text: str):
-        """Extrai lista de fornecedores."""
-        # Padrão: "Fornecedor / Proponente : NUMERO - NOME"
-        suppliers = re.findall(
-            r'Fornecedor\s*/?\s*Proponente\s*:\s*\d+\s*-\s*([^\n]+)',
-            text,
-            re.IGNORECASE
-        )
-        
-        # Filtrar rodapé (Fiorilli)
-        suppliers = [
-            s.strip() 
-            for s in suppliers 
-            if 'fiorilli' not in s.lower() and s.strip()
-        ]
-        
-        # Remover duplicatas mantendo ordem
-        seen = set()
-        unique_suppliers = []
-        for supplier in suppliers:
-            if supplier not in seen:
-                seen.add(supplier)
-                unique_suppliers.append(supplier)
-        
-        self.data["suppliers"] = unique_suppliers
+        """Acumula os fornecedores da página, sem duplicatas e mantendo a ordem."""
+        for match in SUPPLIER_RE.finditer(text):
+            supplier = match.group(1).strip()
+            # Filtrar rodapé (Fiorilli)
+            if not supplier or 'fiorilli' in supplier.lower() or supplier in self._seen_suppliers:
+                continue
+            self._seen_suppliers.add(supplier)
+            self.data["suppliers"].append(supplier)
     
-    def _extract_materials(self, pdf):
-        """Extrai materiais organizados por fornecedor."""
-        full_text = self._extract_full_text(pdf)
+    def _extract_materials(self, section: str):
+        """Extrai os materiais das linhas de um trecho da seção corrente."""
+        supplier_name = self._section_supplier
+        if not supplier_name:
+            return
         
-        # Dividir por seções de fornecedores
-        fornecedor_sections = re.split(r'Fornecedor\s*/?\s*Proponente\s*:', full_text)
+        for line in section.split('\n'):
+            material = self._parse_material_line(line, supplier_name)
+            if material:
+                self.data["materials"].append(material)
+    
+    @staticmethod
+    def _parse_material_line(line: str, supplier_name: str) -> Optional[Dict]:
+        """Material de uma linha com código XXX.XXX.XXX, ou None."""
+        codigo_match = CODE_RE.search(line)
+        if not codigo_match:
+            return None
         
-        for section in fornecedor_sections[1:]:  # Pular cabeçalho
-            # Extrair nome do fornecedor
-            fornecedor_match = re.search(r'^\s*\d+\s*-\s*([^\n]+)', section)
-            if not fornecedor_match:
-                continue
-            
-            supplier_name = fornecedor_match.group(1).strip()
-            if 'fiorilli' in supplier_name.lower():
-                continue
-            
-            # Extrair materiais desta seção
-            # Padrão melhorado: captura diferentes formatos de linhas
-            # Formato: Item Código Descrição [Unidade] Qtd Preço_Unit Preço_Total
-            lines = section.split('\n')
-            
-            for line in lines:
-                # Procurar por linhas com código de material (XXX.XXX.XXX)
-                codigo_match = re.search(r'(\d{3}\.\d{3}\.\d{3})', line)
-                if not codigo_match:
-                    continue
-                
-                codigo = codigo_match.group(1)
-                
-                # Extrair descrição (texto entre código e unidade)
-                desc_match = re.search(r'\d{3}\.\d{3}\.\d{3}\s+(.+?)(?:UN|PC|CX|M|KG|L)\s+', line)
-                if not desc_match:
-                    # Tentar sem unidade explícita
-                    desc_match = re.search(r'\d{3}\.\d{3}\.\d{3}\s+(.+?)\s+\d+\s+[\d,]+', line)
-                
-                if not desc_match:
-                    continue
-                
-                descricao = desc_match.group(1).strip()
-                
-                # Extrair quantidade e preço
-                # Padrão: UN/PC/etc Qtd Preço_Unit Preço_Total
-                preco_match = re.search(r'(?:UN|PC|CX|M|KG|L)?\s+(\d+)\s+([\d.,]+)\s+([\d.,]+)', line)
-                if not preco_match:
-                    # Tentar sem unidade
-                    preco_match = re.search(r'\s+(\d+)\s+([\d.,]+)\s+([\d.,]+)', line)
-                
-                if not preco_match:
-                    continue
-                
-                qtd = preco_match.group(1)
-                preco_unit = preco_match.group(2)
-                
-                # Extrair marca se houver
-                marca = ""
-                marca_match = re.search(r'MARCA\s+([A-Z\s]+)', descricao, re.IGNORECASE)
-                if marca_match:
-                    marca = marca_match.group(1).strip()
-                
-                # Converter preço
-                try:
-                    preco = float(preco_unit.replace('.', '').replace(',', '.'))
-                except:
-                    preco = 0.0
-                
-                # Limpar descrição
-                desc_clean = descricao[:200]
-                
-                self.data["materials"].append({
-                    "item": "",  # Item number não é crítico
-                    "code": codigo,
-                    "description": desc_clean,
-                    "brand": marca,
-                    "quantity": int(qtd),
-                    "unit_price": preco,
-                    "supplier": supplier_name
-                })
+        # Descrição: texto entre código e unidade (ou sem unidade explícita)
+        desc_match = DESCRIPTION_RE.search(line) or DESCRIPTION_NO_UNIT_RE.search(line)
+        if not desc_match:
+            return None
+        descricao = desc_match.group(1).strip()
+        
+        # Quantidade e preço: [UN/PC/etc] Qtd Preço_Unit Preço_Total
+        preco_match = PRICE_RE.search(line)
+        if not preco_match:
+            return None
+        
+        marca_match = BRAND_RE.search(descricao)
+        
+        try:
+            preco = float(preco_match.group(2).replace('.', '').replace(',', '.'))
+        except ValueError:
+            preco = 0.0
+        
+        return {
+            "item": "",  # Item number não é crítico
+            "code": codigo_match.group(1),
+            "description": descricao[:200],
+            "brand": marca_match.group(1).strip() if marca_match else "",
+            "quantity": int(preco_match.group(1)),
+            "unit_price": preco,
+            "supplier": supplier_name
+        }
     
     def get_summary(self) -> str:
         """Retorna um resumo dos dados extraídos."""
@@ -206,3 +257,11 @@ Fornecedores ({len(self.data['suppliers'])}):
         summary += f"\nMateriais: {len(self.data['materials'])} encontrados"
         
         return summary
+
+
+def extract_bidding_pdf(pdf_path: str) -> Dict:
+    """
+    Extrai um PDF sem pool de páginas (para uso dentro de um pool de
+    processos por arquivo, como no import_bidding_pdfs).
+    """
+    return BiddingPDFExtractor(pdf_path, workers=1).extract()
@@ -0,0 +1,114 @@
+"""
+Casamento entre os materiais de uma licitação no banco e os do PDF
+(sync_bidding_with_pdf), em uma única passada:
+
+1. Código: o código XXX.XXX.XXX no nome do material do banco é buscado em
+   um dict código -> materiais do PDF.
+2. Nome: para os que sobraram, os pares candidatos vêm de um FuzzyIndex das
+   descrições do PDF. Um nome contido no outro vale 1.0, e nomes com
+   similaridade acima de NAME_THRESHOLD valem a própria similaridade. Os
+   pares são atribuídos do maior score para o menor (atribuição gulosa),
+   cada material do PDF a no máximo um do banco.
+
+Materiais do banco sem par são candidatos a remoção; os do PDF sem par,
+a criação.
+"""
+import re
+import unicodedata
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+
+from bidding_procurement.utils.fuzzy_matcher import FuzzyIndex
+
+CODE_RE = re.compile(r'(\d{3}\.\d{3}\.\d{3})')
+NAME_THRESHOLD = 0.85
+
+
+def normalize_description(text: str) -> str:
+    """Sem acentos, minúsculas, só letras/números/espaços simples."""
+    if not text:
+        return ""
+    text = unicodedata.normalize('NFKD', text).encode('ASCII', 'ignore').decode('ASCII')
+    text = text.lower()
+    text = re.sub(r'[^a-z0-9\s]', '', text)
+    return ' '.join(text.split())
+
+
+@dataclass
+class SyncPlan:
+    """Resultado do casamento banco x PDF."""
+    matches: list = field(default_factory=list)  # (MaterialBidding, material do PDF, score)
+    to_remove: list = field(default_factory=list)  # MaterialBidding sem par no PDF
+    to_create: list = field(default_factory=list)  # materiais do PDF sem par no banco
+
+    @property
+    def to_update(self) -> list:
+        """(MaterialBidding, nome do PDF) dos casados cujo nome difere."""
+        return [
+            (mat_bidding, pdf_mat['description'])
+            for mat_bidding, pdf_mat, _ in self.matches
+            if mat_bidding.material.name != pdf_mat['description'].upper()
+        ]
+
+
+def match_pdf_materials(material_biddings, pdf_materials, threshold: float = NAME_THRESHOLD) -> SyncPlan:
+    """
+    Casa os MaterialBidding da licitação (com material já carregado) com os
+    materiais extraídos do PDF.
+
+    Args:
+        material_biddings: MaterialBidding da licitação
+        pdf_materials: Dicts do BiddingPDFExtractor (code, description, ...)
+        threshold: Similaridade mínima (exclusiva) para casar por nome
+
+    Returns:
+        SyncPlan
+    """
+    material_biddings = list(material_biddings)
+    assigned = {}  # índice do MaterialBidding -> (posição no PDF, score)
+    taken = set()
+
+    # 1. Código
+    by_code = defaultdict(deque)
+    for position, pdf_mat in enumerate(pdf_materials):
+        if pdf_mat.get('code'):
+            by_code[pdf_mat['code']].append(position)
+
+    for i, mat_bidding in enumerate(material_biddings):
+        code_match = CODE_RE.search(mat_bidding.material.name)
+        if code_match and by_code.get(code_match.group(1)):
+            position = by_code[code_match.group(1)].popleft()
+            assigned[i] = (position, 1.0)
+            taken.add(position)
+
+    # 2. Nome: pares candidatos, do maior score para o menor
+    index = FuzzyIndex((m['description'] for m in pdf_materials), normalizer=normalize_description)
+    pairs = []
+    for i, mat_bidding in enumerate(material_biddings):
+        if i in assigned:
+            continue
+        name = mat_bidding.material.name
+        scores = {}
+        for position, score in index.search_positions(name, threshold=threshold):
+            if score > threshold:
+                scores[position] = score
+        for position in index.substring_positions(name):
+            scores[position] = 1.0
+        pairs.extend((score, i, position) for position, score in scores.items() if position not in taken)
+
+    pairs.sort(key=lambda pair: (-pair[0], pair[1], pair[2]))
+    for score, i, position in pairs:
+        if i in assigned or position in taken:
+            continue
+        assigned[i] = (position, score)
+        taken.add(position)
+
+    plan = SyncPlan()
+    for i, mat_bidding in enumerate(material_biddings):
+        if i in assigned:
+            position, score = assigned[i]
+            plan.matches.append((mat_bidding, pdf_materials[position], score))
+        else:
+            plan.to_remove.append(mat_bidding)
+    plan.to_create = [m for position, m in enumerate(pdf_materials) if position not in taken]
+    return plan
@@ -12,9 +12,49 @@ Uso:
 
     # Invalidar
     cache_delete("dashboard_stats")
+
+    # Várias chaves em um único round trip (MGET / pipeline)
+    values = cache_get_many(["dashboard_stats_1", "dashboard_charts_calendar"])
+    cache_set_many({"a": 1, "b": 2}, ttl=60)
+
+    # Tags: invalidar uma tag remove todas as chaves registradas nela
+    cache_set("dashboard_stats_42", data, ttl=300, tags=["dashboard", "user:42"])
+    cache_invalidate_tags("user:42")
+
+    # Proteção contra stampede: um único worker recalcula, os demais
+    # recebem o valor antigo enquanto isso
+    data = cache_get_or_compute("dashboard_stats_42", compute_stats, ttl=300)
+
+Serialização:
+    Os valores passam por um codec (CACHE_CODEC: "json" ou "msgpack") que
+    preserva Decimal, date, datetime e UUID. Payloads maiores que
+    CACHE_COMPRESS_MIN_BYTES são comprimidos com zlib. Cada payload carrega
+    um cabeçalho ("<codec>[z]:") e pode ser lido independente do codec atual;
+    JSON sem compressão é gravado sem cabeçalho.
+
+Camadas:
+    L1 - LRU em memória do processo (por worker), limitado em entradas e bytes.
+    L2 - Redis local ou Upstash REST, compartilhado entre workers.
+
+Leituras quentes são servidas pelo L1 sem sair do worker. Cada entrada do L1
+carrega a versão global do cache no momento em que foi gravada; quando algum
+worker chama bump_cache_version() (ex: signals de invalidação), a versão no L2
+é incrementada e os demais workers descartam suas entradas antigas na próxima
+verificação (a cada CACHE_L1_VERSION_CHECK segundos).
 """
+import base64
+import datetime
 import json
 import logging
+import math
+import random
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from decimal import Decimal
 
 from decouple import config
 
@@ -26,6 +66,34 @@ UPSTASH_TOKEN = config("UPSTASH_REDIS_REST_TOKEN", default="")
 USE_REDIS = config("USE_REDIS", default=False, cast=bool)
 REDIS_URL = config("REDIS_URL", default="redis://localhost:6379/0")
 
+# L1 (memória do processo)
+L1_ENABLED = config("CACHE_L1_ENABLED", default=True, cast=bool)
+L1_MAX_ENTRIES = config("CACHE_L1_MAX_ENTRIES", default=256, cast=int)
+L1_MAX_BYTES = config("CACHE_L1_MAX_BYTES", default=4 * 1024 * 1024, cast=int)
+L1_MAX_TTL = config("CACHE_L1_MAX_TTL", default=60, cast=int)
+L1_VERSION_CHECK = config("CACHE_L1_VERSION_CHECK", default=5, cast=float)
+
+# Chave no L2 com a versão global usada para invalidar o L1 de todos os workers
+CACHE_VERSION_KEY = "cache:version"
+
+# Serialização
+CODEC = config("CACHE_CODEC", default="json")
+COMPRESS_MIN_BYTES = config("CACHE_COMPRESS_MIN_BYTES", default=1024, cast=int)
+COMPRESS_LEVEL = 6
+
+# Stampede: lock distribuído (SET NX) e espera máxima por quem está recalculando.
+# LOCK_TTL é maior que o limite de 10s da Vercel, então um lock só expira
+# se o worker que o detém morrer.
+CACHE_LOCK_PREFIX = "cache:lock:"
+LOCK_TTL = 30
+LOCK_WAIT = config("CACHE_LOCK_WAIT", default=2.0, cast=float)
+LOCK_POLL_INTERVAL = 0.1
+EARLY_REFRESH_BETA = 1.0
+
+# Prefixo dos sets de tags e tempo de vida deles (maior que qualquer TTL de chave)
+CACHE_TAG_PREFIX = "cache:tag:"
+TAG_TTL = 86400
+
 # Cliente Redis (inicializado sob demanda)
 _redis_client = None
 
@@ -64,9 +132,309 @@ def _get_client():
     return _redis_client
 
 
+class LocalCache:
+    """
+    LRU em memória com TTL por chave e entradas carimbadas com versão.
+
+    Guarda o payload serializado (e não o objeto), de modo que cada leitura
+    devolve uma cópia nova e o tamanho em bytes de cada entrada é exato.
+    Thread-safe.
+    """
+
+    def __init__(self, max_entries: int = L1_MAX_ENTRIES, max_bytes: int = L1_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()  # key -> (payload, expires_at, version)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str, version: int):
+        """Retorna o payload ou None se ausente, expirado ou de versão antiga."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            payload, expires_at, entry_version = entry
+            if entry_version != version or expires_at <= time.monotonic():
+                self._pop(key)
+                return None
+            self._data.move_to_end(key)
+            return payload
+
+    def set(self, key: str, payload: str, ttl: float, version: int):
+        """Armazena payload, removendo as entradas menos usadas se exceder os limites."""
+        size = len(payload)
+        if ttl <= 0 or size > self.max_bytes:
+            self.delete(key)
+            return
+        with self._lock:
+            self._pop(key)
+            self._data[key] = (payload, time.monotonic() + ttl, version)
+            self._bytes += size
+            while self._data and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+                oldest = next(iter(self._data))
+                self._pop(oldest)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def _pop(self, key: str):
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[0])
+
+
+_local_cache = LocalCache()
+
+# Versão global conhecida por este worker e quando foi conferida no L2
+_local_version = 0
+_version_checked_at = 0.0
+
+_stats_lock = threading.Lock()
+_stats = {
+    "l1_hits": 0,
+    "l1_misses": 0,
+    "l2_hits": 0,
+    "l2_misses": 0,
+    # Payloads trafegados com o L2
+    "bytes_read": 0,
+    "bytes_written": 0,
+    "raw_bytes_written": 0,  # antes da compressão
+    "compressed_writes": 0,
+}
+
+
+def _count(name: str, amount: int = 1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def cache_stats() -> dict:
+    """
+    Retorna contadores deste worker.
+
+    Returns:
+        Dict com hits/misses por camada (l1_*, l2_*), bytes lidos/gravados
+        no L2 (bytes_read, bytes_written, raw_bytes_written,
+        compressed_writes), l1_entries e l1_bytes
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["l1_entries"] = len(_local_cache)
+    stats["l1_bytes"] = _local_cache.size_bytes
+    return stats
+
+
+def reset_cache_stats():
+    """Zera os contadores deste worker."""
+    with _stats_lock:
+        for name in _stats:
+            _stats[name] = 0
+
+
+def _current_version(client) -> int:
+    """
+    Retorna a versão global do cache, consultando o L2 no máximo
+    uma vez a cada L1_VERSION_CHECK segundos.
+    """
+    global _local_version, _version_checked_at
+
+    now = time.monotonic()
+    if now - _version_checked_at < L1_VERSION_CHECK:
+        return _local_version
+
+    try:
+        version = int(client.get(CACHE_VERSION_KEY) or 0)
+    except Exception as e:
+        logger.warning(f"Erro ao ler versão do cache: {e}")
+        return _local_version
+
+    if version != _local_version:
+        _local_cache.clear()
+    _local_version = version
+    _version_checked_at = now
+    return version
+
+
+def bump_cache_version():
+    """
+    Incrementa a versão global do cache.
+
+    Descarta imediatamente o L1 deste worker; os demais workers descartam
+    o seu na próxima verificação de versão.
+    """
+    global _local_version, _version_checked_at
+
+    _local_cache.clear()
+    client = _get_client()
+    if not client:
+        return
+
+    try:
+        _local_version = int(client.incr(CACHE_VERSION_KEY))
+        _version_checked_at = time.monotonic()
+    except Exception as e:
+        logger.warning(f"Erro ao incrementar versão do cache: {e}")
+
+
+# --- Codecs ---
+
+class JSONCodec:
+    """JSON com marcação de tipos para Decimal, date, datetime e UUID."""
+
+    name = "j"
+
+    @staticmethod
+    def _default(value):
+        if isinstance(value, Decimal):
+            return {"__type__": "decimal", "value": str(value)}
+        if isinstance(value, datetime.datetime):
+            return {"__type__": "datetime", "value": value.isoformat()}
+        if isinstance(value, datetime.date):
+            return {"__type__": "date", "value": value.isoformat()}
+        if isinstance(value, uuid.UUID):
+            return {"__type__": "uuid", "value": str(value)}
+        return str(value)
+
+    @staticmethod
+    def _object_hook(obj):
+        kind = obj.get("__type__")
+        if kind is None or len(obj) != 2:
+            return obj
+        value = obj["value"]
+        if kind == "decimal":
+            return Decimal(value)
+        if kind == "datetime":
+            return datetime.datetime.fromisoformat(value)
+        if kind == "date":
+            return datetime.date.fromisoformat(value)
+        if kind == "uuid":
+            return uuid.UUID(value)
+        return obj
+
+    def encode(self, value) -> bytes:
+        return json.dumps(value, default=self._default, separators=(",", ":")).encode()
+
+    def decode(self, data: bytes):
+        return json.loads(data, object_hook=self._object_hook)
+
+
+class MsgpackCodec:
+    """MessagePack com ext types para Decimal, date, datetime e UUID (requer msgpack)."""
+
+    name = "m"
+
+    _EXT_DECIMAL = 1
+    _EXT_DATE = 2
+    _EXT_DATETIME = 3
+    _EXT_UUID = 4
+
+    def __init__(self):
+        import msgpack
+        self._msgpack = msgpack
+
+    def _default(self, value):
+        ext = self._msgpack.ExtType
+        if isinstance(value, Decimal):
+            return ext(self._EXT_DECIMAL, str(value).encode())
+        if isinstance(value, datetime.datetime):
+            return ext(self._EXT_DATETIME, value.isoformat().encode())
+        if isinstance(value, datetime.date):
+            return ext(self._EXT_DATE, value.isoformat().encode())
+        if isinstance(value, uuid.UUID):
+            return ext(self._EXT_UUID, value.bytes)
+        return str(value)
+
+    def _ext_hook(self, code, data):
+        if code == self._EXT_DECIMAL:
+            return Decimal(data.decode())
+        if code == self._EXT_DATETIME:
+            return datetime.datetime.fromisoformat(data.decode())
+        if code == self._EXT_DATE:
+            return datetime.date.fromisoformat(data.decode())
+        if code == self._EXT_UUID:
+            return uuid.UUID(bytes=data)
+        return self._msgpack.ExtType(code, data)
+
+    def encode(self, value) -> bytes:
+        return self._msgpack.packb(value, default=self._default, use_bin_type=True)
+
+    def decode(self, data: bytes):
+        return self._msgpack.unpackb(data, ext_hook=self._ext_hook, raw=False)
+
+
+_codecs = {"j": JSONCodec()}
+try:
+    _codecs["m"] = MsgpackCodec()
+except ImportError:
+    pass
+
+if CODEC == "msgpack" and "m" not in _codecs:
+    logger.warning("msgpack não instalado, cache usando JSON")
+_codec = _codecs["m"] if CODEC == "msgpack" and "m" in _codecs else _codecs["j"]
+
+
+def _encode(value) -> str:
+    """
+    Serializa um valor para o payload gravado no Redis (sempre str).
+
+    JSON sem compressão é gravado como texto puro; os demais formatos usam
+    o cabeçalho "<codec>[z]:" seguido de base64.
+    """
+    data = _codec.encode(value)
+    raw_size = len(data)
+    compressed = raw_size >= COMPRESS_MIN_BYTES
+    if compressed:
+        data = zlib.compress(data, COMPRESS_LEVEL)
+
+    if _codec.name == "j" and not compressed:
+        payload = data.decode()
+    else:
+        header = f"{_codec.name}{'z' if compressed else ''}:"
+        payload = header + base64.b64encode(data).decode("ascii")
+
+    _count("raw_bytes_written", raw_size)
+    _count("bytes_written", len(payload))
+    if compressed:
+        _count("compressed_writes")
+    return payload
+
+
+def _decode(payload):
+    """Deserializa um payload gravado por _encode (ou JSON legado)."""
+    if not isinstance(payload, str):
+        return payload
+
+    header, sep, body = payload[:4].partition(":")
+    if not sep or not header.isalpha():
+        # JSON sem cabeçalho (true/false/null não têm ":" nos 4 primeiros caracteres)
+        return _codecs["j"].decode(payload.encode())
+
+    codec = _codecs.get(header[0])
+    if codec is None:
+        raise ValueError(f"Codec de cache indisponível: {header[0]!r}")
+    data = base64.b64decode(payload[len(header) + 1:])
+    if header.endswith("z"):
+        data = zlib.decompress(data)
+    return codec.decode(data)
+
+
 def cache_get(key: str):
     """
-    Recupera valor do cache.
+    Recupera valor do cache (L1 em memória, depois L2).
 
     Args:
         key: Chave do cache
@@ -78,36 +446,328 @@ def cache_get(key: str):
     if not client:
         return None
 
+    version = None
+    if L1_ENABLED:
+        version = _current_version(client)
+        payload = _local_cache.get(key, version)
+        if payload is not None:
+            _count("l1_hits")
+            return _decode(payload)
+        _count("l1_misses")
+
     try:
         value = client.get(key)
         if value:
-            return json.loads(value) if isinstance(value, str) else value
+            return _accept_l2_value(key, value, version)
+        _count("l2_misses")
         return None
     except Exception as e:
         logger.warning(f"Erro ao ler cache [{key}]: {e}")
         return None
 
 
-def cache_set(key: str, value, ttl: int = 300):
+def _accept_l2_value(key: str, value, version):
+    """Deserializa um payload lido do L2, registra métricas e preenche o L1."""
+    decoded = _decode(value)
+    _count("l2_hits")
+    if isinstance(value, str):
+        _count("bytes_read", len(value))
+        if version is not None:
+            _local_cache.set(key, value, L1_MAX_TTL, version)
+    return decoded
+
+
+def _tag_key(tag: str) -> str:
+    return f"{CACHE_TAG_PREFIX}{tag}"
+
+
+def _queue_tags(pipeline, key: str, tags):
+    """Registra a chave nos sets das tags (no mesmo pipeline da escrita)."""
+    for tag in tags:
+        pipeline.sadd(_tag_key(tag), key)
+        pipeline.expire(_tag_key(tag), TAG_TTL)
+
+
+def cache_set(key: str, value, ttl: int = 300, tags: list = None):
     """
     Armazena valor no cache.
 
     Args:
         key: Chave do cache
-        value: Valor a armazenar (será serializado para JSON)
+        value: Valor a armazenar (serializado pelo codec configurado)
         ttl: Tempo de vida em segundos (padrão: 5 minutos)
+        tags: Tags para invalidação em grupo (ver cache_invalidate_tags)
     """
     client = _get_client()
     if not client:
         return
 
     try:
-        serialized = json.dumps(value, default=str)
-        client.set(key, serialized, ex=ttl)
+        serialized = _encode(value)
+        if tags:
+            pipeline = client.pipeline()
+            pipeline.set(key, serialized, ex=ttl)
+            _queue_tags(pipeline, key, tags)
+            _execute_pipeline(pipeline)
+        else:
+            client.set(key, serialized, ex=ttl)
+        if L1_ENABLED:
+            _local_cache.set(key, serialized, min(ttl, L1_MAX_TTL), _current_version(client))
     except Exception as e:
         logger.warning(f"Erro ao escrever cache [{key}]: {e}")
 
 
+def cache_get_many(keys: list) -> dict:
+    """
+    Recupera várias chaves do cache em um único round trip (MGET).
+
+    Chaves presentes no L1 não vão ao L2; as demais são buscadas juntas.
+
+    Args:
+        keys: Lista de chaves
+
+    Returns:
+        Dict {chave: valor} apenas com as chaves encontradas
+    """
+    client = _get_client()
+    if not client or not keys:
+        return {}
+
+    result = {}
+    missing = list(keys)
+    version = None
+    if L1_ENABLED:
+        version = _current_version(client)
+        missing = []
+        for key in keys:
+            payload = _local_cache.get(key, version)
+            if payload is not None:
+                _count("l1_hits")
+                result[key] = _decode(payload)
+            else:
+                _count("l1_misses")
+                missing.append(key)
+
+    if not missing:
+        return result
+
+    try:
+        values = client.mget(*missing)
+    except Exception as e:
+        logger.warning(f"Erro ao ler cache em lote {missing}: {e}")
+        return result
+
+    for key, value in zip(missing, values):
+        if not value:
+            _count("l2_misses")
+            continue
+        try:
+            result[key] = _accept_l2_value(key, value, version)
+        except Exception as e:
+            logger.warning(f"Erro ao ler cache [{key}]: {e}")
+    return result
+
+
+def _execute_pipeline(pipeline):
+    """Executa o pipeline (redis-py usa execute(), upstash-redis usa exec())."""
+    execute = getattr(pipeline, "execute", None) or pipeline.exec
+    return execute()
+
+
+def cache_set_many(mapping: dict, ttl: int = 300, ttls: dict = None, tags: dict = None):
+    """
+    Armazena várias chaves no cache em um único round trip (pipeline).
+
+    Args:
+        mapping: Dict {chave: valor} (serializados pelo codec configurado)
+        ttl: Tempo de vida padrão em segundos
+        ttls: Dict opcional {chave: ttl} para chaves com TTL próprio
+        tags: Dict opcional {chave: [tags]} para invalidação em grupo
+    """
+    client = _get_client()
+    if not client or not mapping:
+        return
+
+    try:
+        serialized = {key: _encode(value) for key, value in mapping.items()}
+        ttls = ttls or {}
+        tags = tags or {}
+        pipeline = client.pipeline()
+        for key, payload in serialized.items():
+            pipeline.set(key, payload, ex=ttls.get(key, ttl))
+            _queue_tags(pipeline, key, tags.get(key, ()))
+        _execute_pipeline(pipeline)
+        if L1_ENABLED:
+            version = _current_version(client)
+            for key, payload in serialized.items():
+                _local_cache.set(key, payload, min(ttls.get(key, ttl), L1_MAX_TTL), version)
+    except Exception as e:
+        logger.warning(f"Erro ao escrever cache em lote {list(mapping)}: {e}")
+
+
+def _is_fresh(entry, now: float, beta: float = EARLY_REFRESH_BETA) -> bool:
+    """
+    Verifica se um envelope de get_or_compute ainda deve ser servido.
+
+    Aplica refresh antecipado probabilístico (XFetch): quanto mais perto de
+    expirar e mais caro o cálculo (delta), maior a chance de um worker
+    recalcular antes da expiração, espalhando os recálculos no tempo.
+    """
+    if not isinstance(entry, dict) or "exp" not in entry:
+        return False
+    gap = entry.get("delta", 0) * beta * -math.log(1.0 - random.random())
+    return now + gap < entry["exp"]
+
+
+def _compute_envelope(compute) -> dict:
+    start = time.monotonic()
+    value = compute()
+    return {"v": value, "delta": time.monotonic() - start}
+
+
+def cache_get_or_compute_many(specs: dict) -> dict:
+    """
+    Versão em lote de cache_get_or_compute.
+
+    Faz um MGET para todas as chaves, um pipeline de SET NX para os locks das
+    que precisam ser recalculadas e um pipeline final gravando os valores e
+    liberando os locks.
+
+    Args:
+        specs: Dict {chave: (compute, ttl, tags)}; tags pode ser None
+
+    Returns:
+        Dict {chave: valor} com todas as chaves de specs
+    """
+    client = _get_client()
+    if not client:
+        return {key: compute() for key, (compute, _, _) in specs.items()}
+
+    now = time.time()
+    entries = cache_get_many(list(specs))
+    result = {}
+    pending = []
+    for key in specs:
+        entry = entries.get(key)
+        if _is_fresh(entry, now):
+            result[key] = entry["v"]
+        else:
+            pending.append(key)
+
+    # Envelopes vencidos podem ter vindo do L1 enquanto outro worker já
+    # gravou um valor novo no L2: relê do L2 antes de disputar o lock
+    stale_keys = [key for key in pending if key in entries]
+    if stale_keys:
+        for key in stale_keys:
+            _local_cache.delete(key)
+        entries.update(cache_get_many(stale_keys))
+        for key in stale_keys:
+            if _is_fresh(entries.get(key), now):
+                result[key] = entries[key]["v"]
+                pending.remove(key)
+
+    if not pending:
+        return result
+
+    try:
+        pipeline = client.pipeline()
+        for key in pending:
+            pipeline.set(f"{CACHE_LOCK_PREFIX}{key}", "1", nx=True, ex=LOCK_TTL)
+        acquired = _execute_pipeline(pipeline)
+    except Exception as e:
+        logger.warning(f"Erro ao adquirir locks de cache {pending}: {e}")
+        acquired = [True] * len(pending)
+
+    computed = {}
+    owned = [key for key, owns_lock in zip(pending, acquired) if owns_lock]
+    try:
+        for key, owns_lock in zip(pending, acquired):
+            compute = specs[key][0]
+            entry = entries.get(key)
+            if owns_lock:
+                computed[key] = _compute_envelope(compute)
+                result[key] = computed[key]["v"]
+            elif isinstance(entry, dict) and "v" in entry:
+                # Stale-while-revalidate: outro worker já está recalculando
+                result[key] = entry["v"]
+            else:
+                result[key] = _wait_for_value(key, compute)
+    finally:
+        # Mesmo se um compute() falhar: grava o que já foi calculado e libera
+        # os locks das chaves que não chegaram a ser gravadas, para os outros
+        # workers não esperarem LOCK_TTL por um valor que não virá
+        failed = [key for key in owned if key not in computed]
+        if computed or failed:
+            _store_envelopes(client, computed, specs, release=failed)
+    return result
+
+
+def cache_get_or_compute(key: str, compute, ttl: int = 300, tags: list = None):
+    """
+    Recupera do cache ou calcula, com proteção contra stampede.
+
+    - Apenas o worker que obtém o lock (SET NX) recalcula o valor.
+    - Os demais recebem o valor antigo (stale) enquanto o recálculo ocorre;
+      sem valor antigo, aguardam até LOCK_WAIT segundos pelo novo valor.
+    - Perto da expiração, o valor é recalculado antecipadamente de forma
+      probabilística (XFetch), evitando que todos expirem juntos.
+
+    O valor fica disponível como stale por mais `ttl` segundos após expirar.
+
+    Args:
+        key: Chave do cache
+        compute: Função sem argumentos que calcula o valor
+        ttl: Tempo de vida (fresco) em segundos
+        tags: Tags para invalidação em grupo
+
+    Returns:
+        Valor do cache ou recém-calculado
+    """
+    return cache_get_or_compute_many({key: (compute, ttl, tags)})[key]
+
+
+def _wait_for_value(key: str, compute):
+    """Aguarda o worker que detém o lock gravar o valor; senão calcula localmente."""
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        entry = cache_get(key)
+        if isinstance(entry, dict) and "v" in entry:
+            return entry["v"]
+    logger.debug(f"Timeout aguardando recálculo de [{key}], calculando localmente")
+    return compute()
+
+
+def _store_envelopes(client, computed: dict, specs: dict, release=()):
+    """
+    Grava os envelopes recalculados e libera os locks em um único pipeline.
+
+    Args:
+        release: Chaves sem valor novo (compute() falhou) cujo lock também
+            deve ser liberado
+    """
+    now = time.time()
+    serialized = {}
+    try:
+        pipeline = client.pipeline()
+        for key, envelope in computed.items():
+            _, ttl, tags = specs[key]
+            envelope["exp"] = now + ttl
+            serialized[key] = _encode(envelope)
+            pipeline.set(key, serialized[key], ex=ttl * 2)
+            _queue_tags(pipeline, key, tags or ())
+        pipeline.delete(*[f"{CACHE_LOCK_PREFIX}{key}" for key in [*computed, *release]])
+        _execute_pipeline(pipeline)
+    except Exception as e:
+        logger.warning(f"Erro ao gravar cache {list(computed) + list(release)}: {e}")
+        return
+
+    if L1_ENABLED:
+        version = _current_version(client)
+        for key, payload in serialized.items():
+            _local_cache.set(key, payload, min(specs[key][1], L1_MAX_TTL), version)
+
+
 def cache_delete(key: str):
     """
     Remove chave do cache.
@@ -115,6 +775,7 @@ def cache_delete(key: str):
     Args:
         key: Chave a remover
     """
+    _local_cache.delete(key)
     client = _get_client()
     if not client:
         return
@@ -125,25 +786,40 @@ def cache_delete(key: str):
         logger.warning(f"Erro ao deletar cache [{key}]: {e}")
 
 
-def cache_clear_pattern(pattern: str):
+def cache_invalidate_tags(*tags: str):
     """
-    Remove todas as chaves que correspondem ao padrão.
+    Remove todas as chaves registradas nas tags informadas.
+
+    Custo O(tamanho das tags): um pipeline de SMEMBERS e um único DEL,
+    sem varrer o keyspace (KEYS/SCAN). Também descarta o L1 de todos
+    os workers (ver bump_cache_version).
 
     Args:
-        pattern: Padrão glob (ex: "dashboard_*")
+        tags: Tags a invalidar (ex: "dashboard", "user:42")
     """
+    if not tags:
+        return
+
     client = _get_client()
     if not client:
+        _local_cache.clear()
         return
 
+    tag_keys = [_tag_key(tag) for tag in tags]
     try:
-        # Upstash não suporta SCAN, usa KEYS (ok para poucos dados)
-        keys = client.keys(pattern)
-        if keys:
-            for key in keys:
-                client.delete(key)
+        pipeline = client.pipeline()
+        for tag_key in tag_keys:
+            pipeline.smembers(tag_key)
+        members = _execute_pipeline(pipeline)
+
+        keys = set()
+        for tag_members in members:
+            keys.update(tag_members or ())
+        client.delete(*keys, *tag_keys)
     except Exception as e:
-        logger.warning(f"Erro ao limpar cache [{pattern}]: {e}")
+        logger.warning(f"Erro ao invalidar tags de cache {tags}: {e}")
+
+    bump_cache_version()
 
 
 # Constantes de chaves de cache
@@ -155,6 +831,11 @@ CACHE_DIRECTIONS_LIST = "directions_list"
 CACHE_MATERIALS_LIST = "materials_list"
 CACHE_BIDDINGS_LIST = "biddings_list"
 
+# Tags de invalidação
+TAG_DASHBOARD = "dashboard"
+TAG_DASHBOARD_CHARTS = "dashboard:charts"
+TAG_USER = "user:"  # + id do usuário
+
 # TTLs padrão (em segundos)
 TTL_SHORT = 60        # 1 minuto
 TTL_MEDIUM = 300      # 5 minutos
@@ -162,9 +843,18 @@ TTL_LONG = 1800       # 30 minutos
 TTL_HOUR = 3600       # 1 hora
 
 
+# Invalidações pendentes de CachedLists.deferred() (por thread)
+_deferred_invalidations = threading.local()
+
+
 class CachedLists:
     """
     Cache para listas frequentemente acessadas.
+
+    As leituras usam cache_get_or_compute: expirar uma lista não dispara a
+    mesma query em todos os workers ao mesmo tempo.
+    As invalidações incrementam a versão global do cache, descartando
+    o L1 de todos os workers (ver bump_cache_version).
     
     Uso:
         # Na view
@@ -179,103 +869,128 @@ class CachedLists:
         """Retorna lista de fornecedores (cacheada por 30 min)."""
         from bidding_supplier.models import Supplier
         
-        cached = cache_get(CACHE_SUPPLIERS_LIST)
-        if cached:
-            return cached
-        
         # Query otimizada
-        data = list(Supplier.objects.values('id', 'trade', 'cnpj', 'slug').order_by('trade'))
-        cache_set(CACHE_SUPPLIERS_LIST, data, ttl=TTL_LONG)
-        return data
+        return cache_get_or_compute(
+            CACHE_SUPPLIERS_LIST,
+            lambda: list(Supplier.objects.values('id', 'trade', 'cnpj', 'slug').order_by('trade')),
+            ttl=TTL_LONG,
+        )
     
     @staticmethod
     def get_sectors():
         """Retorna lista de setores (cacheada por 30 min)."""
         from organizational_structure.models import Sector
         
-        cached = cache_get(CACHE_SECTORS_LIST)
-        if cached:
-            return cached
-        
-        data = list(Sector.objects.select_related('direction').values(
-            'id', 'name', 'slug', 'direction__name'
-        ).order_by('name'))
-        cache_set(CACHE_SECTORS_LIST, data, ttl=TTL_LONG)
-        return data
+        return cache_get_or_compute(
+            CACHE_SECTORS_LIST,
+            lambda: list(Sector.objects.select_related('direction').values(
+                'id', 'name', 'slug', 'direction__name'
+            ).order_by('name')),
+            ttl=TTL_LONG,
+        )
     
     @staticmethod
     def get_directions():
         """Retorna lista de diretorias (cacheada por 30 min)."""
         from organizational_structure.models import Direction
         
-        cached = cache_get(CACHE_DIRECTIONS_LIST)
-        if cached:
-            return cached
-        
-        data = list(Direction.objects.values('id', 'name', 'slug').order_by('name'))
-        cache_set(CACHE_DIRECTIONS_LIST, data, ttl=TTL_LONG)
-        return data
+        return cache_get_or_compute(
+            CACHE_DIRECTIONS_LIST,
+            lambda: list(Direction.objects.values('id', 'name', 'slug').order_by('name')),
+            ttl=TTL_LONG,
+        )
     
     @staticmethod
     def get_materials():
         """Retorna lista de materiais (cacheada por 30 min)."""
         from bidding_procurement.models import Material
         
-        cached = cache_get(CACHE_MATERIALS_LIST)
-        if cached:
-            return cached
-        
-        data = list(Material.objects.values('id', 'name', 'slug').order_by('name'))
-        cache_set(CACHE_MATERIALS_LIST, data, ttl=TTL_LONG)
-        return data
+        return cache_get_or_compute(
+            CACHE_MATERIALS_LIST,
+            lambda: list(Material.objects.values('id', 'name', 'slug').order_by('name')),
+            ttl=TTL_LONG,
+        )
     
     @staticmethod
     def get_biddings_active():
         """Retorna lista de licitações ativas (cacheada por 30 min)."""
         from bidding_procurement.models import Bidding
         
-        cached = cache_get(CACHE_BIDDINGS_LIST)
-        if cached:
-            return cached
-        
-        data = list(Bidding.objects.filter(status='1').values(
-            'id', 'name', 'slug', 'number_bidding'
-        ).order_by('name'))
-        cache_set(CACHE_BIDDINGS_LIST, data, ttl=TTL_LONG)
-        return data
+        return cache_get_or_compute(
+            CACHE_BIDDINGS_LIST,
+            lambda: list(Bidding.objects.filter(status='1').values(
+                'id', 'name', 'slug', 'number_bidding'
+            ).order_by('name')),
+            ttl=TTL_LONG,
+        )
     
     # --- Invalidação ---
     
+    @staticmethod
+    @contextmanager
+    def deferred():
+        """
+        Agrupa as invalidações feitas dentro do bloco (pelos signals ou
+        chamadas diretas) e executa cada uma uma única vez na saída, com um
+        só incremento da versão global. Para importações em lote.
+        
+        Uso:
+            with CachedLists.deferred(), transaction.atomic():
+                ...  # centenas de saves/bulk_create
+        """
+        if getattr(_deferred_invalidations, 'keys', None) is not None:
+            yield  # bloco aninhado: o externo invalida
+            return
+        _deferred_invalidations.keys = set()
+        try:
+            yield
+        finally:
+            keys, _deferred_invalidations.keys = _deferred_invalidations.keys, None
+            for key in keys:
+                cache_delete(key)
+            if keys:
+                bump_cache_version()
+    
+    @staticmethod
+    def _invalidate(key):
+        pending = getattr(_deferred_invalidations, 'keys', None)
+        if pending is not None:
+            pending.add(key)
+            return
+        cache_delete(key)
+        bump_cache_version()
+    
     @staticmethod
     def invalidate_suppliers():
         """Invalida cache de fornecedores."""
-        cache_delete(CACHE_SUPPLIERS_LIST)
+        CachedLists._invalidate(CACHE_SUPPLIERS_LIST)
     
     @staticmethod
     def invalidate_sectors():
         """Invalida cache de setores."""
-        cache_delete(CACHE_SECTORS_LIST)
+        CachedLists._invalidate(CACHE_SECTORS_LIST)
     
     @staticmethod
     def invalidate_directions():
         """Invalida cache de diretorias."""
-        cache_delete(CACHE_DIRECTIONS_LIST)
+        CachedLists._invalidate(CACHE_DIRECTIONS_LIST)
     
     @staticmethod
     def invalidate_materials():
         """Invalida cache de materiais."""
-        cache_delete(CACHE_MATERIALS_LIST)
+        CachedLists._invalidate(CACHE_MATERIALS_LIST)
     
     @staticmethod
     def invalidate_biddings():
         """Invalida cache de licitações."""
-        cache_delete(CACHE_BIDDINGS_LIST)
+        CachedLists._invalidate(CACHE_BIDDINGS_LIST)
     
     @staticmethod
     def invalidate_all():
         """Invalida todos os caches de listas."""
-        CachedLists.invalidate_suppliers()
-        CachedLists.invalidate_sectors()
-        CachedLists.invalidate_directions()
-        CachedLists.invalidate_materials()
-        CachedLists.invalidate_biddings()
+        for key in (
+            CACHE_SUPPLIERS_LIST, CACHE_SECTORS_LIST, CACHE_DIRECTIONS_LIST,
+            CACHE_MATERIALS_LIST, CACHE_BIDDINGS_LIST,
+        ):
+            cache_delete(key)
+        bump_cache_version()
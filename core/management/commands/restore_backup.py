@@ -5,6 +5,7 @@ Pode ser chamado via URL protegida ou linha de comando.
 from django.core.management.base import BaseCommand
 from django.core.management import call_command
 from pathlib import Path
+from audit.bulk import bulk as audit_bulk
 
 
 class Command(BaseCommand):
@@ -64,7 +65,13 @@ class Command(BaseCommand):
         
         try:
             self.stdout.write('⏳ Carregando dados...')
-            call_command('loaddata', str(fixture_path), verbosity=1)
+            # Auditoria agrupada: um resumo por model em vez de um log por registro
+            with audit_bulk('restore_backup'):
+                call_command('loaddata', str(fixture_path), verbosity=1)
+            # loaddata não passa pelo InvoiceItem.save() nem pelos signals:
+            # recalcula totais das notas e o resumo de saldos dos materiais
+            call_command('rebuild_invoice_totals', verbosity=0)
+            call_command('refresh_material_balances', verbosity=0)
             self.stdout.write(self.style.SUCCESS('✅ Dados restaurados com sucesso!'))
         except Exception as e:
             self.stdout.write(self.style.ERROR(f'❌ Erro ao restaurar: {e}'))
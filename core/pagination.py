@@ -0,0 +1,122 @@
+"""
+Paginação por keyset (seek) para listagens grandes.
+
+Em vez de OFFSET (que lê e descarta todas as linhas anteriores), cada página
+continua a partir dos valores de ordenação da última linha vista:
+
+    WHERE (a, b, id) > (:a, :b, :id) ORDER BY a, b, id LIMIT n + 1
+
+O custo de uma página não cresce com a posição na listagem. O cursor é opaco
+para o usuário (JSON em base64) e vai na querystring.
+
+Uso:
+    paginator = KeysetPaginator(queryset, ('bidding__name', 'material__name', 'id'), per_page=50)
+    page = paginator.page(after=request.GET.get('apos'), before=request.GET.get('antes'))
+    page.object_list, page.next_cursor, page.previous_cursor
+"""
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from typing import Optional
+
+from django.db.models import F, Q
+
+
+@dataclass
+class KeysetPage:
+    """Uma página da paginação por keyset."""
+    object_list: list
+    next_cursor: Optional[str] = None
+    previous_cursor: Optional[str] = None
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self) -> bool:
+        return self.previous_cursor is not None
+
+    @property
+    def has_other_pages(self) -> bool:
+        return self.has_next or self.has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """
+    Pagina um queryset por keyset, em ordem crescente dos campos informados.
+
+    O último campo deve ser único (normalmente 'id') para desempatar. Os
+    campos não podem ser nulos (NULL não participa de comparações).
+    """
+
+    def __init__(self, queryset, ordering: tuple, per_page: int = 50):
+        self.ordering = tuple(ordering)
+        self.per_page = per_page
+        self.keys = [f'keyset_{i}' for i in range(len(self.ordering))]
+        self.queryset = queryset.annotate(
+            **{key: F(field) for key, field in zip(self.keys, self.ordering)}
+        )
+
+    def page(self, after: str = None, before: str = None) -> KeysetPage:
+        """
+        Página seguinte a `after` ou anterior a `before` (cursores de uma
+        página já exibida); sem cursor válido, a primeira página.
+        """
+        before_values = self.decode(before)
+        if before_values is not None:
+            rows = list(
+                self.queryset.filter(self._seek(before_values, 'lt'))
+                .order_by(*[F(key).desc() for key in self.keys])[:self.per_page + 1]
+            )
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            return KeysetPage(
+                object_list=rows,
+                next_cursor=self._cursor(rows[-1]) if rows else None,
+                previous_cursor=self._cursor(rows[0]) if has_previous else None,
+            )
+
+        after_values = self.decode(after)
+        queryset = self.queryset
+        if after_values is not None:
+            queryset = queryset.filter(self._seek(after_values, 'gt'))
+        rows = list(queryset.order_by(*self.keys)[:self.per_page + 1])
+        has_next = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        return KeysetPage(
+            object_list=rows,
+            next_cursor=self._cursor(rows[-1]) if has_next else None,
+            previous_cursor=self._cursor(rows[0]) if after_values is not None and rows else None,
+        )
+
+    def decode(self, cursor: str):
+        """Valores de ordenação do cursor, ou None se ausente/inválido."""
+        if not cursor:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (binascii.Error, ValueError, UnicodeDecodeError):
+            return None
+        if not isinstance(values, list) or len(values) != len(self.keys):
+            return None
+        return values
+
+    def _cursor(self, obj) -> str:
+        values = [getattr(obj, key) for key in self.keys]
+        return base64.urlsafe_b64encode(json.dumps(values, default=str).encode()).decode()
+
+    def _seek(self, values, lookup: str) -> Q:
+        # (a > x) OR (a = x AND b > y) OR (a = x AND b = y AND c > z)
+        condition = Q()
+        for i, key in enumerate(self.keys):
+            equal = {self.keys[j]: values[j] for j in range(i)}
+            condition |= Q(**equal, **{f'{key}__{lookup}': values[i]})
+        return condition
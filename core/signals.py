@@ -2,6 +2,8 @@
 Signals para invalidação automática de cache.
 
 Quando um modelo é criado, editado ou deletado, o cache correspondente é invalidado.
+As invalidações incrementam a versão global do cache, o que faz o L1 em memória
+de todos os workers descartar entradas antigas (ver core.cache.bump_cache_version).
 """
 import logging
 from django.db.models.signals import post_save, post_delete
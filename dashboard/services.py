@@ -9,8 +9,9 @@ from reports.models import Report, MaterialReport
 from authenticate.models import ProfessionalUser
 from bidding_supplier.models import Supplier
 from core.cache import (
-    cache_get, cache_set, cache_delete,
+    cache_get_or_compute, cache_get_or_compute_many, cache_invalidate_tags,
     CACHE_DASHBOARD_STATS, CACHE_DASHBOARD_CHARTS,
+    TAG_DASHBOARD, TAG_DASHBOARD_CHARTS, TAG_USER,
     TTL_MEDIUM, TTL_LONG
 )
 
@@ -22,6 +23,58 @@ class DashboardService:
     Serviço responsável pela agregação de dados para o Dashboard.
     """
 
+    # Tags dos gráficos/calendário (compartilhados entre usuários)
+    _CHART_TAGS = [TAG_DASHBOARD, TAG_DASHBOARD_CHARTS]
+
+    @staticmethod
+    def get_index_data(user: ProfessionalUser, period_days: int = 30) -> Dict[str, Any]:
+        """
+        Retorna todos os blocos cacheados da página inicial do dashboard.
+
+        Busca as chaves de todos os blocos em um único round trip (MGET) e
+        grava os que faltaram em um único pipeline, em vez de um cache_get
+        por bloco. Blocos vencidos são recalculados por um único worker
+        (ver cache_get_or_compute_many).
+
+        Args:
+            user: O usuário logado.
+            period_days: Período dos gráficos de setor e materiais.
+
+        Returns:
+            dict: {'stats', 'sector_data', 'materials_data', 'calendar_events'}
+        """
+        keys = {
+            'stats': DashboardService._stats_key(user),
+            'sector_data': DashboardService._sector_key(period_days),
+            'materials_data': DashboardService._materials_key(period_days, 10),
+            'calendar_events': DashboardService._calendar_key(),
+        }
+        specs = {
+            keys['stats']: (
+                lambda: DashboardService._compute_dashboard_data(user),
+                TTL_MEDIUM,
+                DashboardService._stats_tags(user),
+            ),
+            keys['sector_data']: (
+                lambda: DashboardService._compute_reports_by_sector(period_days),
+                TTL_LONG,
+                DashboardService._CHART_TAGS,
+            ),
+            keys['materials_data']: (
+                lambda: DashboardService._compute_top_materials_by_period(period_days, 10),
+                TTL_LONG,
+                DashboardService._CHART_TAGS,
+            ),
+            keys['calendar_events']: (
+                DashboardService._compute_recent_reports_for_calendar,
+                TTL_LONG,
+                DashboardService._CHART_TAGS,
+            ),
+        }
+
+        values = cache_get_or_compute_many(specs)
+        return {name: values[key] for name, key in keys.items()}
+
     @staticmethod
     def get_dashboard_data(user: ProfessionalUser) -> Dict[str, Any]:
         """
@@ -36,34 +89,12 @@ class DashboardService:
         Cache: 5 minutos (TTL_MEDIUM)
         """
         # Chave de cache específica por usuário (para dados personalizados)
-        cache_key = f"{CACHE_DASHBOARD_STATS}_{user.id}"
-        
-        # Tenta recuperar do cache
-        cached_data = cache_get(cache_key)
-        if cached_data:
-            logger.debug(f"Dashboard stats from cache for user {user.id}")
-            return cached_data
-        
-        # Contadores para cards
-        total_reports = Report.objects.count()
-        total_reports_user = Report.objects.filter(professional=user).count()
-        pending_reports = Report.objects.filter(status='P').count()
-        total_suppliers = Supplier.objects.count()
-        total_sectors = Sector.objects.count()
-        
-        data = {
-            'total_reports': total_reports,
-            'total_reports_user': total_reports_user,
-            'pending_reports': pending_reports,
-            'total_suppliers': total_suppliers,
-            'total_sectors': total_sectors,
-        }
-        
-        # Salva no cache
-        cache_set(cache_key, data, ttl=TTL_MEDIUM)
-        logger.debug(f"Dashboard stats cached for user {user.id}")
-        
-        return data
+        return cache_get_or_compute(
+            DashboardService._stats_key(user),
+            lambda: DashboardService._compute_dashboard_data(user),
+            ttl=TTL_MEDIUM,
+            tags=DashboardService._stats_tags(user),
+        )
 
     @staticmethod
     def get_reports_by_sector(period_days: int = 30) -> List[Dict[str, Any]]:
@@ -72,24 +103,12 @@ class DashboardService:
         
         Cache: 10 minutos
         """
-        cache_key = f"{CACHE_DASHBOARD_CHARTS}_sector_{period_days}"
-        
-        cached_data = cache_get(cache_key)
-        if cached_data:
-            return cached_data
-        
-        start_date = timezone.now() - timedelta(days=period_days)
-
-        stats = Report.objects.filter(
-            created_at__gte=start_date
-        ).values('sector__name').annotate(
-            count=Count('id')
-        ).order_by('-count')
-
-        data = list(stats)
-        cache_set(cache_key, data, ttl=TTL_LONG)  # 30 min
-        
-        return data
+        return cache_get_or_compute(
+            DashboardService._sector_key(period_days),
+            lambda: DashboardService._compute_reports_by_sector(period_days),
+            ttl=TTL_LONG,  # 30 min
+            tags=DashboardService._CHART_TAGS,
+        )
 
     @staticmethod
     def get_top_materials(limit: int = 10) -> List[Dict[str, Any]]:
@@ -122,12 +141,76 @@ class DashboardService:
         - Usa values() para evitar criar objetos Report
         - Cache de 30 minutos
         """
-        cache_key = f"{CACHE_DASHBOARD_CHARTS}_calendar"
-        
-        cached_data = cache_get(cache_key)
-        if cached_data:
-            return cached_data
+        return cache_get_or_compute(
+            DashboardService._calendar_key(),
+            DashboardService._compute_recent_reports_for_calendar,
+            ttl=TTL_LONG,  # 30 min
+            tags=DashboardService._CHART_TAGS,
+        )
+
+    @staticmethod
+    def get_top_materials_by_period(period_days: int = 30, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Retorna os materiais mais adquiridos (via Notas Fiscais) com licitação ativa.
         
+        Cache: 30 minutos
+        """
+        return cache_get_or_compute(
+            DashboardService._materials_key(period_days, limit),
+            lambda: DashboardService._compute_top_materials_by_period(period_days, limit),
+            ttl=TTL_LONG,  # 30 min
+            tags=DashboardService._CHART_TAGS,
+        )
+
+    # --- Chaves e tags de cache ---
+
+    @staticmethod
+    def _stats_tags(user: ProfessionalUser) -> List[str]:
+        return [TAG_DASHBOARD, f"{TAG_USER}{user.id}"]
+
+    @staticmethod
+    def _stats_key(user: ProfessionalUser) -> str:
+        return f"{CACHE_DASHBOARD_STATS}_{user.id}"
+
+    @staticmethod
+    def _sector_key(period_days: int) -> str:
+        return f"{CACHE_DASHBOARD_CHARTS}_sector_{period_days}"
+
+    @staticmethod
+    def _materials_key(period_days: int, limit: int) -> str:
+        return f"{CACHE_DASHBOARD_CHARTS}_materials_{period_days}_{limit}"
+
+    @staticmethod
+    def _calendar_key() -> str:
+        return f"{CACHE_DASHBOARD_CHARTS}_calendar"
+
+    # --- Consultas (sem cache) ---
+
+    @staticmethod
+    def _compute_dashboard_data(user: ProfessionalUser) -> Dict[str, Any]:
+        # Contadores para cards
+        return {
+            'total_reports': Report.objects.count(),
+            'total_reports_user': Report.objects.filter(professional=user).count(),
+            'pending_reports': Report.objects.filter(status='P').count(),
+            'total_suppliers': Supplier.objects.count(),
+            'total_sectors': Sector.objects.count(),
+        }
+
+    @staticmethod
+    def _compute_reports_by_sector(period_days: int) -> List[Dict[str, Any]]:
+        start_date = timezone.now() - timedelta(days=period_days)
+
+        stats = Report.objects.filter(
+            created_at__gte=start_date
+        ).values('sector__name').annotate(
+            count=Count('id')
+        ).order_by('-count')
+
+        return list(stats)
+
+    @staticmethod
+    def _compute_recent_reports_for_calendar() -> List[Dict[str, Any]]:
         # Usa values para evitar criar objetos Report (mais rápido)
         reports = Report.objects.select_related('sector').order_by(
             '-created_at'
@@ -150,23 +233,10 @@ class DashboardService:
                     'status': status_display
                 }
             })
-        
-        cache_set(cache_key, events, ttl=TTL_LONG)  # 30 min
         return events
 
     @staticmethod
-    def get_top_materials_by_period(period_days: int = 30, limit: int = 10) -> List[Dict[str, Any]]:
-        """
-        Retorna os materiais mais adquiridos (via Notas Fiscais) com licitação ativa.
-        
-        Cache: 30 minutos
-        """
-        cache_key = f"{CACHE_DASHBOARD_CHARTS}_materials_{period_days}_{limit}"
-        
-        cached_data = cache_get(cache_key)
-        if cached_data:
-            return cached_data
-        
+    def _compute_top_materials_by_period(period_days: int, limit: int) -> List[Dict[str, Any]]:
         from fiscal.models import InvoiceItem
         
         start_date = timezone.now() - timedelta(days=period_days)
@@ -182,37 +252,27 @@ class DashboardService:
             total_qty=Sum('quantity')
         ).order_by('-total_qty')[:limit]
 
-        data = [
+        return [
             {
                 'name': item['material_bidding__material__name'],
                 'qty': item['total_qty']
             }
             for item in stats if item['material_bidding__material__name']
         ]
-        
-        cache_set(cache_key, data, ttl=TTL_LONG)  # 30 min
-        
-        return data
     
     @staticmethod
     def invalidate_dashboard_cache(user_id: int = None):
         """
-        Invalida o cache do dashboard.
+        Invalida o cache do dashboard via tags (sem varrer o keyspace).
         
         Args:
-            user_id: Se fornecido, invalida apenas para o usuário específico.
-                     Se None, invalida todos os caches de dashboard.
+            user_id: Se fornecido, invalida as estatísticas desse usuário
+                     e os gráficos. Se None, invalida todo o dashboard
+                     (estatísticas de todos os usuários, gráficos e calendário).
         """
         if user_id:
-            cache_delete(f"{CACHE_DASHBOARD_STATS}_{user_id}")
+            cache_invalidate_tags(f"{TAG_USER}{user_id}", TAG_DASHBOARD_CHARTS)
         else:
-            # Invalida stats de todos os usuários (não ideal, mas funciona)
-            # Em produção, considerar usar cache_clear_pattern
-            pass
-        
-        # Invalida gráficos
-        for period in [7, 30, 90, 365]:
-            cache_delete(f"{CACHE_DASHBOARD_CHARTS}_sector_{period}")
-            cache_delete(f"{CACHE_DASHBOARD_CHARTS}_materials_{period}_10")
+            cache_invalidate_tags(TAG_DASHBOARD)
         
         logger.info("Dashboard cache invalidated")
@@ -46,17 +46,12 @@ def index(request):
     """
     View principal do Dashboard.
     """
-    # Estatísticas para cards
-    stats = DashboardService.get_dashboard_data(request.user)
-    
-    # Initial data for main chart (30 days)
-    sector_data = DashboardService.get_reports_by_sector(30)
-
-    # Top Materials
-    materials_data = DashboardService.get_top_materials_by_period(30)
-
-    # Calendar Events
-    calendar_events = DashboardService.get_recent_reports_for_calendar()
+    # Cards, gráficos (30 dias) e calendário em um único round trip de cache
+    data = DashboardService.get_index_data(request.user, period_days=30)
+    stats = data['stats']
+    sector_data = data['sector_data']
+    materials_data = data['materials_data']
+    calendar_events = data['calendar_events']
 
     context = {
         # Stats for cards
@@ -577,8 +572,7 @@ def bulk_complete_deliveries(request):
     Recebe lista de IDs via POST JSON e altera status para 'Concluída'.
     Restrito a administradores.
     """
-    from django.utils import timezone
-    from fiscal.models import DeliveryNote
+    from fiscal.services.delivery import DeliveryService
     
     if not request.user.is_admin:
         return JsonResponse({
@@ -602,25 +596,17 @@ def bulk_complete_deliveries(request):
                 'error': 'Nenhuma ficha selecionada'
             }, status=400)
         
-        # Atualizar status para Concluída ('C') e registrar data
-        # Usamos um loop com .save() em vez de .update() para disparar os signals de estoque
-        now = timezone.now()
-        deliveries = DeliveryNote.objects.filter(
-            id__in=delivery_ids, status__in=['P', 'A']
+        # Conclusão em lote: um UPDATE de status e a baixa de estoque agregada
+        # por material, sem save() (e signals) por entrega
+        result = DeliveryService.complete_many(
+            delivery_ids,
+            received_by=f'Fechado em massa por {request.user.fullname}',
         )
         
-        updated = 0
-        for delivery in deliveries:
-            delivery.status = 'C'
-            delivery.received_at = now
-            delivery.received_by = f'Fechado em massa por {request.user.fullname}'
-            delivery.save()
-            updated += 1
-        
         return JsonResponse({
             'success': True,
-            'updated': updated,
-            'message': f'{updated} ficha(s) de entrega concluída(s) com sucesso!'
+            'updated': result.data['updated'],
+            'message': result.message
         })
     
     except json.JSONDecodeError:
@@ -0,0 +1,85 @@
+"""
+Management command para calcular o hash perceptual (dHash) dos OCRJobs
+existentes, permitindo que imagens antigas sejam reaproveitadas por
+imagens quase idênticas enviadas depois.
+"""
+from django.core.management.base import BaseCommand
+
+from fiscal.models import OCRJob
+from fiscal.services.image_hash import BAND_FIELDS, dhash_bytes, hash_fields
+from fiscal.views.ocr import _get_image_bytes
+
+
+class Command(BaseCommand):
+    help = 'Calcula o hash perceptual dos OCRJobs sem hash (baixa a imagem do Storage)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all-status',
+            action='store_true',
+            help='Inclui jobs não concluídos (padrão: só concluídos, os únicos reaproveitáveis)'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=None,
+            help='Processa no máximo N jobs'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Jobs gravados por UPDATE em lote (padrão: 100)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Apenas mostra quantos jobs seriam processados'
+        )
+
+    def handle(self, *args, **options):
+        jobs = OCRJob.objects.filter(perceptual_hash__isnull=True).exclude(image_path='')
+        if not options['all_status']:
+            jobs = jobs.filter(status='completed')
+        jobs = jobs.order_by('created_at').only('id', 'image_path')
+        if options['limit']:
+            jobs = jobs[:options['limit']]
+
+        total = jobs.count()
+        self.stdout.write(f"{total} job(s) sem hash perceptual")
+        if options['dry_run'] or not total:
+            if options['dry_run']:
+                self.stdout.write(self.style.WARNING("\n[DRY RUN] Nenhum job foi alterado."))
+            return
+
+        fields = ['perceptual_hash'] + BAND_FIELDS
+        pending = []
+        hashed = missing = 0
+        for job in jobs.iterator(chunk_size=options['batch_size']):
+            image_bytes = _get_image_bytes(job.image_path)
+            if not image_bytes:
+                missing += 1
+                continue
+            try:
+                values = hash_fields(dhash_bytes(image_bytes))
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f"  Job {job.id}: imagem inválida ({e})"))
+                missing += 1
+                continue
+
+            for field, value in values.items():
+                setattr(job, field, value)
+            pending.append(job)
+            if len(pending) >= options['batch_size']:
+                OCRJob.objects.bulk_update(pending, fields)
+                hashed += len(pending)
+                pending = []
+                self.stdout.write(f"  {hashed}/{total}...")
+
+        if pending:
+            OCRJob.objects.bulk_update(pending, fields)
+            hashed += len(pending)
+
+        self.stdout.write(self.style.SUCCESS(f"\n{hashed} job(s) com hash calculado"))
+        if missing:
+            self.stdout.write(self.style.WARNING(f"{missing} job(s) sem imagem disponível"))
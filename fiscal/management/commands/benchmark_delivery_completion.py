@@ -0,0 +1,127 @@
+import time
+from datetime import date
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from authenticate.models import ProfessionalUser
+from bidding_procurement.models import Bidding, Material, MaterialBidding
+from bidding_supplier.models import Supplier
+from fiscal.models import DeliveryNote, DeliveryNoteItem, Invoice, InvoiceItem
+from fiscal.services.delivery import DeliveryService
+from organizational_structure.models import Sector
+
+
+class Command(BaseCommand):
+    help = 'Mede a conclusão de entregas em massa: save() por entrega x DeliveryService (dados sintéticos, revertidos ao final)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--deliveries',
+            type=int,
+            default=1000,
+            help='Quantidade de entregas a concluir (padrão: 1000)'
+        )
+        parser.add_argument(
+            '--items-per-delivery',
+            type=int,
+            default=3,
+            help='Itens por entrega (padrão: 3)'
+        )
+        parser.add_argument(
+            '--materials',
+            type=int,
+            default=50,
+            help='Materiais distintos entre as entregas (padrão: 50)'
+        )
+
+    def handle(self, *args, **options):
+        deliveries = options['deliveries']
+        per_delivery = options['items_per_delivery']
+        materials = options['materials']
+
+        self.stdout.write(
+            f"Benchmark de conclusão em massa ({deliveries} entregas, "
+            f"{per_delivery} itens/entrega, {materials} materiais)\n"
+        )
+        self.stdout.write(f"{'método':<16} {'consultas':>10} {'tempo (ms)':>12}")
+
+        for label, complete in (('save() em loop', self._complete_with_save),
+                                ('DeliveryService', self._complete_with_service)):
+            # Cada método em uma transação revertida, sobre os mesmos dados
+            with transaction.atomic():
+                ids = self._create_deliveries(deliveries, per_delivery, materials)
+                queries = []
+                # execute_wrapper em vez de CaptureQueriesContext: o log de
+                # consultas do Django é limitado a 9000 entradas
+                with connection.execute_wrapper(self._counter(queries)):
+                    start = time.perf_counter()
+                    complete(ids)
+                    elapsed = (time.perf_counter() - start) * 1000
+                self.stdout.write(f"{label:<16} {len(queries):>10} {elapsed:>12.1f}")
+                transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS("\nBenchmark concluído (dados sintéticos revertidos)"))
+
+    @staticmethod
+    def _counter(queries):
+        def wrapper(execute, sql, params, many, context):
+            if not sql.lstrip().upper().startswith(('SAVEPOINT', 'RELEASE SAVEPOINT')):
+                queries.append(sql)
+            return execute(sql, params, many, context)
+        return wrapper
+
+    def _complete_with_save(self, ids):
+        """Caminho anterior: save() por entrega, baixa pelo signal."""
+        now = timezone.now()
+        for delivery in DeliveryNote.objects.filter(id__in=ids, status__in=['P', 'A']):
+            delivery.status = 'C'
+            delivery.received_at = now
+            delivery.received_by = 'Benchmark'
+            delivery.save()
+
+    def _complete_with_service(self, ids):
+        DeliveryService.complete_many(ids, received_by='Benchmark')
+
+    def _create_deliveries(self, count, per_delivery, material_count):
+        supplier = Supplier.objects.create(company='Benchmark Entregas', trade='Benchmark')
+        bidding = Bidding.objects.create(name='Benchmark Entregas', date=date.today())
+        sector = Sector.objects.create(name='Benchmark Entregas')
+        user = ProfessionalUser.objects.create_user(
+            email='benchmark-entregas@example.com', password=None,
+            first_name='Benchmark', last_name='Entregas')
+
+        material_biddings = [
+            MaterialBidding.objects.create(
+                material=Material.objects.create(name=f'Benchmark Entregas {i}'),
+                bidding=bidding, supplier=supplier, price=Decimal('1.00'), quantity=10_000_000,
+            )
+            for i in range(material_count)
+        ]
+
+        # Entrada de estoque suficiente para todas as baixas
+        invoice = Invoice.objects.create(number='BENCH', supplier=supplier, issue_date=date.today())
+        invoice_items = [
+            InvoiceItem.objects.create(
+                invoice=invoice, material_bidding=material_bidding,
+                quantity=count * per_delivery, unit_price=Decimal('1.00'))
+            for material_bidding in material_biddings
+        ]
+
+        deliveries = DeliveryNote.objects.bulk_create([
+            DeliveryNote(invoice=invoice, sector=sector, delivered_by=user, status='A')
+            for _ in range(count)
+        ], batch_size=1000)
+
+        DeliveryNoteItem.objects.bulk_create([
+            DeliveryNoteItem(
+                delivery_note=delivery,
+                invoice_item=invoice_items[(i * per_delivery + j) % len(invoice_items)],
+                quantity_delivered=1,
+            )
+            for i, delivery in enumerate(deliveries)
+            for j in range(per_delivery)
+        ], batch_size=2000)
+        return [delivery.pk for delivery in deliveries]
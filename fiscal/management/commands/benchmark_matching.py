@@ -0,0 +1,111 @@
+import time
+from datetime import date
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from authenticate.models import ProfessionalUser
+from bidding_procurement.models import Bidding, Material, MaterialBidding
+from bidding_supplier.models import Supplier
+from fiscal.models import Invoice, InvoiceItem
+from fiscal.services.matching import suggest_reports_for_invoice
+from reports.models import MaterialReport, Report
+
+
+class Command(BaseCommand):
+    help = 'Mede suggest_reports_for_invoice com milhares de laudos abertos (dados sintéticos, revertidos ao final)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            default='100,1000,5000',
+            help='Quantidades de laudos abertos a testar, separadas por vírgula (padrão: 100,1000,5000)'
+        )
+        parser.add_argument(
+            '--materials-per-report',
+            type=int,
+            default=5,
+            help='Materiais por laudo (padrão: 5)'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Execuções por tamanho; é exibida a mediana (padrão: 5)'
+        )
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        per_report = options['materials_per_report']
+        repeat = options['repeat']
+
+        self.stdout.write(f"Benchmark de sugestão de laudos ({per_report} materiais/laudo, mediana de {repeat})\n")
+        self.stdout.write(f"{'laudos':>8} {'consultas':>10} {'tempo (ms)':>12}")
+
+        # Tudo dentro de uma transação revertida: nada fica no banco
+        with transaction.atomic():
+            invoice, materials, user = self._create_base(per_report)
+            created = 0
+            for size in sizes:
+                self._create_reports(size - created, materials, user, per_report)
+                created = size
+
+                timings = []
+                for _ in range(repeat):
+                    with CaptureQueriesContext(connection) as queries:
+                        start = time.perf_counter()
+                        suggest_reports_for_invoice(invoice, limit=5)
+                        timings.append((time.perf_counter() - start) * 1000)
+                timings.sort()
+                median = timings[len(timings) // 2]
+                self.stdout.write(f"{size:>8} {len(queries):>10} {median:>12.1f}")
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS("\nBenchmark concluído (dados sintéticos revertidos)"))
+
+    def _create_base(self, per_report):
+        supplier = Supplier.objects.create(company='Benchmark Matching', trade='Benchmark')
+        bidding = Bidding.objects.create(name='Benchmark Matching', date=date.today())
+        user = ProfessionalUser.objects.create_user(
+            email='benchmark-matching@example.com', password=None,
+            first_name='Benchmark', last_name='Matching')
+
+        materials = []
+        for i in range(per_report * 4):
+            material = Material.objects.create(name=f'Benchmark Matching {i}')
+            materials.append(MaterialBidding.objects.create(
+                material=material, bidding=bidding, supplier=supplier,
+                price=Decimal('1.00'), quantity=1_000_000,
+            ))
+
+        invoice = Invoice.objects.create(number='BENCH', supplier=supplier, issue_date=date.today())
+        for material_bidding in materials[:per_report]:
+            InvoiceItem.objects.create(
+                invoice=invoice, material_bidding=material_bidding,
+                quantity=1, unit_price=Decimal('1.00'))
+        return invoice, materials, user
+
+    def _create_reports(self, count, materials, user, per_report):
+        if count <= 0:
+            return
+        start = Report.objects.count()
+        reports = Report.objects.bulk_create([
+            Report(
+                slug=f'benchmark-matching-{start + i}', status='1', justification='benchmark',
+                professional=user, pro_accountable=user,
+            )
+            for i in range(count)
+        ], batch_size=1000)
+
+        material_reports = []
+        for i, report in enumerate(reports):
+            # Janela deslizante: parte dos laudos coincide com a nota, parte não
+            offset = i % (len(materials) - per_report + 1)
+            for material_bidding in materials[offset:offset + per_report]:
+                material_reports.append(MaterialReport(
+                    report=report, material_bidding=material_bidding,
+                    unitary_price=Decimal('1.00')))
+        MaterialReport.objects.bulk_create(material_reports, batch_size=2000)
@@ -1,15 +1,97 @@
 
+import hashlib
+import os
+import sys
+import time
+import traceback
+from io import BytesIO
+
 from django.core.management.base import BaseCommand
 from pathlib import Path
+from PIL import Image
 from fiscal.services.ocr import InvoiceOCRService
+from fiscal.services.ocr_image import JPEG_QUALITY, MAX_SIZE, prepare_ocr_image
 from django.conf import settings
 
+
+def _legacy_prepare(path):
+    """Preparo antigo do ocr_submit: arquivo inteiro em memória, decodificação cheia."""
+    with open(path, 'rb') as f:
+        content = f.read()
+    hashlib.md5(content).hexdigest()
+    image = Image.open(BytesIO(content))
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    image.thumbnail((MAX_SIZE, MAX_SIZE))
+    output = BytesIO()
+    image.save(output, format='JPEG', quality=JPEG_QUALITY)
+    return output.getvalue()
+
+
+def _streamed_prepare(path):
+    with open(path, 'rb') as f:
+        return prepare_ocr_image(f).image_bytes
+
+
+def _noop(path):
+    return b''
+
+
+def _measure(func, path):
+    """
+    Executa func(path) em um processo filho e retorna (segundos, pico de RSS
+    em KB). O pico vem do ru_maxrss do filho: o tracemalloc não enxerga os
+    buffers de pixels alocados em C pelo Pillow.
+
+    Raises:
+        RuntimeError: func falhou no filho (traceback na saída de erro)
+    """
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        # O filho nunca volta para o handle(): sai sempre por os._exit
+        code = 1
+        try:
+            os.close(read_fd)
+            start = time.perf_counter()
+            func(path)
+            elapsed = time.perf_counter() - start
+            os.write(write_fd, repr(elapsed).encode())
+            code = 0
+        except BaseException:
+            traceback.print_exc()
+            sys.stderr.flush()
+        finally:
+            os._exit(code)
+
+    os.close(write_fd)
+    with os.fdopen(read_fd) as pipe:
+        output = pipe.read()
+    _, status, usage = os.wait4(pid, 0)
+    if status != 0 or not output:
+        raise RuntimeError(f'processo de medição falhou ({func.__name__}, status {status})')
+    return float(output), usage.ru_maxrss
+
+
 class Command(BaseCommand):
     help = 'Executa benchmark de OCR nas notas fiscais de backup'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--upload',
+            action='store_true',
+            help='Mede só o preparo do upload (hash + redução), sem chamar o Gemini'
+        )
+        parser.add_argument(
+            '--dir',
+            type=str,
+            default=None,
+            help='Pasta com as imagens (padrão: backups/notas)'
+        )
+
     def handle(self, *args, **options):
         # Caminho absoluto para a pasta de backups
-        backup_dir = settings.BASE_DIR / 'backups' / 'notas'
+        backup_dir = Path(options['dir']) if options['dir'] else settings.BASE_DIR / 'backups' / 'notas'
         
         if not backup_dir.exists():
             self.stdout.write(self.style.ERROR(f"Diretório não encontrado: {backup_dir}"))
@@ -17,6 +99,10 @@ class Command(BaseCommand):
 
         files = list(backup_dir.glob('*'))
         total = len(files)
+
+        if options['upload']:
+            return self._benchmark_upload(files)
+
         success = 0
         failures = []
 
@@ -62,3 +148,48 @@ class Command(BaseCommand):
             self.stdout.write(self.style.ERROR("Arquivos com falha:"))
             for name in failures:
                 self.stdout.write(f" - {name}")
+
+
+    def _benchmark_upload(self, files):
+        """Latência e pico de memória por upload: preparo antigo x streaming."""
+        if not hasattr(os, 'fork'):
+            self.stdout.write(self.style.ERROR("--upload requer os.fork (Linux/macOS)"))
+            return
+
+        self.stdout.write(f"Preparo de upload em {len(files)} arquivos (RSS descontado do processo vazio)\n")
+        self.stdout.write(f"{'arquivo':<32} {'MB':>6} {'antigo s':>9} {'antigo MB':>10} {'novo s':>8} {'novo MB':>8}")
+
+        totals = {'legacy': [0.0, 0], 'streamed': [0.0, 0]}
+        measured = 0
+        for file_path in sorted(files):
+            if not file_path.is_file():
+                continue
+            try:
+                _, baseline = _measure(_noop, file_path)
+                legacy_time, legacy_rss = _measure(_legacy_prepare, file_path)
+                streamed_time, streamed_rss = _measure(_streamed_prepare, file_path)
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f"  [ERRO] {file_path.name}: {e}"))
+                continue
+
+            legacy_mb = max(legacy_rss - baseline, 0) / 1024
+            streamed_mb = max(streamed_rss - baseline, 0) / 1024
+            size_mb = file_path.stat().st_size / 1024 / 1024
+            self.stdout.write(
+                f"{file_path.name[:32]:<32} {size_mb:>6.1f} {legacy_time:>9.3f} {legacy_mb:>10.1f} "
+                f"{streamed_time:>8.3f} {streamed_mb:>8.1f}"
+            )
+            totals['legacy'][0] += legacy_time
+            totals['legacy'][1] = max(totals['legacy'][1], legacy_mb)
+            totals['streamed'][0] += streamed_time
+            totals['streamed'][1] = max(totals['streamed'][1], streamed_mb)
+            measured += 1
+
+        if not measured:
+            return
+        self.stdout.write("\nBenchmark Concluído")
+        for label, key in (('Antigo', 'legacy'), ('Streaming', 'streamed')):
+            total_time, peak = totals[key]
+            self.stdout.write(
+                f"{label}: {total_time / measured * 1000:.0f} ms/upload | pico {peak:.1f} MB"
+            )
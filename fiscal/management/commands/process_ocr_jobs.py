@@ -0,0 +1,145 @@
+"""
+Management command que processa os OCRJobs pendentes em desenvolvimento
+local (sem Supabase), com um pool de threads.
+
+Substitui o processamento que era feito dentro do polling de ocr_status.
+Pode rodar em mais de um processo ao mesmo tempo: cada job é reservado com
+SELECT ... FOR UPDATE SKIP LOCKED (ver fiscal.services.ocr_worker).
+"""
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from fiscal.services.ocr_worker import BACKOFF_SECONDS, MAX_ATTEMPTS, OCRWorker
+
+
+class Command(BaseCommand):
+    help = 'Processa os OCRJobs pendentes (modo local, sem Supabase)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=2,
+            help='Jobs processados em paralelo (padrão: 2)'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Esvazia a fila e termina, em vez de continuar aguardando jobs'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=2.0,
+            help='Segundos entre consultas à fila vazia (padrão: 2)'
+        )
+        parser.add_argument(
+            '--max-attempts',
+            type=int,
+            default=MAX_ATTEMPTS,
+            help=f'Tentativas por job antes de marcar como falho (padrão: {MAX_ATTEMPTS})'
+        )
+        parser.add_argument(
+            '--backoff',
+            type=int,
+            default=BACKOFF_SECONDS,
+            help=f'Espera base entre tentativas, em segundos, dobrada a cada falha (padrão: {BACKOFF_SECONDS})'
+        )
+        parser.add_argument(
+            '--stale-minutes',
+            type=int,
+            default=10,
+            help='Devolve para a fila jobs em processamento há mais de N minutos (padrão: 10)'
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Roda mesmo com Supabase configurado (a Edge Function também processa os jobs)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Apenas mostra quantos jobs estão prontos para processar'
+        )
+
+    def handle(self, *args, **options):
+        from fiscal.views.ocr import _use_supabase
+
+        if _use_supabase() and not options['force']:
+            self.stdout.write(self.style.ERROR(
+                "Supabase configurado: os jobs são processados pela Edge Function. "
+                "Use --force para rodar o worker local mesmo assim."
+            ))
+            return
+
+        worker = self.get_worker(options)
+
+        if options['dry_run']:
+            self.stdout.write(f"{worker.ready_jobs().count()} job(s) pronto(s) para processar")
+            self.stdout.write(self.style.WARNING("\n[DRY RUN] Nenhum job foi processado."))
+            return
+
+        released = worker.release_stale(timedelta(minutes=options['stale_minutes']))
+        if released:
+            self.stdout.write(self.style.WARNING(f"{released} job(s) travado(s) devolvido(s) para a fila"))
+
+        threads = max(options['threads'], 1)
+        totals = {'completed': 0, 'failed': 0, 'retry': 0, 'quota': 0}
+        self.stdout.write(f"Worker de OCR iniciado ({threads} thread(s))")
+
+        try:
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                inflight = set()
+                while True:
+                    free = threads - len(inflight)
+                    if free and worker.has_quota():
+                        for job in worker.claim(free):
+                            inflight.add(pool.submit(self._run, worker, job))
+
+                    if not inflight:
+                        if options['once']:
+                            break
+                        time.sleep(options['poll_interval'])
+                        continue
+
+                    done, inflight = wait(inflight, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                    for future in done:
+                        job, outcome = future.result()
+                        totals[outcome] += 1
+                        self._report(job, outcome)
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING("\nInterrompido"))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"\n{totals['completed']} concluído(s), {totals['failed']} falho(s), "
+            f"{totals['retry']} reagendado(s), {totals['quota']} aguardando quota"
+        ))
+        if not worker.has_quota():
+            self.stdout.write(self.style.WARNING("Todas as chaves Gemini estão esgotadas hoje"))
+
+    def get_worker(self, options) -> OCRWorker:
+        return OCRWorker(max_attempts=options['max_attempts'], backoff_seconds=options['backoff'])
+
+    @staticmethod
+    def _run(worker, job):
+        try:
+            return job, worker.process(job)
+        finally:
+            # Cada thread tem sua conexão; não deixá-la aberta após o pool
+            connection.close()
+
+    def _report(self, job, outcome):
+        if outcome == 'completed':
+            self.stdout.write(self.style.SUCCESS(f"  [OK] Job {job.id}"))
+        elif outcome == 'failed':
+            self.stdout.write(self.style.ERROR(f"  [FALHA] Job {job.id}: {job.error_message}"))
+        elif outcome == 'retry':
+            self.stdout.write(self.style.WARNING(
+                f"  [REAGENDADO] Job {job.id} (tentativa {job.attempts}): {job.error_message}"
+            ))
+        else:
+            self.stdout.write(self.style.WARNING(f"  [QUOTA] Job {job.id} aguardando próximo dia"))
@@ -0,0 +1,60 @@
+"""
+Management command para verificar e reconstruir os totais desnormalizados
+das notas fiscais (Invoice.total_value / Invoice.item_count).
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from fiscal.models import Invoice
+
+
+class Command(BaseCommand):
+    help = 'Verifica e reconstrói total_value/item_count das notas a partir dos itens'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Apenas lista as notas com totais divergentes, sem corrigir'
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Recalcula todas as notas, não só as divergentes'
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        rebuild_all = options['all']
+
+        stale = list(
+            Invoice.objects.with_stale_totals()
+            .select_related('supplier')
+            .order_by('pk')
+        )
+
+        if not stale and not rebuild_all:
+            self.stdout.write(self.style.SUCCESS("Totais das notas estão corretos."))
+            return
+
+        if stale:
+            self.stdout.write(self.style.WARNING(f"{len(stale)} nota(s) com totais divergentes:"))
+            for invoice in stale[:10]:
+                self.stdout.write(
+                    f"  - {invoice} | total {invoice.total_value} -> {invoice.computed_total} "
+                    f"| itens {invoice.item_count} -> {invoice.computed_count}"
+                )
+            if len(stale) > 10:
+                self.stdout.write(f"  ... e mais {len(stale) - 10} notas")
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING("\n[DRY RUN] Nenhuma nota foi alterada."))
+            return
+
+        with transaction.atomic():
+            queryset = Invoice.objects.all() if rebuild_all else Invoice.objects.filter(
+                pk__in=[invoice.pk for invoice in stale]
+            )
+            updated = queryset.select_for_update().rebuild_totals()
+
+        self.stdout.write(self.style.SUCCESS(f"\n{updated} nota(s) recalculada(s)."))
@@ -0,0 +1,38 @@
+"""
+Management command para reconstruir o estoque físico (StockItem.quantity)
+a partir do livro-razão (StockSnapshot + StockMovement).
+"""
+from django.core.management.base import BaseCommand
+
+from fiscal.services.stock import StockLedgerService
+
+
+class Command(BaseCommand):
+    help = 'Recalcula StockItem.quantity a partir do livro-razão de estoque'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Apenas lista os materiais com saldo divergente, sem corrigir'
+        )
+
+    def handle(self, *args, **options):
+        stale = StockLedgerService.stale_stock_items()
+
+        if not stale:
+            self.stdout.write(self.style.SUCCESS("Estoque está de acordo com o livro-razão."))
+            return
+
+        self.stdout.write(self.style.WARNING(f"{len(stale)} material(is) com saldo divergente:"))
+        for material_bidding_id, (current, ledger) in sorted(stale.items())[:10]:
+            self.stdout.write(f"  - MaterialBidding {material_bidding_id}: {current} -> {ledger}")
+        if len(stale) > 10:
+            self.stdout.write(f"  ... e mais {len(stale) - 10} materiais")
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING("\n[DRY RUN] Nenhum saldo foi alterado."))
+            return
+
+        fixed = StockLedgerService.rebuild_stock_items()
+        self.stdout.write(self.style.SUCCESS(f"\n{fixed} saldo(s) recalculado(s)."))
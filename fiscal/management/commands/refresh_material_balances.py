@@ -0,0 +1,38 @@
+"""
+Management command para recalcular o resumo de saldos (MaterialBalance) de
+todos os materiais licitados a partir das tabelas de origem.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from fiscal.services.balance import MaterialBalanceService
+
+
+class Command(BaseCommand):
+    help = 'Recalcula MaterialBalance (licitado, comprado, usado em laudos, estoque, disponível)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Apenas lista os materiais com saldo ausente ou divergente, sem corrigir'
+        )
+
+    def handle(self, *args, **options):
+        stale = MaterialBalanceService.stale()
+
+        if stale:
+            self.stdout.write(self.style.WARNING(f"{len(stale)} material(is) com saldo ausente ou divergente"))
+            preview = ', '.join(str(pk) for pk in stale[:20])
+            self.stdout.write(f"  IDs: {preview}{' ...' if len(stale) > 20 else ''}")
+        else:
+            self.stdout.write(self.style.SUCCESS("Saldos dos materiais estão corretos."))
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING("\n[DRY RUN] Nenhum saldo foi alterado."))
+            return
+
+        with transaction.atomic():
+            refreshed = MaterialBalanceService.refresh()
+
+        self.stdout.write(self.style.SUCCESS(f"\n{refreshed} saldo(s) recalculado(s)."))
@@ -0,0 +1,18 @@
+"""
+Management command para consolidar o livro-razão de estoque em snapshots.
+Deve rodar periodicamente (ex.: diariamente via cron).
+"""
+from django.core.management.base import BaseCommand
+
+from fiscal.services.stock import StockLedgerService
+
+
+class Command(BaseCommand):
+    help = 'Grava snapshots de saldo por material a partir do livro-razão de estoque'
+
+    def handle(self, *args, **options):
+        created = StockLedgerService.take_snapshots()
+        if created:
+            self.stdout.write(self.style.SUCCESS(f"{created} snapshot(s) de estoque gravado(s)."))
+        else:
+            self.stdout.write("Nenhum movimento novo desde o último snapshot.")
@@ -0,0 +1,69 @@
+from django.db import models
+from django.db.models import Count, DecimalField, Exists, F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+MONEY = DecimalField(max_digits=14, decimal_places=2)
+
+
+class InvoiceQuerySet(models.QuerySet):
+    def with_list_projection(self):
+        """
+        Anota o que a listagem de notas precisa, sem consultas por linha:
+
+        - has_deliveries_flag / has_open_deliveries: estado das entregas
+        - has_stock_flag: algum material da nota com saldo em estoque
+
+        As propriedades delivery_process_status, has_deliveries e
+        has_stock_items usam essas anotações quando presentes. Valor total e
+        quantidade de itens já são colunas da nota (total_value/item_count).
+
+        Subconsultas Exists (e não joins) para não multiplicar as linhas.
+        """
+        from fiscal.models import DeliveryNote, StockItem
+
+        deliveries = DeliveryNote.objects.filter(invoice=OuterRef('pk'))
+
+        return self.annotate(
+            has_deliveries_flag=Exists(deliveries),
+            has_open_deliveries=Exists(deliveries.filter(status__in=['P', 'A'])),
+            has_stock_flag=Exists(
+                StockItem.objects.filter(
+                    material_bidding__itens_notas__invoice=OuterRef('pk'),
+                    quantity__gt=0,
+                )
+            ),
+        )
+
+    def with_computed_totals(self):
+        """
+        Anota computed_total/computed_count recalculados a partir dos itens,
+        para conferir as colunas desnormalizadas total_value/item_count.
+        """
+        from fiscal.models import InvoiceItem
+
+        items = InvoiceItem.objects.filter(invoice=OuterRef('pk')).order_by().values('invoice')
+        return self.annotate(
+            computed_total=Coalesce(
+                Subquery(
+                    items.annotate(total=Sum(F('quantity') * F('unit_price'), output_field=MONEY)).values('total'),
+                    output_field=MONEY,
+                ),
+                0,
+                output_field=MONEY,
+            ),
+            computed_count=Coalesce(Subquery(items.annotate(n=Count('pk')).values('n')), 0),
+        )
+
+    def with_stale_totals(self):
+        """Notas cujos totais desnormalizados divergem dos itens."""
+        return self.with_computed_totals().filter(
+            ~Q(total_value=F('computed_total')) | ~Q(item_count=F('computed_count'))
+        )
+
+    def rebuild_totals(self) -> int:
+        """Recalcula total_value/item_count das notas com um único UPDATE."""
+        computed = self.model.objects.with_computed_totals().filter(pk=OuterRef('pk'))
+        return self.update(
+            total_value=Subquery(computed.values('computed_total')[:1], output_field=MONEY),
+            item_count=Subquery(computed.values('computed_count')[:1]),
+        )
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:00
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_invoice_totals(apps, schema_editor):
+    Invoice = apps.get_model('fiscal', 'Invoice')
+    InvoiceItem = apps.get_model('fiscal', 'InvoiceItem')
+    money = DecimalField(max_digits=14, decimal_places=2)
+
+    items = InvoiceItem.objects.filter(invoice=OuterRef('pk')).order_by().values('invoice')
+    Invoice.objects.update(
+        total_value=Coalesce(
+            Subquery(
+                items.annotate(total=Sum(F('quantity') * F('unit_price'), output_field=money)).values('total'),
+                output_field=money,
+            ),
+            0,
+            output_field=money,
+        ),
+        item_count=Coalesce(Subquery(items.annotate(n=Count('pk')).values('n')), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fiscal', '0016_query_optimizations_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='total_value',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=14, verbose_name='valor total'),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='quantidade de itens'),
+        ),
+        migrations.RunPython(fill_invoice_totals, migrations.RunPython.noop),
+    ]
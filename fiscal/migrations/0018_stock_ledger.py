@@ -0,0 +1,70 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:30
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def create_opening_movements(apps, schema_editor):
+    """Saldo atual de cada StockItem vira o movimento inicial do livro-razão."""
+    StockItem = apps.get_model('fiscal', 'StockItem')
+    StockMovement = apps.get_model('fiscal', 'StockMovement')
+    StockMovement.objects.bulk_create(
+        [
+            StockMovement(
+                material_bidding_id=material_bidding_id, kind='A',
+                quantity=quantity, note='Saldo inicial',
+            )
+            for material_bidding_id, quantity in StockItem.objects.exclude(
+                quantity=0
+            ).values_list('material_bidding_id', 'quantity').iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bidding_procurement', '0009_production_cleanup_sync'),
+        ('fiscal', '0017_invoice_totals'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('E', 'Entrada (nota fiscal)'), ('S', 'Saída (entrega)'), ('R', 'Estorno'), ('A', 'Ajuste')], max_length=1, verbose_name='tipo')),
+                ('quantity', models.IntegerField(help_text='Positivo entra, negativo sai', verbose_name='quantidade')),
+                ('note', models.CharField(blank=True, max_length=200, verbose_name='observação')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='criado em')),
+                ('delivery_note_item', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_movements', to='fiscal.deliverynoteitem', verbose_name='item da entrega')),
+                ('invoice_item', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_movements', to='fiscal.invoiceitem', verbose_name='item da nota')),
+                ('material_bidding', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='stock_movements', to='bidding_procurement.materialbidding', verbose_name='material licitado')),
+            ],
+            options={
+                'verbose_name': 'movimento de estoque',
+                'verbose_name_plural': 'movimentos de estoque',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['material_bidding', 'id'], name='fiscal_stoc_materia_b7ef04_idx'), models.Index(fields=['created_at'], name='fiscal_stoc_created_9cb2a6_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField(verbose_name='saldo')),
+                ('last_movement_id', models.BigIntegerField(verbose_name='último movimento incluído')),
+                ('taken_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='gerado em')),
+                ('material_bidding', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='stock_snapshots', to='bidding_procurement.materialbidding', verbose_name='material licitado')),
+            ],
+            options={
+                'verbose_name': 'snapshot de estoque',
+                'verbose_name_plural': 'snapshots de estoque',
+                'ordering': ['-taken_at'],
+                'indexes': [models.Index(fields=['material_bidding', 'last_movement_id'], name='fiscal_stoc_materia_155d31_idx')],
+            },
+        ),
+        migrations.RunPython(create_opening_movements, migrations.RunPython.noop),
+    ]
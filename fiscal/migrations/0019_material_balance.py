@@ -0,0 +1,72 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def populate_material_balances(apps, schema_editor):
+    """Preenche MaterialBalance com os saldos atuais (mesmas regras do serviço)."""
+    MaterialBidding = apps.get_model('bidding_procurement', 'MaterialBidding')
+    MaterialReport = apps.get_model('reports', 'MaterialReport')
+    StockItem = apps.get_model('fiscal', 'StockItem')
+    MaterialBalance = apps.get_model('fiscal', 'MaterialBalance')
+
+    used = dict(
+        MaterialReport.objects.exclude(material_bidding=None).values('material_bidding')
+        .annotate(total=Sum('quantity')).order_by().values_list('material_bidding', 'total')
+    )
+    stock = dict(StockItem.objects.values_list('material_bidding_id', 'quantity'))
+
+    balances = []
+    rows = MaterialBidding.objects.values_list('pk', 'quantity', 'quantity_purchased').iterator()
+    for pk, quantity, purchased in rows:
+        permille = (purchased * 1000 + quantity // 2) // quantity if quantity > 0 else 0
+        balances.append(MaterialBalance(
+            material_bidding_id=pk,
+            licensed=quantity,
+            purchased=purchased,
+            used_in_reports=used.get(pk) or 0,
+            in_stock=stock.get(pk, 0),
+            available=quantity - (used.get(pk) or 0),
+            available_for_purchase=max(quantity - purchased, 0),
+            usage_permille=permille,
+            near_limit=permille >= 800,
+            at_limit=purchased >= quantity,
+        ))
+    MaterialBalance.objects.bulk_create(balances, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bidding_procurement', '0009_production_cleanup_sync'),
+        ('fiscal', '0018_stock_ledger'),
+        ('reports', '0017_query_optimizations_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MaterialBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('licensed', models.IntegerField(default=0, verbose_name='licitado')),
+                ('purchased', models.IntegerField(default=0, verbose_name='comprado')),
+                ('used_in_reports', models.IntegerField(default=0, verbose_name='usado em laudos')),
+                ('in_stock', models.IntegerField(default=0, verbose_name='em estoque')),
+                ('available', models.IntegerField(default=0, help_text='Licitado menos o usado em laudos', verbose_name='disponível')),
+                ('available_for_purchase', models.IntegerField(default=0, verbose_name='disponível para compra')),
+                ('usage_permille', models.IntegerField(default=0, help_text='Comprado / licitado, em décimos de percentual', verbose_name='uso do limite (‰)')),
+                ('near_limit', models.BooleanField(default=False, verbose_name='próximo do limite')),
+                ('at_limit', models.BooleanField(default=False, verbose_name='no limite')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='atualizado em')),
+                ('material_bidding', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='balance', to='bidding_procurement.materialbidding', verbose_name='material licitado')),
+            ],
+            options={
+                'verbose_name': 'saldo de material',
+                'verbose_name_plural': 'saldos de materiais',
+                'indexes': [models.Index(fields=['in_stock'], name='fiscal_mate_in_stoc_9193aa_idx')],
+            },
+        ),
+        migrations.RunPython(populate_material_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fiscal', '0019_material_balance'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ocrjob',
+            name='perceptual_hash',
+            field=models.BigIntegerField(blank=True, null=True, verbose_name='hash perceptual'),
+        ),
+        migrations.AddField(
+            model_name='ocrjob',
+            name='phash_band_0',
+            field=models.IntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='ocrjob',
+            name='phash_band_1',
+            field=models.IntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='ocrjob',
+            name='phash_band_2',
+            field=models.IntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='ocrjob',
+            name='phash_band_3',
+            field=models.IntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+    ]
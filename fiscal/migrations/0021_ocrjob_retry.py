@@ -0,0 +1,27 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fiscal', '0020_ocrjob_perceptual_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ocrjob',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='tentativas'),
+        ),
+        migrations.AddField(
+            model_name='ocrjob',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='próxima tentativa'),
+        ),
+        migrations.AddIndex(
+            model_name='ocrjob',
+            index=models.Index(fields=['status', 'next_attempt_at'], name='fiscal_ocrj_status_1e223c_idx'),
+        ),
+    ]
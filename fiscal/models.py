@@ -4,13 +4,14 @@ Modelos do sistema fiscal (Notas, Empenhos, Entrega).
 import uuid
 from decimal import Decimal
 from functools import cached_property
-from django.db import models
+from django.db import models, transaction
 from django.shortcuts import resolve_url as r
 from django.utils import timezone
 
 from authenticate.models import ProfessionalUser
 from bidding_supplier.models import Supplier
 from bidding_procurement.models import MaterialBidding
+from fiscal.managers import InvoiceQuerySet
 from organizational_structure.models import Sector
 from reports.models import Report
 
@@ -36,10 +37,22 @@ class OCRJob(models.Model):
     # Hash da imagem para detecção de duplicatas (MD5)
     image_hash = models.CharField('hash da imagem', max_length=32, blank=True, db_index=True)
     
+    # Hash perceptual (dHash 64 bits) e suas faixas de 16 bits indexadas,
+    # para achar imagens quase idênticas (ver fiscal.services.image_hash)
+    perceptual_hash = models.BigIntegerField('hash perceptual', null=True, blank=True)
+    phash_band_0 = models.IntegerField(null=True, blank=True, db_index=True, editable=False)
+    phash_band_1 = models.IntegerField(null=True, blank=True, db_index=True, editable=False)
+    phash_band_2 = models.IntegerField(null=True, blank=True, db_index=True, editable=False)
+    phash_band_3 = models.IntegerField(null=True, blank=True, db_index=True, editable=False)
+    
     # Resultado do OCR (JSON) - estrutura completa retornada pelo Gemini
     result = models.JSONField('resultado', null=True, blank=True)
     error_message = models.TextField('mensagem de erro', blank=True)
     
+    # Retentativas do worker local (process_ocr_jobs)
+    attempts = models.PositiveSmallIntegerField('tentativas', default=0)
+    next_attempt_at = models.DateTimeField('próxima tentativa', null=True, blank=True)
+    
     # Timestamps
     created_at = models.DateTimeField('criado em', auto_now_add=True)
     started_at = models.DateTimeField('iniciado em', null=True, blank=True)
@@ -49,6 +62,9 @@ class OCRJob(models.Model):
         ordering = ['-created_at']
         verbose_name = 'job de OCR'
         verbose_name_plural = 'jobs de OCR'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
     
     def __str__(self):
         return f"OCR Job {self.id} ({self.get_status_display()})"
@@ -72,6 +88,15 @@ class OCRJob(models.Model):
         self.error_message = error
         self.completed_at = timezone.now()
         self.save(update_fields=['status', 'error_message', 'completed_at'])
+    
+    def schedule_retry(self, error: str, retry_at, count_attempt: bool = True):
+        """Devolve o job para a fila, a ser retomado a partir de retry_at."""
+        self.status = 'pending'
+        self.error_message = error
+        self.next_attempt_at = retry_at
+        if count_attempt:
+            self.attempts += 1
+        self.save(update_fields=['status', 'error_message', 'next_attempt_at', 'attempts'])
 
 
 
@@ -190,9 +215,22 @@ class Invoice(models.Model):
         'entregue ao compras em', blank=True, null=True)
     
     observations = models.TextField('observações', blank=True)
+
+    # Totais desnormalizados, mantidos pelos InvoiceItem (save/delete).
+    # Verificação/reconstrução: manage.py rebuild_invoice_totals
+    total_value = models.DecimalField(
+        'valor total', max_digits=14, decimal_places=2,
+        default=Decimal('0.00'), editable=False)
+    item_count = models.PositiveIntegerField(
+        'quantidade de itens', default=0, editable=False)
+
     created_at = models.DateTimeField('criado em', auto_now_add=True)
     updated_at = models.DateTimeField('atualizado em', auto_now=True)
 
+    objects = InvoiceQuerySet.as_manager()
+
+    TOTALS_FIELDS = ('total_value', 'item_count')
+
     class Meta:
         ordering = ['-issue_date', '-created_at']
         verbose_name = 'nota fiscal'
@@ -211,17 +249,28 @@ class Invoice(models.Model):
         # Vai precisar ser atualizado para 'fiscal:invoice_detail' quando movermos as views
         return r('fiscal:invoice_detail', pk=self.pk)
     
-    @property
-    def total_value(self):
+    def save(self, *args, **kwargs):
         """
-        Valor total da nota (soma dos itens).
-        Otimizado: usa agregação SQL ao invés de loop Python.
+        Um save completo da nota não grava total_value/item_count: esses
+        campos só mudam via adjust_totals, e o valor em memória pode estar
+        desatualizado em relação aos itens.
         """
-        from django.db.models import Sum, F
-        result = self.items.aggregate(
-            total=Sum(F('quantity') * F('unit_price'))
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.TOTALS_FIELDS
+            ]
+        return super().save(*args, **kwargs)
+
+    @classmethod
+    def adjust_totals(cls, invoice_id, value_delta, count_delta=0):
+        """Aplica um delta aos totais da nota com UPDATE atômico (F())."""
+        if not value_delta and not count_delta:
+            return
+        cls.objects.filter(pk=invoice_id).update(
+            total_value=models.F('total_value') + value_delta,
+            item_count=models.F('item_count') + count_delta,
         )
-        return Decimal(result['total'] or 0).quantize(Decimal("0.00"))
     
     @property
     def photo_url(self):
@@ -283,8 +332,11 @@ class Invoice(models.Model):
     def has_stock_items(self):
         """
         Verifica se os materiais desta nota estão em estoque (StockItem com qty > 0).
-        Otimizado: usa exists() com subquery ao invés de loop.
+        Otimizado: usa exists() com subquery ao invés de loop, ou a anotação
+        de with_list_projection() quando presente.
         """
+        if 'has_stock_flag' in self.__dict__:
+            return self.has_stock_flag
         return StockItem.objects.filter(
             material_bidding__in=self.items.values('material_bidding'),
             quantity__gt=0
@@ -293,6 +345,8 @@ class Invoice(models.Model):
     @property
     def has_deliveries(self):
         """Verifica se há entregas (DeliveryNote) vinculadas a esta nota."""
+        if 'has_deliveries_flag' in self.__dict__:
+            return self.has_deliveries_flag
         return self.deliveries.exists()
     
     @property
@@ -303,14 +357,19 @@ class Invoice(models.Model):
         - 'on_way': Alguma entrega 'Pendente' ou 'A Caminho'.
         - 'delivered': Tem entregas e todas estão 'Concluída'.
         
-        Otimizado: usa exists() ao invés de carregar todas as deliveries.
+        Otimizado: usa exists() ao invés de carregar todas as deliveries,
+        ou as anotações de with_list_projection() (nenhuma query).
         """
         # Verifica se há entregas
-        if not self.deliveries.exists():
+        if not self.has_deliveries:
             return 'preparing'
         
         # Verifica se alguma está pendente ou a caminho (1 query)
-        if self.deliveries.filter(status__in=['P', 'A']).exists():
+        if 'has_open_deliveries' in self.__dict__:
+            has_open = self.has_open_deliveries
+        else:
+            has_open = self.deliveries.filter(status__in=['P', 'A']).exists()
+        if has_open:
             return 'on_way'
         
         return 'delivered'
@@ -343,26 +402,56 @@ class InvoiceItem(models.Model):
         return Decimal(self.quantity * self.unit_price).quantize(Decimal("0.00"))
     
     def save(self, *args, **kwargs):
-        """Ao salvar, atualiza o limite de compras do material."""
+        """
+        Ao salvar, atualiza (na mesma transação) o saldo comprado do material,
+        o estoque físico e os totais desnormalizados da nota.
+        """
+        from fiscal.services.stock import StockLedgerService
+
         is_new = self.pk is None
         old_quantity = 0
+        old_invoice_id = None
+        old_material_bidding_id = None
+        old_total = Decimal('0.00')
         
-        if not is_new:
-            try:
-                old_item = InvoiceItem.objects.get(pk=self.pk)
-                old_quantity = old_item.quantity
-            except InvoiceItem.DoesNotExist:
-                pass
-        
-        super().save(*args, **kwargs)
-        
-        # Atualiza quantidade comprada no MaterialBidding
-        quantity_diff = self.quantity - old_quantity
-        if quantity_diff != 0:
-            self.material_bidding.quantity_purchased = (
-                self.material_bidding.quantity_purchased or 0
-            ) + quantity_diff
-            self.material_bidding.save(update_fields=['quantity_purchased'])
+        with transaction.atomic():
+            if not is_new:
+                # Trava a linha: duas edições simultâneas do mesmo item não
+                # calculam o delta a partir do mesmo valor antigo
+                try:
+                    old_item = InvoiceItem.objects.select_for_update().get(pk=self.pk)
+                    old_quantity = old_item.quantity
+                    old_invoice_id = old_item.invoice_id
+                    old_material_bidding_id = old_item.material_bidding_id
+                    old_total = old_item.total_price
+                except InvoiceItem.DoesNotExist:
+                    is_new = True
+
+            super().save(*args, **kwargs)
+            self._update_invoice_totals(is_new, old_invoice_id, old_total)
+            # Estoque e saldo comprado: UPDATE atômico com o delta (sem ler e regravar)
+            StockLedgerService.register_invoice_item(
+                self, old_material_bidding_id=old_material_bidding_id, old_quantity=old_quantity
+            )
+
+    def _update_invoice_totals(self, is_new, old_invoice_id, old_total):
+        new_total = self.total_price
+        if is_new:
+            deltas = {self.invoice_id: (new_total, 1)}
+        elif old_invoice_id != self.invoice_id:
+            # Item movido de nota
+            deltas = {old_invoice_id: (-old_total, -1), self.invoice_id: (new_total, 1)}
+        else:
+            deltas = {self.invoice_id: (new_total - old_total, 0)}
+
+        for invoice_id, (value_delta, count_delta) in deltas.items():
+            Invoice.adjust_totals(invoice_id, value_delta, count_delta)
+
+        # Mantém a nota já carregada em memória coerente com o banco
+        if InvoiceItem.invoice.is_cached(self) and self.invoice_id in deltas:
+            value_delta, count_delta = deltas[self.invoice_id]
+            self.invoice.total_value += value_delta
+            self.invoice.item_count += count_delta
 
 
 
@@ -526,3 +615,118 @@ class DeliveryNoteItem(models.Model):
 
     def __str__(self):
         return f"{self.invoice_item.material_bidding.material.name} ({self.quantity_delivered}x)"
+
+
+class StockMovement(models.Model):
+    """
+    Movimento de estoque físico (livro-razão, só inserção).
+
+    StockItem.quantity é o saldo materializado; o histórico auditável fica
+    aqui. Saldo em uma data = último StockSnapshot + movimentos posteriores.
+    """
+    KIND_CHOICES = (
+        ('E', 'Entrada (nota fiscal)'),
+        ('S', 'Saída (entrega)'),
+        ('R', 'Estorno'),
+        ('A', 'Ajuste'),
+    )
+
+    material_bidding = models.ForeignKey(
+        MaterialBidding, on_delete=models.PROTECT,
+        related_name='stock_movements', verbose_name='material licitado')
+    kind = models.CharField('tipo', max_length=1, choices=KIND_CHOICES)
+    quantity = models.IntegerField('quantidade', help_text='Positivo entra, negativo sai')
+    invoice_item = models.ForeignKey(
+        InvoiceItem, on_delete=models.SET_NULL, blank=True, null=True,
+        related_name='stock_movements', verbose_name='item da nota')
+    delivery_note_item = models.ForeignKey(
+        DeliveryNoteItem, on_delete=models.SET_NULL, blank=True, null=True,
+        related_name='stock_movements', verbose_name='item da entrega')
+    note = models.CharField('observação', max_length=200, blank=True)
+    created_at = models.DateTimeField('criado em', default=timezone.now)
+
+    class Meta:
+        ordering = ['id']
+        verbose_name = 'movimento de estoque'
+        verbose_name_plural = 'movimentos de estoque'
+        indexes = [
+            models.Index(fields=['material_bidding', 'id']),
+            models.Index(fields=['created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()}: {self.quantity:+d} ({self.material_bidding_id})"
+
+
+class StockSnapshot(models.Model):
+    """
+    Saldo consolidado de um material até um movimento (last_movement_id).
+
+    Gerado periodicamente por `manage.py take_stock_snapshots`.
+    """
+    material_bidding = models.ForeignKey(
+        MaterialBidding, on_delete=models.PROTECT,
+        related_name='stock_snapshots', verbose_name='material licitado')
+    quantity = models.IntegerField('saldo')
+    last_movement_id = models.BigIntegerField('último movimento incluído')
+    taken_at = models.DateTimeField('gerado em', default=timezone.now)
+
+    class Meta:
+        ordering = ['-taken_at']
+        verbose_name = 'snapshot de estoque'
+        verbose_name_plural = 'snapshots de estoque'
+        indexes = [
+            models.Index(fields=['material_bidding', 'last_movement_id']),
+        ]
+
+    def __str__(self):
+        return f"Snapshot {self.material_bidding_id}: {self.quantity} em {self.taken_at:%d/%m/%Y %H:%M}"
+
+
+class MaterialBalance(models.Model):
+    """
+    Resumo pré-calculado dos saldos de um material licitado (modelo de leitura).
+
+    Consolida MaterialBidding (licitado/comprado), MaterialReport (usado em
+    laudos) e StockItem (estoque físico) em uma linha, para a visão de estoque
+    e as APIs de materiais não recalcularem os saldos a cada requisição.
+
+    Atualizado por MaterialBalanceService.refresh: incrementalmente pelo
+    StockLedgerService e pelos signals de MaterialBidding/MaterialReport, e por
+    completo com `manage.py refresh_material_balances`.
+    """
+    material_bidding = models.OneToOneField(
+        MaterialBidding,
+        on_delete=models.CASCADE,
+        related_name='balance',
+        verbose_name='material licitado'
+    )
+    licensed = models.IntegerField('licitado', default=0)
+    purchased = models.IntegerField('comprado', default=0)
+    used_in_reports = models.IntegerField('usado em laudos', default=0)
+    in_stock = models.IntegerField('em estoque', default=0)
+    available = models.IntegerField(
+        'disponível', default=0,
+        help_text='Licitado menos o usado em laudos')
+    available_for_purchase = models.IntegerField('disponível para compra', default=0)
+    usage_permille = models.IntegerField(
+        'uso do limite (‰)', default=0,
+        help_text='Comprado / licitado, em décimos de percentual')
+    near_limit = models.BooleanField('próximo do limite', default=False)
+    at_limit = models.BooleanField('no limite', default=False)
+    updated_at = models.DateTimeField('atualizado em', auto_now=True)
+
+    class Meta:
+        verbose_name = 'saldo de material'
+        verbose_name_plural = 'saldos de materiais'
+        indexes = [
+            models.Index(fields=['in_stock']),
+        ]
+
+    def __str__(self):
+        return f"Saldo: {self.material_bidding_id} (disponível {self.available})"
+
+    @property
+    def usage_percentage(self):
+        """Percentual do limite de compra já utilizado."""
+        return self.usage_permille / 10
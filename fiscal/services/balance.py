@@ -0,0 +1,123 @@
+"""
+Serviço do modelo de leitura MaterialBalance.
+
+Os saldos de cada MaterialBidding (licitado, comprado, usado em laudos, em
+estoque e disponível) são calculados em uma única consulta agregada e gravados
+com um upsert (bulk_create com update_conflicts). Leituras (visão de estoque,
+APIs de materiais) consultam só a tabela pronta.
+
+Atualização:
+- incremental: StockLedgerService.apply (compras/estoque) e os signals de
+  MaterialBidding e MaterialReport chamam refresh() com os materiais afetados
+- completa: `manage.py refresh_material_balances` (ex: depois de loaddata)
+"""
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+BALANCE_FIELDS = [
+    'licensed', 'purchased', 'used_in_reports', 'in_stock', 'available',
+    'available_for_purchase', 'usage_permille', 'near_limit', 'at_limit',
+]
+
+
+class MaterialBalanceService:
+    """
+    Mantém MaterialBalance em dia com as tabelas de origem.
+
+    Uso:
+        MaterialBalanceService.refresh([mb_id, ...])  # incremental
+        MaterialBalanceService.refresh()              # todos os materiais
+    """
+
+    @staticmethod
+    def compute(material_bidding_ids=None) -> dict:
+        """
+        Calcula os saldos a partir das tabelas de origem, em uma consulta.
+
+        Returns:
+            Dict {material_bidding_id: {campo: valor}} com BALANCE_FIELDS
+        """
+        from bidding_procurement.models import MaterialBidding
+        from fiscal.models import StockItem
+        from reports.models import MaterialReport
+
+        queryset = MaterialBidding.objects.with_usage()
+        if material_bidding_ids is not None:
+            queryset = queryset.filter(pk__in=material_bidding_ids)
+
+        used = MaterialReport.objects.filter(
+            material_bidding=OuterRef('pk')
+        ).order_by().values('material_bidding').annotate(total=Sum('quantity')).values('total')
+        in_stock = StockItem.objects.filter(material_bidding=OuterRef('pk')).values('quantity')[:1]
+
+        rows = queryset.annotate(
+            used=Coalesce(Subquery(used), Value(0)),
+            stock=Coalesce(Subquery(in_stock), Value(0)),
+        ).order_by().values_list(
+            'pk', 'quantity', 'quantity_purchased', 'used', 'stock',
+            'available_qty', 'usage_permille', 'near_limit_flag', 'at_limit_flag',
+        )
+        return {
+            pk: {
+                'licensed': quantity,
+                'purchased': purchased,
+                'used_in_reports': used,
+                'in_stock': stock,
+                'available': quantity - used,
+                'available_for_purchase': available,
+                'usage_permille': permille,
+                'near_limit': near,
+                'at_limit': at,
+            }
+            for pk, quantity, purchased, used, stock, available, permille, near, at in rows
+        }
+
+    @staticmethod
+    def refresh(material_bidding_ids=None) -> int:
+        """
+        Recalcula e grava (upsert) os saldos dos materiais informados.
+
+        Args:
+            material_bidding_ids: IDs a atualizar; None atualiza todos
+
+        Returns:
+            Quantidade de saldos gravados
+        """
+        from fiscal.models import MaterialBalance
+
+        if material_bidding_ids is not None:
+            material_bidding_ids = {pk for pk in material_bidding_ids if pk is not None}
+            if not material_bidding_ids:
+                return 0
+
+        computed = MaterialBalanceService.compute(material_bidding_ids)
+        if not computed:
+            return 0
+        MaterialBalance.objects.bulk_create(
+            [MaterialBalance(material_bidding_id=pk, **values) for pk, values in computed.items()],
+            update_conflicts=True,
+            unique_fields=['material_bidding'],
+            update_fields=BALANCE_FIELDS + ['updated_at'],
+            batch_size=1000,
+        )
+        return len(computed)
+
+    @staticmethod
+    def stale() -> list:
+        """
+        Materiais cujo MaterialBalance está ausente ou diverge das origens.
+
+        Returns:
+            Lista de material_bidding_id
+        """
+        from fiscal.models import MaterialBalance
+
+        computed = MaterialBalanceService.compute()
+        stored = {
+            row['material_bidding_id']: row
+            for row in MaterialBalance.objects.values('material_bidding_id', *BALANCE_FIELDS)
+        }
+        return sorted(
+            pk for pk, values in computed.items()
+            if pk not in stored or any(stored[pk][field] != value for field, value in values.items())
+        )
@@ -0,0 +1,59 @@
+"""
+Serviço para operações em lote com Fichas de Entrega.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from core.services import ServiceResult
+from fiscal.services.stock import StockLedgerService
+
+
+class DeliveryService:
+    """
+    Serviço responsável pela conclusão de entregas em massa.
+
+    Não usa save() por entrega: o status é alterado com um único UPDATE e a
+    baixa de estoque é feita diretamente pelo StockLedgerService (o signal
+    update_stock_on_delivery_completion não é disparado por update()).
+    """
+
+    @staticmethod
+    def complete_many(delivery_ids, received_by: str, received_at=None) -> ServiceResult:
+        """
+        Conclui as entregas pendentes/a caminho informadas e baixa o estoque.
+
+        Tudo em uma transação, com número fixo de comandos:
+        - SELECT ... FOR UPDATE das entregas ainda abertas
+        - UPDATE do status/recebimento
+        - baixa de estoque agregada por material (complete_deliveries)
+
+        Args:
+            delivery_ids: IDs das fichas de entrega
+            received_by: Texto gravado em received_by
+            received_at: Data/hora do recebimento (padrão: agora)
+
+        Returns:
+            ServiceResult com data={'updated': entregas concluídas,
+            'items': itens baixados do estoque}
+        """
+        from fiscal.models import DeliveryNote
+
+        received_at = received_at or timezone.now()
+
+        with transaction.atomic():
+            # Trava as entregas para que duas conclusões em massa simultâneas
+            # não concluam (e baixem) a mesma entrega duas vezes
+            ids = list(
+                DeliveryNote.objects.select_for_update()
+                .filter(id__in=delivery_ids, status__in=['P', 'A'])
+                .values_list('pk', flat=True)
+            )
+            items = 0
+            if ids:
+                DeliveryNote.objects.filter(pk__in=ids).update(
+                    status='C', received_at=received_at, received_by=received_by)
+                items = StockLedgerService.complete_deliveries(ids)
+
+        return ServiceResult.ok(
+            data={'updated': len(ids), 'items': items},
+            message=f'{len(ids)} ficha(s) de entrega concluída(s) com sucesso!')
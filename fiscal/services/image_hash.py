@@ -0,0 +1,133 @@
+"""
+Hash perceptual (dHash) das imagens de OCR para reaproveitar resultados de
+imagens quase idênticas (mesma nota reenviada, recomprimida pelo celular).
+
+dHash de 64 bits: a imagem vira 9x8 em tons de cinza e cada bit diz se o
+pixel é mais claro que o vizinho da direita. Imagens parecidas têm hashes a
+poucos bits de distância (distância de Hamming).
+
+Índice por faixas (multi-index hashing): o hash é dividido em 4 faixas de 16
+bits, cada uma em uma coluna indexada de OCRJob. Dois hashes a distância <= 3
+coincidem em pelo menos uma faixa (casa dos pombos), então a busca é
+
+    WHERE phash_band_0 = a OR phash_band_1 = b OR ...
+
+seguida do cálculo exato da distância só para os candidatos. Nada fica em
+memória entre requisições (o app roda em funções serverless).
+
+O limite (OCR_PHASH_MAX_DISTANCE, padrão 3) é conservador de propósito: notas
+diferentes do mesmo fornecedor têm leiaute quase igual, e reaproveitar o
+resultado errado é pior que uma chamada a mais ao Gemini. 0 desativa a busca
+por semelhança (só o MD5 exato continua valendo). Acima de BANDS - 1 (3) a
+busca por faixas perderia imagens dentro do limite, então o valor é
+rejeitado (ImproperlyConfigured na importação).
+"""
+from io import BytesIO
+
+from decouple import config
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Q
+from PIL import Image
+
+HASH_BITS = 64
+BANDS = 4
+BAND_BITS = HASH_BITS // BANDS
+BAND_FIELDS = [f'phash_band_{i}' for i in range(BANDS)]
+
+# Maior distância com recall garantido pelo índice de faixas (casa dos pombos)
+MAX_INDEXED_DISTANCE = BANDS - 1
+
+
+def _configured_max_distance() -> int:
+    value = config('OCR_PHASH_MAX_DISTANCE', default=3, cast=int)
+    if not 0 <= value <= MAX_INDEXED_DISTANCE:
+        raise ImproperlyConfigured(
+            f'OCR_PHASH_MAX_DISTANCE deve estar entre 0 e {MAX_INDEXED_DISTANCE} '
+            f'(o índice de {BANDS} faixas não encontra distâncias maiores): {value}'
+        )
+    return value
+
+
+OCR_PHASH_MAX_DISTANCE = _configured_max_distance()
+
+
+def dhash(image: Image.Image) -> int:
+    """Calcula o dHash de 64 bits (inteiro sem sinal) de uma imagem PIL."""
+    small = image.convert('L').resize((9, 8), Image.Resampling.LANCZOS)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def dhash_bytes(image_bytes: bytes) -> int:
+    """dHash a partir dos bytes de uma imagem."""
+    with Image.open(BytesIO(image_bytes)) as image:
+        return dhash(image)
+
+
+def hamming(a: int, b: int) -> int:
+    """Quantidade de bits diferentes entre dois hashes."""
+    return (a ^ b).bit_count()
+
+
+def hash_fields(value: int) -> dict:
+    """
+    Campos de OCRJob para o hash: perceptual_hash (BigInteger com sinal) e
+    as faixas indexadas phash_band_0..3.
+    """
+    signed = value - (1 << HASH_BITS) if value >= 1 << (HASH_BITS - 1) else value
+    mask = (1 << BAND_BITS) - 1
+    fields = {'perceptual_hash': signed}
+    for i, field in enumerate(BAND_FIELDS):
+        fields[field] = (value >> (BAND_BITS * (BANDS - 1 - i))) & mask
+    return fields
+
+
+def stored_hash(job) -> int | None:
+    """Hash sem sinal gravado no OCRJob (ou None)."""
+    if job.perceptual_hash is None:
+        return None
+    return job.perceptual_hash % (1 << HASH_BITS)
+
+
+def find_similar_job(value: int, max_distance: int = None, queryset=None):
+    """
+    Job concluído com a imagem mais parecida, dentro do limite de distância.
+
+    Args:
+        value: dHash da imagem enviada
+        max_distance: Distância máxima (padrão: OCR_PHASH_MAX_DISTANCE)
+        queryset: OCRJobs candidatos (padrão: concluídos)
+
+    Returns:
+        Tupla (job, distância) ou None
+
+    Raises:
+        ValueError: max_distance acima de MAX_INDEXED_DISTANCE
+    """
+    from fiscal.models import OCRJob
+
+    max_distance = OCR_PHASH_MAX_DISTANCE if max_distance is None else max_distance
+    if max_distance > MAX_INDEXED_DISTANCE:
+        raise ValueError(f'max_distance deve ser no máximo {MAX_INDEXED_DISTANCE}: {max_distance}')
+    if max_distance <= 0:
+        return None
+    if queryset is None:
+        queryset = OCRJob.objects.filter(status='completed')
+
+    bands = hash_fields(value)
+    same_band = Q()
+    for field in BAND_FIELDS:
+        same_band |= Q(**{field: bands[field]})
+
+    best = None
+    for job in queryset.filter(same_band).only('id', 'perceptual_hash', 'result', 'image_path', 'created_at'):
+        distance = hamming(value, stored_hash(job))
+        if distance <= max_distance and (best is None or distance < best[1]):
+            best = (job, distance)
+    return best
@@ -3,7 +3,7 @@ Serviços para lógica de negócio do app fiscal.
 """
 from django.db.models import Count, Q
 from reports.models import Report, MaterialReport
-from fiscal.models import Invoice, InvoiceItem
+from fiscal.models import Invoice
 
 
 def suggest_reports_for_invoice(invoice: Invoice, limit: int = 5) -> list:
@@ -32,42 +32,40 @@ def suggest_reports_for_invoice(invoice: Invoice, limit: int = 5) -> list:
     if not invoice_material_ids:
         return []
     
-    # Laudos abertos com materiais em comum
+    # Uma única consulta agrupada: laudos abertos que têm ao menos um material
+    # da nota, com contagem de coincidentes e total de itens, ordenada e
+    # limitada no banco (custo não cresce com o número de laudos abertos).
     # Nota: Não excluímos laudos que já têm notas vinculadas, pois um laudo
     # pode ter várias notas (a regra 1 nota = 1 laudo é garantida pelo modelo)
-    open_reports = Report.objects.filter(
-        status='1'  # Aberto
-    ).prefetch_related(
-        'materiais', 'sector'
-    ).distinct()
-    
-    suggestions = []
-    
-    for report in open_reports:
-        # Materiais do laudo
-        report_material_ids = set(
-            report.materiais.values_list('material_bidding_id', flat=True)
-        )
-        
-        # Interseção (materiais em comum)
-        common_materials = invoice_material_ids & report_material_ids
-        
-        if common_materials:
-            suggestions.append({
-                'report': report,
-                'matching_items': len(common_materials),
-                'sector': report.sector,
-                'sector_name': report.sector.name if report.sector else 'Sem setor',
-                'total_items': report.materiais.count(),
-                'match_percentage': round(
-                    len(common_materials) / len(invoice_material_ids) * 100, 1
-                ) if invoice_material_ids else 0
-            })
-    
-    # Ordenar por quantidade de matches (maior primeiro)
-    suggestions.sort(key=lambda x: x['matching_items'], reverse=True)
+    candidate_reports = MaterialReport.objects.filter(
+        report__status='1',  # Aberto
+        material_bidding_id__in=invoice_material_ids,
+    ).values('report_id')
+
+    reports = Report.objects.filter(
+        pk__in=candidate_reports
+    ).annotate(
+        matching_items=Count(
+            'materiais__material_bidding_id',
+            filter=Q(materiais__material_bidding_id__in=invoice_material_ids),
+            distinct=True,
+        ),
+        total_items=Count('materiais', distinct=True),
+    ).select_related('sector').order_by('-matching_items', '-created_at', '-pk')[:limit]
     
-    return suggestions[:limit]
+    return [
+        {
+            'report': report,
+            'matching_items': report.matching_items,
+            'sector': report.sector,
+            'sector_name': report.sector.name if report.sector else 'Sem setor',
+            'total_items': report.total_items,
+            'match_percentage': round(
+                report.matching_items / len(invoice_material_ids) * 100, 1
+            ),
+        }
+        for report in reports
+    ]
 
 
 def get_invoice_linked_report(invoice: Invoice):
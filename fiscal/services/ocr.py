@@ -74,6 +74,39 @@ IMPORTANTE:
 """
 
 
+def get_api_keys() -> list[str]:
+    """
+    Chaves API do Gemini configuradas no .env.
+    
+    Formatos suportados:
+    1. Lista JSON: GEMINI_API_KEY=["chave1", "chave2", "chave3"]
+    2. Separado por vírgula: GEMINI_API_KEY=chave1,chave2,chave3
+    
+    Raises:
+        ValueError: GEMINI_API_KEY não configurada
+    """
+    import json
+    
+    api_keys_str = config('GEMINI_API_KEY', default=None)
+    
+    if not api_keys_str:
+        raise ValueError("GEMINI_API_KEY não configurada no .env")
+    
+    # Limpar aspas externas se houver
+    if api_keys_str.startswith('"') and api_keys_str.endswith('"'):
+        api_keys_str = api_keys_str[1:-1]
+    
+    # Tentar parsear como JSON primeiro
+    try:
+        parsed = json.loads(api_keys_str)
+        if isinstance(parsed, list):
+            return [key.strip() for key in parsed if key and key.strip()]
+        return [str(parsed).strip()]
+    except (json.JSONDecodeError, ValueError):
+        # Fallback: separar por vírgula
+        return [key.strip() for key in api_keys_str.split(',') if key.strip()]
+
+
 class InvoiceOCRService:
     """
     Serviço de extração de dados de notas fiscais via Gemini Vision.
@@ -101,27 +134,7 @@ class InvoiceOCRService:
         1. Lista JSON: GEMINI_API_KEY=["chave1", "chave2", "chave3"]
         2. Separado por vírgula: GEMINI_API_KEY=chave1,chave2,chave3
         """
-        import json
-        
-        api_keys_str = config('GEMINI_API_KEY', default=None)
-        
-        if not api_keys_str:
-            raise ValueError("GEMINI_API_KEY não configurada no .env")
-        
-        # Limpar aspas externas se houver
-        if api_keys_str.startswith('"') and api_keys_str.endswith('"'):
-            api_keys_str = api_keys_str[1:-1]
-        
-        # Tentar parsear como JSON primeiro
-        try:
-            parsed = json.loads(api_keys_str)
-            if isinstance(parsed, list):
-                self.api_keys = [key.strip() for key in parsed if key and key.strip()]
-            else:
-                self.api_keys = [str(parsed).strip()]
-        except (json.JSONDecodeError, ValueError):
-            # Fallback: separar por vírgula
-            self.api_keys = [key.strip() for key in api_keys_str.split(',') if key.strip()]
+        self.api_keys = get_api_keys()
         
         if not self.api_keys:
             raise ValueError("Nenhuma chave API válida encontrada em GEMINI_API_KEY")
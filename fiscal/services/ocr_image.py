@@ -0,0 +1,113 @@
+"""
+Preparo das fotos enviadas para OCR sem manter cópias da imagem original em
+memória.
+
+Fotos de celular passam de 10 MB (e ~36 MB de pixels decodificados). O
+preparo não lê o arquivo inteiro para um bytes:
+
+1. MD5 calculado em blocos (chunks do upload; o Django já grava uploads
+   grandes em arquivo temporário, FILE_UPLOAD_MAX_MEMORY_SIZE). Streams não
+   posicionáveis são copiados em blocos para um SpooledTemporaryFile.
+2. JPEG decodificado já reduzido com Image.draft() (escala 1/2, 1/4 ou 1/8
+   na própria descompressão DCT): os pixels em resolução cheia nunca existem.
+3. Redução final (thumbnail) e gravação do JPEG pequeno que vai para o
+   Storage; o hash perceptual é calculado sobre esse JPEG.
+
+Uso:
+    prepared = prepare_ocr_image(request.FILES['photo'])
+    prepared.image_bytes, prepared.md5, prepared.perceptual_hash
+"""
+import hashlib
+import tempfile
+from dataclasses import dataclass
+from io import BytesIO
+
+from PIL import Image
+
+from fiscal.services.image_hash import dhash_bytes
+
+MAX_SIZE = 800
+JPEG_QUALITY = 50
+CHUNK_SIZE = 64 * 1024
+# Acima disso, o spool de streams não posicionáveis vai para disco
+SPOOL_MAX_MEMORY = 1024 * 1024
+
+
+@dataclass
+class PreparedImage:
+    """Imagem pronta para o OCR."""
+    image_bytes: bytes
+    md5: str
+    perceptual_hash: int
+    original_size: tuple
+
+
+def prepare_ocr_image(upload, max_size: int = MAX_SIZE, quality: int = JPEG_QUALITY) -> PreparedImage:
+    """
+    Calcula o MD5 do arquivo original e gera o JPEG reduzido.
+
+    Args:
+        upload: UploadedFile do Django ou arquivo binário
+        max_size: Maior lado da imagem gerada, em pixels
+        quality: Qualidade do JPEG gerado
+
+    Returns:
+        PreparedImage
+    """
+    source, md5 = _hash_and_spool(upload)
+    try:
+        with Image.open(source) as image:
+            original_size = image.size
+            if image.format == 'JPEG':
+                # Decodifica direto na menor escala DCT que ainda cobre max_size
+                image.draft('RGB', (max_size, max_size))
+            image = image.convert('RGB') if image.mode != 'RGB' else image
+            image.thumbnail((max_size, max_size))
+
+            output = BytesIO()
+            image.save(output, format='JPEG', quality=quality)
+    finally:
+        if source is not upload:
+            source.close()
+
+    image_bytes = output.getvalue()
+    return PreparedImage(
+        image_bytes=image_bytes,
+        md5=md5,
+        perceptual_hash=dhash_bytes(image_bytes),
+        original_size=original_size,
+    )
+
+
+def _chunks(upload):
+    if hasattr(upload, 'chunks'):
+        yield from upload.chunks(CHUNK_SIZE)
+        return
+    while True:
+        chunk = upload.read(CHUNK_SIZE)
+        if not chunk:
+            return
+        yield chunk
+
+
+def _hash_and_spool(upload):
+    """
+    MD5 em blocos. Retorna (arquivo posicionado no início, md5): o próprio
+    upload quando é posicionável, senão um SpooledTemporaryFile com a cópia.
+    """
+    md5 = hashlib.md5()
+    seekable = getattr(upload, 'seekable', lambda: False)()
+
+    if seekable:
+        upload.seek(0)
+        for chunk in _chunks(upload):
+            md5.update(chunk)
+        upload.seek(0)
+        return upload, md5.hexdigest()
+
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+    for chunk in _chunks(upload):
+        md5.update(chunk)
+        spool.write(chunk)
+    spool.seek(0)
+    return spool, md5.hexdigest()
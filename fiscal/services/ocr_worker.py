@@ -0,0 +1,170 @@
+"""
+Worker local de OCR: processa os OCRJobs pendentes fora das requisições.
+
+Sem Supabase, o OCR era feito dentro do GET de polling (ocr_status), e dois
+polls simultâneos podiam processar o mesmo job. Agora o comando
+process_ocr_jobs consome a fila:
+
+1. claim(): SELECT ... FOR UPDATE SKIP LOCKED dos jobs pendentes (mais
+   antigos primeiro) e UPDATE para 'processing' na mesma transação. Vários
+   workers nunca pegam o mesmo job.
+2. process(): roda a extração (_process_ocr_job_locally) e grava o
+   resultado. Erros transitórios voltam para a fila com espera exponencial
+   (backoff * 2^tentativas) até max_attempts; falta de quota devolve o job
+   sem contar tentativa, para depois da virada do dia (APIKeyStatus).
+
+O serviço de OCR é criado por service_factory (padrão: InvoiceOCRService),
+uma instância por thread; nos testes basta passar um stub com
+extract_from_bytes().
+"""
+import threading
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from fiscal.models import APIKeyStatus, OCRJob
+
+MAX_ATTEMPTS = 3
+BACKOFF_SECONDS = 30
+
+# Erros que uma nova tentativa não resolve
+PERMANENT_ERRORS = {'missing_image', 'duplicate'}
+
+
+def _default_service():
+    from fiscal.services.ocr import InvoiceOCRService
+    return InvoiceOCRService()
+
+
+def next_quota_reset(now=None):
+    """Início do próximo dia, quando APIKeyStatus considera as chaves livres."""
+    now = now or timezone.now()
+    return (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class OCRWorker:
+    """
+    Consome a fila de OCRJobs pendentes.
+
+    Uso:
+        worker = OCRWorker()
+        for job in worker.claim(4):
+            worker.process(job)
+    """
+
+    def __init__(self, service_factory=None, max_attempts: int = MAX_ATTEMPTS,
+                 backoff_seconds: int = BACKOFF_SECONDS, key_count: int = None):
+        """
+        Args:
+            service_factory: Callable que cria o serviço de OCR
+            max_attempts: Tentativas antes de marcar o job como falho
+            backoff_seconds: Espera base entre tentativas
+            key_count: Número de chaves Gemini (padrão: GEMINI_API_KEY)
+        """
+        self.service_factory = service_factory or _default_service
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self._key_count = key_count
+        self._local = threading.local()
+
+    @property
+    def key_count(self) -> int:
+        if self._key_count is None:
+            from fiscal.services.ocr import get_api_keys
+            self._key_count = len(get_api_keys())
+        return self._key_count
+
+    def has_quota(self) -> bool:
+        """Alguma chave ainda não esgotada hoje?"""
+        return APIKeyStatus.get_available_key_index(self.key_count) is not None
+
+    def ready_jobs(self):
+        """Jobs pendentes cuja próxima tentativa já chegou."""
+        now = timezone.now()
+        return OCRJob.objects.filter(
+            Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now),
+            status='pending',
+        )
+
+    def claim(self, limit: int) -> list:
+        """
+        Reserva até `limit` jobs para este worker, marcando-os como
+        'processing'. Jobs travados por outro worker são pulados.
+        """
+        if limit <= 0:
+            return []
+        now = timezone.now()
+        with transaction.atomic():
+            ids = list(
+                self.ready_jobs()
+                .select_for_update(skip_locked=True)
+                .order_by('created_at')
+                .values_list('id', flat=True)[:limit]
+            )
+            if not ids:
+                return []
+            OCRJob.objects.filter(id__in=ids).update(status='processing', started_at=now)
+        jobs = {job.id: job for job in OCRJob.objects.filter(id__in=ids)}
+        return [jobs[job_id] for job_id in ids]
+
+    def release_stale(self, older_than: timedelta) -> int:
+        """
+        Devolve para a fila jobs em 'processing' há mais de older_than
+        (worker interrompido no meio), contando a tentativa.
+        """
+        cutoff = timezone.now() - older_than
+        stale = OCRJob.objects.filter(status='processing', started_at__lt=cutoff)
+        count = 0
+        for job in stale:
+            self._retry_or_fail(job, 'Processamento interrompido')
+            count += 1
+        return count
+
+    def process(self, job: OCRJob) -> str:
+        """
+        Processa um job já reservado por claim().
+
+        Returns:
+            'completed', 'failed', 'retry' ou 'quota'
+        """
+        from fiscal.views.ocr import _process_ocr_job_locally
+
+        try:
+            result = _process_ocr_job_locally(job, ocr_service=self._service())
+        except Exception as e:
+            result = {'success': False, 'error': str(e)}
+
+        if result.get('success'):
+            job.mark_completed(result['data'])
+            return 'completed'
+
+        error = result.get('error', 'Erro desconhecido')
+        error_type = result.get('error_type')
+        if error_type == 'quota_exceeded':
+            # O serviço sem chave disponível não se recupera sozinho
+            self._local.service = None
+            job.schedule_retry(error, next_quota_reset(), count_attempt=False)
+            return 'quota'
+        if error_type in PERMANENT_ERRORS:
+            job.mark_failed(error)
+            return 'failed'
+        return self._retry_or_fail(job, error)
+
+    def _retry_or_fail(self, job: OCRJob, error: str) -> str:
+        if job.attempts + 1 >= self.max_attempts:
+            job.attempts += 1
+            job.save(update_fields=['attempts'])
+            job.mark_failed(error)
+            return 'failed'
+        delay = self.backoff_seconds * 2 ** job.attempts
+        job.schedule_retry(error, timezone.now() + timedelta(seconds=delay))
+        return 'retry'
+
+    def _service(self):
+        """Serviço de OCR da thread atual (o cliente Gemini não é compartilhado)."""
+        service = getattr(self._local, 'service', None)
+        if service is None:
+            service = self._local.service = self.service_factory()
+        return service
@@ -0,0 +1,381 @@
+"""
+Serviço de movimentação de estoque e saldo de compras.
+
+Todas as alterações de StockItem.quantity (estoque físico) e
+MaterialBidding.quantity_purchased (saldo financeiro) passam por aqui como
+deltas por material, aplicados com um único UPDATE atômico:
+
+    UPDATE ... SET quantity = MAX(quantity + CASE material WHEN ... END, 0)
+
+Sem leitura-modificação-escrita em Python, duas notas do mesmo material
+salvas ao mesmo tempo não perdem incrementos. StockItem ausente é criado
+antes (INSERT com ignore_conflicts, seguro sob concorrência).
+
+Cada alteração de estoque também grava StockMovement (livro-razão, só
+inserção, via bulk_create) na mesma transação. Os movimentos registram o
+delta efetivamente aplicado: quando o saldo seria negativo e fica limitado a
+0, a diferença entra no livro-razão, e a soma dos movimentos continua igual
+a StockItem.quantity. StockItem.quantity é o saldo
+materializado; o livro-razão + StockSnapshot permite saldo em qualquer data
+(balances) e reconstruir o StockItem (rebuild_stock_items). O resumo
+MaterialBalance dos materiais tocados é atualizado na mesma transação.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Max, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from fiscal.services.balance import MaterialBalanceService
+
+
+class StockLedgerService:
+    """
+    Aplica deltas de estoque/compras em lote.
+
+    Uso:
+        StockLedgerService.apply(stock={mb_id: +10}, purchased={mb_id: +10})
+        StockLedgerService.complete_deliveries([delivery.pk, ...])
+    """
+
+    @staticmethod
+    def apply(stock: dict = None, purchased: dict = None, movements: list = None, note: str = ''):
+        """
+        Aplica deltas {material_bidding_id: delta} ao estoque e às compras.
+
+        Os saldos nunca ficam negativos (o resultado é limitado a 0); nesse
+        caso os movimentos de estoque são corrigidos para o delta aplicado.
+
+        Args:
+            stock: Deltas do estoque físico
+            purchased: Deltas do saldo comprado (MaterialBidding)
+            movements: StockMovement (não salvos) que justificam os deltas de
+                estoque; se omitido, grava um movimento de ajuste por material
+            note: Observação dos movimentos de ajuste gerados
+        """
+        from fiscal.models import StockMovement
+
+        stock = _non_zero(stock)
+        purchased = _non_zero(purchased)
+        if not stock and not purchased:
+            return
+
+        if movements is None:
+            movements = [
+                StockMovement(material_bidding_id=key, kind='A', quantity=delta, note=note)
+                for key, delta in stock.items()
+            ]
+
+        with transaction.atomic():
+            if stock:
+                applied = _apply_stock(stock)
+                StockMovement.objects.bulk_create(_applied_movements(movements, stock, applied))
+            if purchased:
+                _apply_purchased(purchased)
+            MaterialBalanceService.refresh(set(stock) | set(purchased))
+
+    @staticmethod
+    def register_invoice_item(item, old_material_bidding_id=None, old_quantity=0):
+        """
+        Entrada (ou correção) de um item de nota: soma a quantidade ao estoque
+        e ao saldo comprado, descontando o valor anterior em caso de edição.
+        """
+        from fiscal.models import StockMovement
+
+        if old_material_bidding_id == item.material_bidding_id and old_quantity == item.quantity:
+            return
+
+        deltas = Counter()
+        movements = []
+        if old_material_bidding_id is not None:
+            deltas[old_material_bidding_id] -= old_quantity
+            movements.append(StockMovement(
+                material_bidding_id=old_material_bidding_id, kind='R', quantity=-old_quantity,
+                invoice_item=item, note='Correção do item da nota'))
+        deltas[item.material_bidding_id] += item.quantity
+        movements.append(StockMovement(
+            material_bidding_id=item.material_bidding_id, kind='E', quantity=item.quantity,
+            invoice_item=item))
+        StockLedgerService.apply(stock=deltas, purchased=deltas, movements=movements)
+
+    @staticmethod
+    def reverse_invoice_item(item):
+        """Estorna um item de nota excluído (estoque e saldo comprado)."""
+        from fiscal.models import StockMovement
+
+        deltas = {item.material_bidding_id: -item.quantity}
+        movements = [StockMovement(
+            material_bidding_id=item.material_bidding_id, kind='R', quantity=-item.quantity,
+            note=f'Item {item.pk} da nota {item.invoice_id} excluído')]
+        StockLedgerService.apply(stock=deltas, purchased=deltas, movements=movements)
+
+    @staticmethod
+    def complete_delivery(delivery) -> int:
+        """
+        Baixa do estoque os itens da entrega ainda não baixados.
+
+        Returns:
+            Quantidade de itens baixados
+        """
+        return StockLedgerService.complete_deliveries([delivery.pk])
+
+    @staticmethod
+    def complete_deliveries(delivery_ids) -> int:
+        """
+        Baixa do estoque, em lote, os itens ainda não baixados das entregas.
+
+        Os itens são travados (select_for_update) e marcados como baixados na
+        mesma transação, então salvar a entrega duas vezes (ou em paralelo) não
+        baixa o estoque em dobro. Número fixo de comandos, independente da
+        quantidade de entregas: um SELECT dos itens, os deltas agregados por
+        material (StockLedgerService.apply) e um UPDATE de stock_updated.
+
+        Returns:
+            Quantidade de itens baixados
+        """
+        from fiscal.models import DeliveryNoteItem, StockMovement
+
+        with transaction.atomic():
+            items = list(
+                DeliveryNoteItem.objects.select_for_update()
+                .filter(delivery_note_id__in=list(delivery_ids), stock_updated=False)
+                .values_list('pk', 'invoice_item__material_bidding_id', 'quantity_delivered')
+            )
+            if not items:
+                return 0
+
+            deltas = Counter()
+            movements = []
+            for pk, material_bidding_id, quantity in items:
+                deltas[material_bidding_id] -= quantity
+                movements.append(StockMovement(
+                    material_bidding_id=material_bidding_id, kind='S', quantity=-quantity,
+                    delivery_note_item_id=pk))
+
+            StockLedgerService.apply(stock=deltas, movements=movements)
+            DeliveryNoteItem.objects.filter(
+                pk__in=[pk for pk, _, _ in items]
+            ).update(stock_updated=True)
+        return len(items)
+
+    @staticmethod
+    def reverse_delivery_item(item):
+        """Devolve ao estoque um item de entrega já baixado que foi excluído."""
+        from fiscal.models import StockMovement
+
+        if not item.stock_updated:
+            return
+        material_bidding_id = item.invoice_item.material_bidding_id
+        StockLedgerService.apply(
+            stock={material_bidding_id: item.quantity_delivered},
+            movements=[StockMovement(
+                material_bidding_id=material_bidding_id, kind='R', quantity=item.quantity_delivered,
+                note=f'Item {item.pk} da entrega {item.delivery_note_id} excluído')],
+        )
+
+    @staticmethod
+    def balances(material_bidding_ids=None, at=None, until_movement_id=None) -> dict:
+        """
+        Saldo por material a partir do livro-razão: último snapshot + movimentos
+        posteriores. Duas consultas, independente do tamanho do histórico.
+
+        Args:
+            material_bidding_ids: Restringe aos materiais informados
+            at: Saldo na data/hora informada (padrão: agora)
+            until_movement_id: Considera só movimentos até esse id
+
+        Returns:
+            Dict {material_bidding_id: saldo} (saldos nunca negativos)
+        """
+        from fiscal.models import StockMovement, StockSnapshot
+
+        snapshots = StockSnapshot.objects.all()
+        movements = StockMovement.objects.all()
+        if material_bidding_ids is not None:
+            snapshots = snapshots.filter(material_bidding_id__in=material_bidding_ids)
+            movements = movements.filter(material_bidding_id__in=material_bidding_ids)
+        if at is not None:
+            snapshots = snapshots.filter(taken_at__lte=at)
+            movements = movements.filter(created_at__lte=at)
+        if until_movement_id is not None:
+            snapshots = snapshots.filter(last_movement_id__lte=until_movement_id)
+            movements = movements.filter(id__lte=until_movement_id)
+
+        # Snapshot mais recente de cada material (dentro dos mesmos filtros)
+        latest = snapshots.filter(
+            material_bidding_id=OuterRef('material_bidding_id')
+        ).order_by('-last_movement_id', '-id')
+        result = dict(
+            snapshots.filter(pk=Subquery(latest.values('pk')[:1]))
+            .values_list('material_bidding_id', 'quantity')
+        )
+
+        # Movimentos depois do snapshot (marca d'água = last_movement_id)
+        deltas = movements.annotate(
+            watermark=Coalesce(Subquery(latest.values('last_movement_id')[:1]), Value(0))
+        ).filter(id__gt=F('watermark')).values('material_bidding_id').annotate(
+            total=Sum('quantity')
+        ).order_by().values_list('material_bidding_id', 'total')
+
+        for material_bidding_id, total in deltas:
+            result[material_bidding_id] = result.get(material_bidding_id, 0) + total
+        return {key: max(0, value) for key, value in result.items()}
+
+    @staticmethod
+    def take_snapshots() -> int:
+        """
+        Grava um StockSnapshot para cada material com movimentos desde o último.
+
+        Returns:
+            Quantidade de snapshots criados
+        """
+        from fiscal.models import StockMovement, StockSnapshot
+
+        with transaction.atomic():
+            watermark = StockMovement.objects.aggregate(last=Max('id'))['last']
+            if watermark is None:
+                return 0
+
+            latest = StockSnapshot.objects.filter(
+                material_bidding_id=OuterRef('material_bidding_id')
+            ).order_by('-last_movement_id', '-id')
+            changed = set(
+                StockMovement.objects.filter(id__lte=watermark).annotate(
+                    previous=Coalesce(Subquery(latest.values('last_movement_id')[:1]), Value(0))
+                ).filter(id__gt=F('previous')).values_list('material_bidding_id', flat=True).distinct()
+            )
+            if not changed:
+                return 0
+
+            balances = StockLedgerService.balances(changed, until_movement_id=watermark)
+            now = timezone.now()
+            StockSnapshot.objects.bulk_create([
+                StockSnapshot(
+                    material_bidding_id=key, quantity=balances.get(key, 0),
+                    last_movement_id=watermark, taken_at=now,
+                )
+                for key in changed
+            ])
+        return len(changed)
+
+    @staticmethod
+    def stale_stock_items() -> dict:
+        """
+        Materiais cujo StockItem.quantity diverge do livro-razão.
+
+        Returns:
+            Dict {material_bidding_id: (saldo atual, saldo do livro-razão)}
+        """
+        from fiscal.models import StockItem
+
+        ledger = StockLedgerService.balances()
+        current = dict(StockItem.objects.values_list('material_bidding_id', 'quantity'))
+        return {
+            key: (current.get(key, 0), ledger.get(key, 0))
+            for key in set(ledger) | set(current)
+            if current.get(key, 0) != ledger.get(key, 0)
+        }
+
+    @staticmethod
+    def rebuild_stock_items() -> int:
+        """
+        Recalcula StockItem.quantity a partir do livro-razão.
+
+        Returns:
+            Quantidade de StockItem corrigidos
+        """
+        from fiscal.models import StockItem
+
+        with transaction.atomic():
+            stale = StockLedgerService.stale_stock_items()
+            if not stale:
+                return 0
+            StockItem.objects.bulk_create(
+                [StockItem(material_bidding_id=key, quantity=0) for key in stale],
+                ignore_conflicts=True,
+            )
+            items = list(StockItem.objects.select_for_update().filter(material_bidding_id__in=list(stale)))
+            for item in items:
+                item.quantity = stale[item.material_bidding_id][1]
+                item.updated_at = timezone.now()
+            StockItem.objects.bulk_update(items, ['quantity', 'updated_at'])
+            MaterialBalanceService.refresh(stale)
+        return len(items)
+
+
+def _non_zero(deltas) -> dict:
+    return {key: delta for key, delta in (deltas or {}).items() if key is not None and delta}
+
+
+def _delta_case(field: str, deltas: dict) -> Case:
+    return Case(
+        *[When(**{field: key}, then=Value(delta)) for key, delta in deltas.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def _apply_stock(deltas: dict) -> dict:
+    """
+    Aplica os deltas ao StockItem (limitando a 0).
+
+    Deve rodar dentro de transaction.atomic(): as linhas ficam travadas
+    (select_for_update) entre a leitura do saldo anterior e o UPDATE.
+
+    Returns:
+        Dict {material_bidding_id: delta efetivamente aplicado}
+    """
+    from fiscal.models import StockItem
+
+    # Upsert: garante a linha de cada material sem sobrescrever as existentes
+    StockItem.objects.bulk_create(
+        [StockItem(material_bidding_id=key, quantity=0) for key in deltas],
+        ignore_conflicts=True,
+    )
+    rows = StockItem.objects.filter(material_bidding_id__in=list(deltas))
+    previous = dict(rows.select_for_update().values_list('material_bidding_id', 'quantity'))
+    rows.update(
+        quantity=Greatest(F('quantity') + _delta_case('material_bidding_id', deltas), Value(0)),
+        updated_at=timezone.now(),
+    )
+    return {
+        key: max(0, previous.get(key, 0) + delta) - previous.get(key, 0)
+        for key, delta in deltas.items()
+    }
+
+
+def _applied_movements(movements: list, requested: dict, applied: dict) -> list:
+    """
+    Ajusta os movimentos ao delta aplicado por material.
+
+    Com um único movimento do material, a diferença do limite em 0 é
+    descontada dele (ex.: saída de 5 com saldo 2 grava -2); com vários, entra
+    um movimento de ajuste separado.
+    """
+    from fiscal.models import StockMovement
+
+    result = [movement for movement in movements if movement.quantity]
+    by_material = {}
+    for movement in result:
+        by_material.setdefault(movement.material_bidding_id, []).append(movement)
+
+    for key, delta in requested.items():
+        difference = applied[key] - delta
+        if not difference:
+            continue
+        own = by_material.get(key, [])
+        if len(own) == 1:
+            own[0].quantity += difference
+        else:
+            result.append(StockMovement(
+                material_bidding_id=key, kind='A', quantity=difference, note='Saldo limitado a 0'))
+    return result
+
+
+def _apply_purchased(deltas: dict):
+    from bidding_procurement.models import MaterialBidding
+
+    MaterialBidding.objects.filter(pk__in=list(deltas)).update(
+        quantity_purchased=Greatest(F('quantity_purchased') + _delta_case('pk', deltas), Value(0)),
+    )
@@ -6,7 +6,10 @@ from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.conf import settings
 from pathlib import Path
-from fiscal.models import Invoice, InvoiceItem, DeliveryNote, DeliveryNoteItem, StockItem
+from bidding_procurement.models import MaterialBidding
+from fiscal.models import Invoice, InvoiceItem, DeliveryNote, DeliveryNoteItem
+from fiscal.services.balance import MaterialBalanceService
+from fiscal.services.stock import StockLedgerService
 
 
 @receiver(post_delete, sender=Invoice)
@@ -43,45 +46,22 @@ def restore_material_balance_on_item_delete(sender, instance, **kwargs):
     """
     1. Estorna o saldo FINANCEIRO do material (quantity_purchased).
     2. Decrementa o estoque FÍSICO (StockItem) pois a entrada foi cancelada.
+    Ambos com UPDATE atômico via StockLedgerService.
     """
     # Skip durante loaddata
     if kwargs.get('raw', False):
         return
     
-    try:
-        if instance.material_bidding:
-            # 1. Estorno Financeiro (MaterialBidding)
-            material = instance.material_bidding
-            current_purchased = material.quantity_purchased or 0
-            new_purchased = max(0, current_purchased - instance.quantity)
-            material.quantity_purchased = new_purchased
-            material.save(update_fields=['quantity_purchased'])
-            
-            # 2. Estorno Físico (StockItem)
-            stock_item, created = StockItem.objects.get_or_create(material_bidding=material)
-            stock_item.quantity = max(0, stock_item.quantity - instance.quantity)
-            stock_item.save(update_fields=['quantity'])
-    except Exception:
-        pass  # Ignora erros durante loaddata
+    StockLedgerService.reverse_invoice_item(instance)
 
 
-@receiver(post_save, sender=InvoiceItem)
-def update_stock_on_invoice_item_save(sender, instance, created, **kwargs):
+@receiver(post_delete, sender=InvoiceItem)
+def update_invoice_totals_on_item_delete(sender, instance, **kwargs):
     """
-    Atualiza o estoque FÍSICO (StockItem) quando um item entra via Nota Fiscal.
-    NOTA: A atualização do FINANCEIRO (MaterialBidding) já é feita no save() do model.
+    Desconta o item dos totais desnormalizados da nota.
+    Roda dentro da transação do delete (inclusive em QuerySet.delete()).
     """
-    # Skip durante loaddata
-    if kwargs.get('raw', False):
-        return
-    
-    try:
-        if created and instance.material_bidding:
-            stock_item, _ = StockItem.objects.get_or_create(material_bidding=instance.material_bidding)
-            stock_item.quantity += instance.quantity
-            stock_item.save(update_fields=['quantity'])
-    except Exception:
-        pass  # Ignora erros durante loaddata
+    Invoice.adjust_totals(instance.invoice_id, -instance.total_price, -1)
 
 
 @receiver(post_save, sender=DeliveryNoteItem)
@@ -103,24 +83,8 @@ def update_stock_on_delivery_completion(sender, instance, created, **kwargs):
         return
         
     if instance.status == 'C':
-        # Busca itens que ainda não tiveram o estoque baixado
-        items_to_update = instance.items.filter(stock_updated=False)
-        
-        for item in items_to_update:
-            try:
-                invoice_item = item.invoice_item
-                if invoice_item.material_bidding:
-                    stock_item, _ = StockItem.objects.get_or_create(
-                        material_bidding=invoice_item.material_bidding
-                    )
-                    stock_item.quantity = max(0, stock_item.quantity - item.quantity_delivered)
-                    stock_item.save(update_fields=['quantity'])
-                    
-                    # Marca como atualizado para não baixar de novo se o model for salvo novamente
-                    item.stock_updated = True
-                    item.save(update_fields=['stock_updated'])
-            except Exception as e:
-                print(f"Erro ao atualizar estoque para item {item.pk}: {e}")
+        # Baixa em lote os itens que ainda não tiveram o estoque baixado
+        StockLedgerService.complete_delivery(instance)
 
 
 @receiver(post_delete, sender=DeliveryNoteItem)
@@ -134,11 +98,19 @@ def restore_stock_on_delivery_delete(sender, instance, **kwargs):
         return
     
     try:
-        if instance.stock_updated:
-            invoice_item = instance.invoice_item
-            if invoice_item.material_bidding:
-                stock_item, _ = StockItem.objects.get_or_create(material_bidding=invoice_item.material_bidding)
-                stock_item.quantity += instance.quantity_delivered
-                stock_item.save(update_fields=['quantity'])
-    except Exception:
+        StockLedgerService.reverse_delivery_item(instance)
+    except InvoiceItem.DoesNotExist:
         pass  # Ignora erros durante loaddata
+
+
+@receiver(post_save, sender=MaterialBidding)
+def refresh_balance_on_material_bidding_save(sender, instance, **kwargs):
+    """
+    Mantém o MaterialBalance do material em dia (quantidade licitada editada,
+    material novo). Compras e estoque são atualizados pelo StockLedgerService.
+    """
+    # Skip durante loaddata (refresh_material_balances roda depois)
+    if kwargs.get('raw', False):
+        return
+
+    MaterialBalanceService.refresh([instance.pk])
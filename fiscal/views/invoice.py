@@ -14,7 +14,7 @@ from django.db.models import Sum
 
 # Imports do app Fiscal
 # Imports do app Fiscal
-from fiscal.models import Invoice, InvoiceItem, Commitment
+from fiscal.models import Invoice, InvoiceItem, Commitment, MaterialBalance
 from fiscal.forms import InvoiceForm, InvoiceItemForm, InvoiceItemFormSet, CommitmentForm
 
 # Imports de outros apps
@@ -33,9 +33,11 @@ class InvoiceListView(LoginRequiredMixin, ListView):
     login_url = 'authenticate:login'
     
     def get_queryset(self):
+        # Projeção da listagem: totais e estado de entrega anotados,
+        # sem consultas por linha no template
         queryset = Invoice.objects.select_related(
             'supplier', 'commitment', 'report_link__report'
-        ).prefetch_related('items', 'deliveries').all().order_by('-issue_date', '-created_at')
+        ).with_list_projection().order_by('-issue_date', '-created_at')
         
         # Filtros
         q = self.request.GET.get('q') # Busca por número
@@ -363,20 +365,24 @@ def api_materials_by_supplier(request):
     if not supplier_id:
         return JsonResponse({'materials': []})
     
-    materials = MaterialBidding.objects.filter(
-        supplier_id=supplier_id,
-        status='1'
-    ).select_related('material', 'bidding')
+    # Saldos lidos do resumo pré-calculado (MaterialBalance)
+    balances = MaterialBalance.objects.filter(
+        material_bidding__supplier_id=supplier_id,
+        material_bidding__status='1'
+    ).select_related(
+        'material_bidding__material', 'material_bidding__bidding'
+    ).order_by('material_bidding__bidding', 'material_bidding__material')
     
     result = []
-    for m in materials:
+    for balance in balances:
+        m = balance.material_bidding
         result.append({
             'id': m.id,
             'name': f"{m.material.name} - {m.bidding.name}",
             'price': str(m.price),
-            'available': m.available_for_purchase,
-            'usage_percent': m.usage_percentage,
-            'is_near_limit': m.is_near_limit,
+            'available': balance.available_for_purchase,
+            'usage_percent': balance.usage_percentage,
+            'is_near_limit': balance.near_limit,
         })
     
     return JsonResponse({'materials': result})
@@ -6,17 +6,20 @@ Contorna o limite de 10s da Vercel usando:
 3. Polling do status do job
 """
 import json
+import logging
 import traceback
 import requests
-from io import BytesIO
 
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
 from decouple import config
-from PIL import Image
 
 from fiscal.models import OCRJob
+from fiscal.services.image_hash import find_similar_job, hash_fields
+from fiscal.services.ocr_image import prepare_ocr_image
+
+logger = logging.getLogger(__name__)
 
 
 def _get_supabase_config():
@@ -56,35 +59,29 @@ def ocr_submit(request):
         return JsonResponse({'error': 'Nenhuma imagem enviada'}, status=400)
     
     try:
-        # 1. Ler bytes originais para calcular hash (ANTES de otimizar)
-        import hashlib
-        original_bytes = photo.read()
-        image_hash = hashlib.md5(original_bytes).hexdigest()
-        photo.seek(0)  # Voltar ao início para poder abrir com PIL
-        
-        # 2. Otimizar imagem
-        img = Image.open(photo)
-        
-        if img.mode != 'RGB':
-            img = img.convert('RGB')
-        
-        max_size = 800
-        if img.width > max_size or img.height > max_size:
-            img.thumbnail((max_size, max_size))
-        
-        output = BytesIO()
-        img.save(output, format='JPEG', quality=50)
-        output.seek(0)
-        image_bytes = output.getvalue()
-        
-        # 3. Verificar se já existe um job com esta imagem que foi concluído com sucesso
+        # 1-2. MD5 do original em blocos + JPEG reduzido (decodificado já em
+        # escala menor), sem carregar a foto inteira em memória
+        prepared = prepare_ocr_image(photo)
+        image_hash = prepared.md5
+        image_bytes = prepared.image_bytes
+        
+        # 3. Verificar se já existe um job concluído com esta imagem: MD5 exato
+        # ou, se não houver, imagem quase idêntica pelo hash perceptual (dHash
+        # da imagem otimizada, a mesma que vai para o Storage)
         print(f"DEBUG OCR: Hash da imagem: {image_hash}")
+        perceptual_hash = prepared.perceptual_hash
         
         existing_job = OCRJob.objects.filter(
             image_hash=image_hash,
             status='completed'
         ).first()
         
+        if not existing_job:
+            similar = find_similar_job(perceptual_hash)
+            if similar:
+                existing_job, distance = similar
+                logger.info("OCR: imagem semelhante ao job %s (distância %s)", existing_job.id, distance)
+        
         print(f"DEBUG OCR: Job existente com este hash: {existing_job}")
         
         if existing_job:
@@ -158,7 +155,8 @@ def ocr_submit(request):
             job = OCRJob.objects.create(
                 image_path=image_path,
                 image_hash=image_hash,
-                status='pending'
+                status='pending',
+                **hash_fields(perceptual_hash)
             )
             
             # Invocar Edge Function (fire-and-forget)
@@ -180,7 +178,8 @@ def ocr_submit(request):
             job = OCRJob.objects.create(
                 image_path=image_path,
                 image_hash=image_hash,
-                status='pending'
+                status='pending',
+                **hash_fields(perceptual_hash)
             )
         
         return JsonResponse({
@@ -302,32 +301,15 @@ def ocr_status(request, job_id):
     - completed: { status: "completed", data: {...} }
     - failed: { status: "failed", error: "..." }
     
-    NOTA: Com Supabase Edge Functions, o processamento ocorre no Supabase,
-    não mais nesta view. Esta view apenas consulta o status no banco.
-    
-    Para desenvolvimento LOCAL (sem Supabase), ainda processa aqui.
+    NOTA: Esta view apenas consulta o status no banco. O processamento
+    ocorre na Edge Function do Supabase ou, em desenvolvimento LOCAL (sem
+    Supabase), no worker `python manage.py process_ocr_jobs`.
     """
     try:
         job = OCRJob.objects.get(id=job_id)
     except OCRJob.DoesNotExist:
         return JsonResponse({'error': 'Job não encontrado'}, status=404)
     
-    # Se está em desenvolvimento local e job está pending, processar aqui
-    if not _use_supabase() and job.status == 'pending':
-        job.mark_processing()
-        
-        try:
-            result = _process_ocr_job_locally(job)
-            
-            if result.get('success'):
-                job.mark_completed(result['data'])
-            else:
-                job.mark_failed(result.get('error', 'Erro desconhecido'))
-        except Exception as e:
-            job.mark_failed(str(e))
-        
-        job.refresh_from_db()
-    
     # Retornar status atual
     if job.status == 'pending':
         return JsonResponse({
@@ -427,24 +409,39 @@ def _enrich_ocr_result(job: OCRJob) -> dict:
     }
 
 
-def _process_ocr_job_locally(job: OCRJob) -> dict:
+def _process_ocr_job_locally(job: OCRJob, ocr_service=None) -> dict:
     """
     Processa OCR localmente (para desenvolvimento sem Supabase).
+    Usado pelo worker process_ocr_jobs.
+    
+    Args:
+        job: Job a processar
+        ocr_service: Instância com extract_from_bytes (padrão: InvoiceOCRService)
+    
+    Returns:
+        Dict com success e data, ou error e error_type (missing_image,
+        quota_exceeded, duplicate) quando o erro é conhecido
     """
-    from fiscal.services.ocr import InvoiceOCRService
     from fiscal.models import Invoice
     
     try:
         image_bytes = _get_image_bytes(job.image_path)
         
         if not image_bytes:
-            return {'success': False, 'error': 'Não foi possível carregar a imagem'}
+            return {
+                'success': False,
+                'error': 'Não foi possível carregar a imagem',
+                'error_type': 'missing_image'
+            }
         
-        ocr_service = InvoiceOCRService()
+        if ocr_service is None:
+            from fiscal.services.ocr import InvoiceOCRService
+            ocr_service = InvoiceOCRService()
         extracted = ocr_service.extract_from_bytes(image_bytes, mime_type='image/jpeg')
         
         if extracted.error:
-            if '429' in extracted.error or 'quota' in extracted.error.lower():
+            error_lower = extracted.error.lower()
+            if '429' in extracted.error or 'quota' in error_lower or 'esgotadas' in error_lower:
                 return {
                     'success': False,
                     'error': 'Limite diário de OCR atingido. Cadastre manualmente.',
@@ -461,7 +458,8 @@ def _process_ocr_job_locally(job: OCRJob) -> dict:
         if existing:
             return {
                 'success': False,
-                'error': f'Nota {extracted.number} já cadastrada para este fornecedor'
+                'error': f'Nota {extracted.number} já cadastrada para este fornecedor',
+                'error_type': 'duplicate'
             }
         
         # Montar resultado
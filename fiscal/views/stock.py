@@ -1,54 +1,106 @@
 """
 Views para visualização de estoque e saldo de materiais.
 """
+from datetime import datetime, time
+
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.generic import TemplateView
-from django.db.models import Sum, F
+from django.db.models import Count, Q
+from django.utils import timezone
 
-from fiscal.models import StockItem
-from bidding_procurement.models import MaterialBidding
+from core.pagination import KeysetPaginator
+from fiscal.models import MaterialBalance
+from fiscal.services.stock import StockLedgerService
 
 
 class StockOverviewView(LoginRequiredMixin, TemplateView):
     """
     Página de visualização do estoque físico e saldo de materiais por licitação.
+
+    Lê do resumo pré-calculado MaterialBalance (estoque, comprado, uso do
+    limite e alertas já gravados), sem recalcular saldos por requisição.
+    As duas abas são paginadas por keyset (core.pagination), com cursores
+    próprios na querystring (estoque_apos/estoque_antes, saldo_apos/saldo_antes),
+    e os totais dos cards vêm de uma única agregação condicional.
+
+    Com `?data=AAAA-MM-DD`, o estoque físico mostrado é o saldo ao fim
+    daquele dia, calculado pelo livro-razão (snapshot + movimentos).
     """
     template_name = 'fiscal/stock/overview.html'
     login_url = 'authenticate:login'
+    paginate_by = 50
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        balances = MaterialBalance.objects.select_related('material_bidding__material')
         
-        # Estoque Físico (StockItem com quantidade > 0)
-        stock_items = StockItem.objects.filter(
-            quantity__gt=0
-        ).select_related(
-            'material_bidding__material',
-            'material_bidding__bidding',
-            'material_bidding__supplier'
-        ).order_by('material_bidding__material__name')
-        
-        context['stock_items'] = stock_items
-        context['total_stock_items'] = stock_items.count()
-        
-        # Saldo por Licitação (MaterialBidding ativos com saldo disponível)
-        materials_balance = MaterialBidding.objects.filter(
-            status='1',  # Licitação ativa
-        ).select_related(
-            'material', 'bidding', 'supplier'
-        ).order_by('bidding__name', 'material__name')
+        # Estoque Físico (materiais com saldo em estoque > 0)
+        stock_at = self._parse_date(self.request.GET.get('data'))
+        if stock_at:
+            ledger = StockLedgerService.balances(
+                at=timezone.make_aware(datetime.combine(stock_at, time.max))
+            )
+            in_stock = [key for key, value in ledger.items() if value > 0]
+            stock_page = self._paginate(
+                balances.filter(material_bidding_id__in=in_stock),
+                ('material_bidding__material__name', 'id'), 'estoque',
+            )
+            for item in stock_page:
+                item.in_stock = ledger[item.material_bidding_id]
+            context['stock_at'] = stock_at
+            context['total_stock_items'] = len(in_stock)
+        else:
+            stock_page = self._paginate(
+                balances.filter(in_stock__gt=0),
+                ('material_bidding__material__name', 'id'), 'estoque',
+            )
+        context['stock_items'] = stock_page
         
-        # Adicionar anotação para saldo disponível
-        context['materials_balance'] = materials_balance
-        context['total_materials'] = materials_balance.count()
+        # Saldo por Licitação (materiais de licitações ativas)
+        active = balances.filter(material_bidding__status='1')
+        context['materials_balance'] = self._paginate(
+            active, ('material_bidding__bidding__name', 'material_bidding__material__name', 'id'), 'saldo',
+        )
         
-        # Estatísticas
-        context['total_near_limit'] = materials_balance.filter(
-            quantity_purchased__gte=F('quantity') * 0.8
-        ).count()
-        
-        context['total_at_limit'] = materials_balance.filter(
-            quantity_purchased__gte=F('quantity')
-        ).count()
+        # Estatísticas: uma consulta com agregação condicional
+        stats = MaterialBalance.objects.aggregate(
+            total_materials=Count('pk', filter=Q(material_bidding__status='1')),
+            total_near_limit=Count('pk', filter=Q(material_bidding__status='1', near_limit=True)),
+            total_at_limit=Count('pk', filter=Q(material_bidding__status='1', at_limit=True)),
+            total_stock_items=Count('pk', filter=Q(in_stock__gt=0)),
+        )
+        if stock_at:
+            stats.pop('total_stock_items')
+        context.update(stats)
+        context['active_tab'] = 'saldo' if self.request.GET.get('aba') == 'saldo' else 'estoque'
         
         return context
+
+    def _paginate(self, queryset, ordering, prefix):
+        """Página keyset da aba `prefix`, com os links anterior/próxima."""
+        page = KeysetPaginator(queryset, ordering, per_page=self.paginate_by).page(
+            after=self.request.GET.get(f'{prefix}_apos'),
+            before=self.request.GET.get(f'{prefix}_antes'),
+        )
+        page.previous_url = self._page_url(prefix, 'antes', page.previous_cursor)
+        page.next_url = self._page_url(prefix, 'apos', page.next_cursor)
+        return page
+
+    def _page_url(self, prefix, direction, cursor):
+        if cursor is None:
+            return None
+        params = self.request.GET.copy()
+        for key in ('apos', 'antes'):
+            params.pop(f'{prefix}_{key}', None)
+        params[f'{prefix}_{direction}'] = cursor
+        params['aba'] = prefix
+        return f'?{params.urlencode()}'
+
+    @staticmethod
+    def _parse_date(value):
+        if not value:
+            return None
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            return None
@@ -1,5 +1,5 @@
 from datetime import date, datetime
-from django.db.models.signals import pre_save, post_save, pre_delete
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
 from django.dispatch import receiver
 from django.template.defaultfilters import slugify
 from django.core.exceptions import PermissionDenied
@@ -57,3 +57,37 @@ def protect_material_reports(sender, instance, **kwargs):
             f'Para deletar, primeiro remova ou reatribua os laudos.'
         )
 
+
+@receiver(pre_save, sender=MaterialReport)
+def remember_previous_material_bidding(sender, instance, **kwargs):
+    """
+    Guarda o material anterior para atualizar o saldo dos dois na troca.
+
+    MaterialReport é auditado: instâncias carregadas do banco já trazem o
+    valor anterior em _audit_snapshot. Só consulta o banco sem o snapshot
+    (instância montada à mão com pk ou campo adiado).
+    """
+    if kwargs.get('raw', False) or not instance.pk:
+        return
+    snapshot = getattr(instance, '_audit_snapshot', None) or {}
+    if 'material_bidding_id' in snapshot:
+        instance._previous_material_bidding_id = snapshot['material_bidding_id']
+        return
+    instance._previous_material_bidding_id = MaterialReport.objects.filter(
+        pk=instance.pk
+    ).values_list('material_bidding_id', flat=True).first()
+
+
+@receiver(post_save, sender=MaterialReport)
+@receiver(post_delete, sender=MaterialReport)
+def refresh_material_balance(sender, instance, **kwargs):
+    """Atualiza o MaterialBalance (usado em laudos / disponível) do material."""
+    if kwargs.get('raw', False):
+        return
+
+    from fiscal.services.balance import MaterialBalanceService
+
+    MaterialBalanceService.refresh([
+        instance.material_bidding_id,
+        getattr(instance, '_previous_material_bidding_id', None),
+    ])
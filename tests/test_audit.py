@@ -0,0 +1,261 @@
+import os
+import tempfile
+from datetime import date
+from unittest.mock import MagicMock, patch
+
+from django.db.models.signals import post_save
+from django.test import SimpleTestCase, TestCase
+
+from audit.bulk import bulk as audit_bulk
+from audit.registry import audit_registry
+from audit.signals import log_create_update
+from audit.writer import AuditLogWriter
+from bidding_supplier.models import Supplier
+from fiscal.models import Invoice, StockItem
+
+
+class AuditLogWriterTest(SimpleTestCase):
+    def setUp(self):
+        self.collection = MagicMock()
+        mongo = MagicMock(logs=self.collection)
+        patcher = patch("audit.writer.MongoDBConnection", return_value=mongo)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        fd, self.spill_file = tempfile.mkstemp(suffix=".jsonl")
+        os.close(fd)
+        os.remove(self.spill_file)
+        self.addCleanup(lambda: os.path.exists(self.spill_file) and os.remove(self.spill_file))
+
+    def make_writer(self, **kwargs):
+        options = {"batch_size": 10, "flush_interval": 60, "spill_file": self.spill_file}
+        options.update(kwargs)
+        writer = AuditLogWriter(**options)
+        writer._ensure_thread = lambda: None  # flush manual nos testes
+        return writer
+
+    def test_flush_writes_batches_with_insert_many(self):
+        """Eventos enfileirados são gravados em lotes com insert_many."""
+        writer = self.make_writer(batch_size=3)
+        for i in range(5):
+            writer.enqueue({"action": "create", "n": i})
+
+        self.assertEqual(writer.stats()["depth"], 5)
+        writer.flush()
+
+        self.assertEqual(self.collection.insert_many.call_count, 2)
+        self.collection.insert_one.assert_not_called()
+        stats = writer.stats()
+        self.assertEqual(stats["written"], 5)
+        self.assertEqual(stats["depth"], 0)
+
+    def test_full_queue_drops_and_counts(self):
+        """Com a fila cheia, o evento é descartado sem bloquear."""
+        writer = self.make_writer(maxsize=2)
+
+        self.assertTrue(writer.enqueue({"n": 1}))
+        self.assertTrue(writer.enqueue({"n": 2}))
+        self.assertFalse(writer.enqueue({"n": 3}))
+        self.assertEqual(writer.stats()["dropped"], 1)
+
+    def test_spills_when_mongo_is_down_and_replays_later(self):
+        """Falha no MongoDB grava em disco; o próximo flush bem-sucedido reenvia."""
+        writer = self.make_writer()
+        self.collection.insert_many.side_effect = [Exception("timeout"), None, None]
+
+        writer.enqueue({"action": "create"})
+        writer.flush()
+        self.assertEqual(writer.stats()["spilled"], 1)
+        self.assertTrue(os.path.exists(self.spill_file))
+
+        writer.enqueue({"action": "update"})
+        writer.flush()
+
+        replayed = self.collection.insert_many.call_args_list[-1].args[0]
+        self.assertEqual(replayed, [{"action": "create"}])
+        self.assertEqual(writer.stats()["replayed"], 1)
+        self.assertFalse(os.path.exists(self.spill_file))
+
+    def test_shutdown_flushes_pending_events(self):
+        """shutdown (atexit) grava o que restou na fila."""
+        writer = self.make_writer()
+        writer.enqueue({"action": "delete"})
+
+        writer.shutdown()
+
+        self.collection.insert_many.assert_called_once()
+        self.assertEqual(writer.stats()["depth"], 0)
+
+
+class AuditChangeTrackingTest(TestCase):
+    def setUp(self):
+        Supplier.objects.create(company="Fornecedor A", trade="Loja A", cnpj="123")
+        patcher = patch("audit.signals.AuditService.log_event")
+        self.log_event = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def last_changes(self):
+        return self.log_event.call_args.kwargs["changes"]
+
+    def test_update_does_not_refetch_old_values(self):
+        """Salvar uma instância carregada não faz SELECT extra antes do UPDATE."""
+        supplier = Supplier.objects.get(company="FORNECEDOR A")
+        supplier.cnpj = "456"
+
+        with self.assertNumQueries(1):
+            supplier.save()
+
+        self.assertEqual(self.last_changes(), {"cnpj": {"old": "123", "new": "456"}})
+
+    def test_update_fields_only_diffs_listed_fields(self):
+        """save(update_fields=...) só compara os campos listados."""
+        supplier = Supplier.objects.get(company="FORNECEDOR A")
+        supplier.cnpj = "456"
+        supplier.address = "Rua 1"
+
+        supplier.save(update_fields=["address"])
+
+        self.assertEqual(self.last_changes(), {"address": {"old": None, "new": "Rua 1"}})
+
+    def test_snapshot_follows_successive_saves(self):
+        """Após salvar, o próximo diff parte dos valores já gravados."""
+        supplier = Supplier.objects.get(company="FORNECEDOR A")
+        supplier.cnpj = "456"
+        supplier.save()
+        supplier.cnpj = "789"
+        supplier.save()
+
+        self.assertEqual(self.last_changes(), {"cnpj": {"old": "456", "new": "789"}})
+
+
+    def test_foreign_key_change_is_logged_by_attname_with_ids(self):
+        """FK entra no diff como <campo>_id com os ids, sem consultar o objeto relacionado."""
+        old_supplier = Supplier.objects.get(company="FORNECEDOR A")
+        new_supplier = Supplier.objects.create(company="Fornecedor B", trade="Loja B", cnpj="999")
+        invoice = Invoice.objects.create(number="1", supplier=old_supplier, issue_date=date.today())
+        invoice = Invoice.objects.get(pk=invoice.pk)
+        invoice.supplier = new_supplier
+
+        with self.assertNumQueries(1):
+            invoice.save(update_fields=["supplier"])
+
+        self.assertEqual(
+            self.last_changes(), {"supplier_id": {"old": old_supplier.pk, "new": new_supplier.pk}})
+
+
+class AuditRegistryTest(TestCase):
+    def setUp(self):
+        patcher = patch("audit.signals.AuditService.log_event")
+        self.log_event = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(audit_registry.register, Supplier)
+
+    def test_unregistered_model_has_no_audit_receivers(self):
+        """Models fora do registro não passam por nenhum receiver de auditoria."""
+        self.assertFalse(audit_registry.is_registered(StockItem))
+        self.assertTrue(audit_registry.is_registered(Supplier))
+
+        sync_receivers, _ = post_save._live_receivers(StockItem)
+        self.assertNotIn(log_create_update, sync_receivers)
+        sync_receivers, _ = post_save._live_receivers(Supplier)
+        self.assertIn(log_create_update, sync_receivers)
+
+    def test_excluded_fields_are_not_diffed(self):
+        """exclude_fields remove o campo do diff; update só de campos excluídos não gera log."""
+        audit_registry.register(Supplier, exclude_fields=["cnpj"])
+        Supplier.objects.create(company="Fornecedor A", trade="Loja A", cnpj="123")
+        supplier = Supplier.objects.get(company="FORNECEDOR A")
+        self.log_event.reset_mock()
+
+        supplier.cnpj = "456"
+        supplier.save(update_fields=["cnpj"])
+        self.log_event.assert_not_called()
+
+        supplier.cnpj = "789"
+        supplier.address = "Rua 1"
+        supplier.save()
+        self.assertEqual(
+            self.log_event.call_args.kwargs["changes"],
+            {"address": {"old": None, "new": "Rua 1"}},
+        )
+
+    def test_include_fields_limits_diff(self):
+        """include_fields restringe o diff aos campos listados."""
+        audit_registry.register(Supplier, include_fields=["address"])
+        Supplier.objects.create(company="Fornecedor A", trade="Loja A", cnpj="123")
+        supplier = Supplier.objects.get(company="FORNECEDOR A")
+
+        supplier.cnpj = "456"
+        supplier.address = "Rua 1"
+        supplier.save()
+
+        self.assertEqual(
+            self.log_event.call_args.kwargs["changes"],
+            {"address": {"old": None, "new": "Rua 1"}},
+        )
+
+    def test_sampling_skips_updates_but_not_deletes(self):
+        """sample_rate=0 não registra criações/atualizações, mas registra exclusões."""
+        audit_registry.register(Supplier, sample_rate=0)
+        supplier = Supplier.objects.create(company="Fornecedor A", trade="Loja A", cnpj="123")
+        supplier.cnpj = "456"
+        supplier.save()
+        self.log_event.assert_not_called()
+
+        supplier.delete()
+        self.assertEqual(self.log_event.call_args.kwargs["action"], "delete")
+
+    def test_invalid_sample_rate(self):
+        with self.assertRaises(ValueError):
+            audit_registry.register(Supplier, sample_rate=2)
+
+
+class AuditBulkTest(TestCase):
+    def setUp(self):
+        patcher = patch("audit.bulk.get_audit_writer")
+        self.writer = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        patcher = patch("audit.services.get_audit_writer")
+        self.async_writer = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+
+    def test_coalesces_events_per_model_and_action(self):
+        """Eventos dentro do bloco viram um resumo por model/ação, gravados de uma vez."""
+        with audit_bulk("teste"):
+            suppliers = [
+                Supplier.objects.create(company=f"Fornecedor {i}", trade="Loja", cnpj=str(i))
+                for i in range(5)
+            ]
+            for supplier in suppliers[:3]:
+                supplier.address = "Rua 1"
+                supplier.save()
+            self.writer.write_batch.assert_not_called()
+
+        self.async_writer.enqueue.assert_not_called()
+        self.writer.write_batch.assert_called_once()
+        documents = self.writer.write_batch.call_args.args[0]
+        summaries = {doc["action"]: doc["metadata"] for doc in documents}
+
+        self.assertEqual(summaries["create"]["count"], 5)
+        self.assertEqual(summaries["update"]["count"], 3)
+        self.assertEqual(summaries["update"]["changed_fields"], {"address": 3})
+        self.assertEqual(summaries["update"]["object_ids"], [str(s.pk) for s in suppliers[:3]])
+        self.assertTrue(all(doc["metadata"]["label"] == "teste" for doc in documents))
+
+    def test_nested_blocks_share_outer_collector(self):
+        with audit_bulk("externo"):
+            with audit_bulk("interno"):
+                Supplier.objects.create(company="Fornecedor A", trade="Loja", cnpj="1")
+            self.writer.write_batch.assert_not_called()
+
+        documents = self.writer.write_batch.call_args.args[0]
+        self.assertEqual(documents[0]["metadata"]["label"], "externo")
+
+    def test_aborted_block_still_writes_marked_summary(self):
+        with self.assertRaises(RuntimeError):
+            with audit_bulk("teste"):
+                Supplier.objects.create(company="Fornecedor A", trade="Loja", cnpj="1")
+                raise RuntimeError("falhou")
+
+        documents = self.writer.write_batch.call_args.args[0]
+        self.assertTrue(documents[0]["metadata"]["aborted"])
@@ -0,0 +1,399 @@
+import datetime
+import json
+import time
+import uuid
+from decimal import Decimal
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, TestCase
+
+from authenticate.models import ProfessionalUser
+from core import cache
+from dashboard.services import DashboardService
+
+
+class FakeRedis:
+    """Cliente Redis mínimo em memória, com a mesma interface usada por core.cache."""
+
+    def __init__(self):
+        self.data = {}
+        self.calls = []
+
+    def get(self, key):
+        self.calls.append(("get", key))
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None, nx=False):
+        self.calls.append(("set", key))
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    def delete(self, *keys):
+        self.calls.append(("delete",) + keys)
+        return sum(1 for key in keys if self.data.pop(key, None) is not None)
+
+    def incr(self, key):
+        self.calls.append(("incr", key))
+        self.data[key] = str(int(self.data.get(key) or 0) + 1)
+        return int(self.data[key])
+
+    def mget(self, *keys):
+        self.calls.append(("mget",) + keys)
+        return [self.data.get(key) for key in keys]
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+    def sadd(self, key, *members):
+        self.calls.append(("sadd", key))
+        self.data.setdefault(key, set()).update(members)
+
+    def smembers(self, key):
+        self.calls.append(("smembers", key))
+        return set(self.data.get(key, set()))
+
+    def expire(self, key, seconds):
+        self.calls.append(("expire", key))
+
+
+class FakePipeline:
+    """Pipeline do FakeRedis: enfileira comandos e executa em um único round trip."""
+
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        self.client.calls.append(("pipeline", len(self.commands)))
+        calls = self.client.calls
+        self.client.calls = []
+        results = [getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in self.commands]
+        self.client.calls = calls
+        return results
+
+
+class CacheTestMixin:
+    def setUp(self):
+        self.client = FakeRedis()
+        patcher = patch("core.cache._get_client", return_value=self.client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        cache._local_cache.clear()
+        cache._local_version = 0
+        cache._version_checked_at = 0.0
+        cache.reset_cache_stats()
+
+
+class LocalCacheTest(SimpleTestCase):
+    def test_lru_evicts_least_recently_used(self):
+        """Excedendo max_entries, a entrada menos usada é removida."""
+        local = cache.LocalCache(max_entries=2, max_bytes=1024)
+        local.set("a", '"1"', 60, 0)
+        local.set("b", '"2"', 60, 0)
+        local.get("a", 0)
+        local.set("c", '"3"', 60, 0)
+
+        self.assertEqual(local.get("a", 0), '"1"')
+        self.assertIsNone(local.get("b", 0))
+        self.assertEqual(local.get("c", 0), '"3"')
+
+    def test_max_bytes_bounds_memory(self):
+        """O total de bytes nunca passa de max_bytes."""
+        local = cache.LocalCache(max_entries=100, max_bytes=10)
+        local.set("a", "x" * 6, 60, 0)
+        local.set("b", "y" * 6, 60, 0)
+
+        self.assertLessEqual(local.size_bytes, 10)
+        self.assertIsNone(local.get("a", 0))
+
+    def test_expired_and_stale_version_entries_are_misses(self):
+        """Entradas expiradas ou de versão antiga não são retornadas."""
+        local = cache.LocalCache()
+        local.set("a", '"1"', 0.01, 0)
+        local.set("b", '"2"', 60, 0)
+        time.sleep(0.02)
+
+        self.assertIsNone(local.get("a", 0))
+        self.assertIsNone(local.get("b", 1))
+
+
+class TwoTierCacheTest(CacheTestMixin, SimpleTestCase):
+    def test_warm_read_does_not_hit_l2(self):
+        """Leitura repetida é servida pelo L1 sem chamar o L2."""
+        cache.cache_set("suppliers_list", [{"id": 1}])
+        self.client.calls.clear()
+
+        self.assertEqual(cache.cache_get("suppliers_list"), [{"id": 1}])
+        self.assertEqual(self.client.calls, [])
+        self.assertEqual(cache.cache_stats()["l1_hits"], 1)
+
+    def test_l2_hit_populates_l1(self):
+        """Hit no L2 preenche o L1 para as próximas leituras."""
+        self.client.data["k"] = '{"a": 1}'
+
+        self.assertEqual(cache.cache_get("k"), {"a": 1})
+        self.assertEqual(cache.cache_get("k"), {"a": 1})
+
+        stats = cache.cache_stats()
+        self.assertEqual(stats["l2_hits"], 1)
+        self.assertEqual(stats["l1_hits"], 1)
+        self.assertEqual(stats["l1_misses"], 1)
+
+    def test_values_are_copies(self):
+        """Mutar o valor retornado não altera o L1."""
+        cache.cache_set("k", [1, 2])
+        cache.cache_get("k").append(3)
+
+        self.assertEqual(cache.cache_get("k"), [1, 2])
+
+    def test_version_bump_from_other_worker_drops_l1(self):
+        """Outro worker incrementando a versão descarta o L1 deste."""
+        cache.cache_set("k", "old")
+        self.client.data["k"] = '"new"'
+        self.client.incr(cache.CACHE_VERSION_KEY)
+
+        with patch("core.cache.L1_VERSION_CHECK", 0):
+            self.assertEqual(cache.cache_get("k"), "new")
+
+    def test_invalidate_bumps_version(self):
+        """CachedLists.invalidate_* incrementa a versão global."""
+        cache.cache_set(cache.CACHE_SUPPLIERS_LIST, [])
+        cache.CachedLists.invalidate_suppliers()
+
+        self.assertEqual(self.client.data[cache.CACHE_VERSION_KEY], "1")
+        self.assertEqual(cache.cache_stats()["l1_entries"], 0)
+        self.assertIsNone(cache.cache_get(cache.CACHE_SUPPLIERS_LIST))
+
+    def test_deferred_invalidations_run_once_on_exit(self):
+        """Dentro de CachedLists.deferred() cada lista é invalidada uma vez, na saída."""
+        cache.cache_set(cache.CACHE_MATERIALS_LIST, [])
+        with cache.CachedLists.deferred():
+            for _ in range(3):
+                cache.CachedLists.invalidate_materials()
+                cache.CachedLists.invalidate_suppliers()
+            self.assertNotIn(cache.CACHE_VERSION_KEY, self.client.data)
+            self.assertEqual(cache.cache_get(cache.CACHE_MATERIALS_LIST), [])
+
+        self.assertEqual(self.client.data[cache.CACHE_VERSION_KEY], "1")
+        self.assertIsNone(cache.cache_get(cache.CACHE_MATERIALS_LIST))
+
+
+class CacheManyTest(CacheTestMixin, SimpleTestCase):
+    def test_get_many_uses_single_mget(self):
+        """Chaves ausentes do L1 são buscadas em um único MGET."""
+        self.client.data.update({"a": "1", "b": "2"})
+
+        self.assertEqual(cache.cache_get_many(["a", "b", "c"]), {"a": 1, "b": 2})
+        self.assertEqual([c for c in self.client.calls if c[0] != "get"], [("mget", "a", "b", "c")])
+
+    def test_get_many_serves_l1_hits_locally(self):
+        """Chaves já no L1 não vão para o MGET."""
+        cache.cache_set("a", 1)
+        self.client.data["b"] = "2"
+        self.client.calls.clear()
+
+        self.assertEqual(cache.cache_get_many(["a", "b"]), {"a": 1, "b": 2})
+        self.assertEqual(self.client.calls, [("mget", "b")])
+
+    def test_set_many_uses_pipeline_with_per_key_ttl(self):
+        """cache_set_many grava todas as chaves em um único pipeline."""
+        cache.cache_set_many({"a": [1], "b": {"x": 2}}, ttl=60, ttls={"b": 10})
+
+        self.assertIn(("pipeline", 2), self.client.calls)
+        self.assertEqual(self.client.data["a"], "[1]")
+        self.assertEqual(cache.cache_get_many(["a", "b"]), {"a": [1], "b": {"x": 2}})
+
+
+class CacheTagsTest(CacheTestMixin, SimpleTestCase):
+    def test_invalidate_tag_removes_only_tagged_keys(self):
+        """Invalidar uma tag remove suas chaves (e só elas) sem usar KEYS."""
+        cache.cache_set("stats_1", 1, tags=["dashboard", "user:1"])
+        cache.cache_set("stats_2", 2, tags=["dashboard", "user:2"])
+        cache.cache_set_many({"chart": [1]}, tags={"chart": ["dashboard"]})
+        cache.cache_set("other", 3)
+
+        cache.cache_invalidate_tags("user:1")
+        self.assertNotIn("stats_1", self.client.data)
+        self.assertIn("stats_2", self.client.data)
+
+        cache.cache_invalidate_tags("dashboard")
+        self.assertNotIn("stats_2", self.client.data)
+        self.assertNotIn("chart", self.client.data)
+        self.assertNotIn("cache:tag:dashboard", self.client.data)
+        self.assertEqual(cache.cache_get("other"), 3)
+        self.assertNotIn("keys", [c[0] for c in self.client.calls])
+
+    def test_invalidate_tag_drops_l1(self):
+        """Chaves invalidadas por tag não são mais servidas pelo L1."""
+        cache.cache_set("stats_1", 1, tags=["user:1"])
+        cache.cache_invalidate_tags("user:1")
+
+        self.assertIsNone(cache.cache_get("stats_1"))
+
+
+class GetOrComputeTest(CacheTestMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.computed = 0
+
+    def compute(self):
+        self.computed += 1
+        return {"n": self.computed}
+
+    def store(self, key, value, exp, delta=0.01):
+        self.client.data[key] = json.dumps({"v": value, "exp": exp, "delta": delta})
+
+    def test_miss_computes_once_and_caches(self):
+        """Sem valor no cache, calcula uma vez e grava."""
+        self.assertEqual(cache.cache_get_or_compute("k", self.compute, ttl=60), {"n": 1})
+        self.assertEqual(cache.cache_get_or_compute("k", self.compute, ttl=60), {"n": 1})
+        self.assertEqual(self.computed, 1)
+        self.assertNotIn("cache:lock:k", self.client.data)
+
+    def test_expired_value_is_served_stale_while_other_worker_recomputes(self):
+        """Com o lock em posse de outro worker, devolve o valor antigo sem recalcular."""
+        self.store("k", "old", time.time() - 1)
+        self.client.data["cache:lock:k"] = "1"
+
+        self.assertEqual(cache.cache_get_or_compute("k", self.compute), "old")
+        self.assertEqual(self.computed, 0)
+
+    def test_expired_value_is_recomputed_by_lock_owner(self):
+        """Quem obtém o lock recalcula e libera o lock."""
+        self.store("k", "old", time.time() - 1)
+
+        self.assertEqual(cache.cache_get_or_compute("k", self.compute), {"n": 1})
+        self.assertNotIn("cache:lock:k", self.client.data)
+
+    def test_probabilistic_early_refresh(self):
+        """Perto de expirar, o refresh antecipado pode recalcular antes do TTL."""
+        self.store("k", "old", time.time() + 0.5, delta=1.0)
+
+        with patch("core.cache.random.random", return_value=0.0):
+            self.assertEqual(cache.cache_get_or_compute("k", self.compute), "old")
+        cache._local_cache.clear()
+        with patch("core.cache.random.random", return_value=0.99):
+            self.assertEqual(cache.cache_get_or_compute("k", self.compute), {"n": 1})
+
+    def test_waits_for_lock_owner_when_no_stale_value(self):
+        """Sem valor antigo, aguarda o worker que detém o lock gravar o valor."""
+        self.client.data["cache:lock:k"] = "1"
+
+        def other_worker_stores(_):
+            self.store("k", "fresh", time.time() + 60)
+
+        with patch("core.cache.time.sleep", side_effect=other_worker_stores):
+            self.assertEqual(cache.cache_get_or_compute("k", self.compute), "fresh")
+        self.assertEqual(self.computed, 0)
+
+    def test_failed_compute_releases_locks_and_keeps_computed_values(self):
+        """Um compute() com erro não segura os locks nem descarta os valores já calculados."""
+        def fail():
+            raise ValueError("bloco com erro")
+
+        specs = {
+            "a": (self.compute, 60, None),
+            "b": (fail, 60, None),
+            "c": (self.compute, 60, None),
+        }
+        with self.assertRaises(ValueError):
+            cache.cache_get_or_compute_many(specs)
+
+        self.assertFalse([key for key in self.client.data if key.startswith("cache:lock:")])
+        self.assertIn("a", self.client.data)
+        self.assertNotIn("b", self.client.data)
+        self.assertEqual(cache.cache_get_or_compute("a", self.compute, ttl=60), {"n": 1})
+        self.assertEqual(self.computed, 1)
+
+    def test_cached_lists_use_get_or_compute(self):
+        """CachedLists só consulta o banco no primeiro acesso."""
+        with patch("core.cache.cache_get_or_compute", wraps=cache.cache_get_or_compute) as wrapped:
+            with patch("bidding_supplier.models.Supplier.objects") as objects:
+                objects.values.return_value.order_by.return_value = [{"id": 1}]
+                self.assertEqual(cache.CachedLists.get_suppliers(), [{"id": 1}])
+                self.assertEqual(cache.CachedLists.get_suppliers(), [{"id": 1}])
+        self.assertEqual(objects.values.call_count, 1)
+        self.assertEqual(wrapped.call_count, 2)
+
+
+class CacheCodecTest(CacheTestMixin, SimpleTestCase):
+    value = {
+        "price": Decimal("10.50"),
+        "date": datetime.date(2025, 1, 2),
+        "created_at": datetime.datetime(2025, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc),
+        "id": uuid.UUID("a1b2c3d4-e5f6-7890-abcd-ef1234567890"),
+        "items": [1, "a", None, True],
+    }
+
+    def test_roundtrip_preserves_types(self):
+        """Decimal, date, datetime e UUID voltam com o tipo original."""
+        cache.cache_set("k", self.value)
+        cache._local_cache.clear()
+
+        self.assertEqual(cache.cache_get("k"), self.value)
+
+    def test_large_payload_is_compressed(self):
+        """Payloads acima de CACHE_COMPRESS_MIN_BYTES são comprimidos."""
+        materials = [{"id": i, "name": f"Material {i}", "slug": f"material-{i}"} for i in range(500)]
+        cache.cache_set("materials_list", materials)
+        cache._local_cache.clear()
+
+        self.assertTrue(self.client.data["materials_list"].startswith("jz:"))
+        self.assertEqual(cache.cache_get("materials_list"), materials)
+        stats = cache.cache_stats()
+        self.assertEqual(stats["compressed_writes"], 1)
+        self.assertLess(stats["bytes_written"], stats["raw_bytes_written"])
+        self.assertEqual(stats["bytes_read"], len(self.client.data["materials_list"]))
+
+    def test_reads_legacy_json_payload(self):
+        """Valores gravados antes do codec (JSON puro) continuam legíveis."""
+        self.client.data["legacy"] = '[{"id": 1}]'
+        self.client.data["flag"] = "true"
+
+        self.assertEqual(cache.cache_get("legacy"), [{"id": 1}])
+        self.assertIs(cache.cache_get("flag"), True)
+
+    @skipUnless("m" in cache._codecs, "msgpack não instalado")
+    def test_msgpack_codec_roundtrip(self):
+        """O codec msgpack preserva os mesmos tipos e é lido por qualquer worker."""
+        with patch("core.cache._codec", cache._codecs["m"]):
+            cache.cache_set("k", self.value)
+        cache._local_cache.clear()
+
+        self.assertTrue(self.client.data["k"].startswith("m"))
+        self.assertEqual(cache.cache_get("k"), self.value)
+
+
+class DashboardIndexCacheTest(CacheTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = ProfessionalUser.objects.create_user(
+            email="dash@example.com", password="p", first_name="Dash", last_name="User")
+
+    def test_cold_and_warm_index_use_one_round_trip(self):
+        """Dashboard frio faz um MGET + pipelines de lock/gravação; quente não sai do worker."""
+        data = DashboardService.get_index_data(self.user)
+
+        # versão do L1, MGET, locks (SET NX) e gravação + liberação dos locks
+        self.assertEqual([c[0] for c in self.client.calls], ["get", "mget", "pipeline", "pipeline"])
+        self.assertEqual(data["stats"]["total_reports"], 0)
+
+        self.client.calls.clear()
+        self.assertEqual(DashboardService.get_index_data(self.user), data)
+        self.assertEqual(self.client.calls, [])
+
+    def test_invalidate_dashboard_cache_drops_all_blocks(self):
+        """invalidate_dashboard_cache() remove estatísticas, gráficos e calendário."""
+        DashboardService.get_index_data(self.user)
+        DashboardService.invalidate_dashboard_cache()
+
+        self.assertFalse([key for key in self.client.data if key.startswith("dashboard")])
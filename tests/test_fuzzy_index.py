@@ -0,0 +1,55 @@
+import random
+
+from django.test import SimpleTestCase
+
+from bidding_procurement.utils.fuzzy_matcher import FuzzyIndex, FuzzyMatcher
+
+
+def mutate(rng, text):
+    chars = list(text)
+    for _ in range(rng.randrange(4)):
+        i = rng.randrange(len(chars) + 1)
+        op = rng.randrange(3)
+        if op == 0:
+            chars.insert(i, rng.choice('abcde .-'))
+        elif chars:
+            i = min(i, len(chars) - 1)
+            if op == 1:
+                chars.pop(i)
+            else:
+                chars[i] = rng.choice('ABCDE')
+    return ''.join(chars)
+
+
+class FuzzyIndexTest(SimpleTestCase):
+    def test_same_results_as_linear_scan(self):
+        rng = random.Random(7)
+        for _ in range(100):
+            base = [''.join(rng.choice('abcde ') for _ in range(rng.randrange(30))) for _ in range(30)]
+            names = base + [mutate(rng, name) for name in base]
+            index = FuzzyIndex(names)
+            for threshold in (0.6, 0.8, 0.9, 0.95):
+                query = mutate(rng, rng.choice(names))
+                expected = FuzzyMatcher(threshold).find_similar(query, names)
+                self.assertEqual(index.search(query, threshold), expected)
+                self.assertEqual(index.search(query, threshold, limit=2), expected[:2])
+
+    def test_short_names_without_shared_trigrams(self):
+        # Nenhum trigrama em comum, mas 80% de similaridade
+        index = FuzzyIndex(['abcde', 'xyz'])
+        self.assertEqual(index.search('abxde', threshold=0.8), [('abcde', 0.8)])
+
+    def test_normalization_and_ties_keep_insertion_order(self):
+        index = FuzzyIndex(['Cimento CP-II', 'CIMENTO CP II', 'Areia'])
+        self.assertEqual(
+            index.search('cimento cp ii', threshold=0.9),
+            [('Cimento CP-II', 1.0), ('CIMENTO CP II', 1.0)],
+        )
+        self.assertEqual(index.best_match('cimento cp ii.'), ('Cimento CP-II', 1.0))
+
+    def test_add(self):
+        index = FuzzyIndex()
+        self.assertIsNone(index.best_match('Areia media'))
+        index.add('AREIA MEDIA LAVADA')
+        self.assertEqual(len(index), 1)
+        self.assertEqual(index.best_match('Areia media lavad', threshold=0.9)[0], 'AREIA MEDIA LAVADA')
@@ -1,6 +1,13 @@
+from decimal import Decimal
+from io import StringIO
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 from django.utils import timezone
-from fiscal.models import Invoice, DeliveryNote
+from fiscal.models import Invoice, InvoiceItem, DeliveryNote
+from bidding_procurement.models import Bidding, Material, MaterialBidding
 from bidding_supplier.models import Supplier
 from organizational_structure.models import Sector
 from authenticate.models import ProfessionalUser
@@ -67,3 +74,138 @@ class InvoiceLogicTestCase(TestCase):
             status='P'
         )
         self.assertEqual(self.invoice.delivery_process_status, 'on_way')
+
+
+class InvoiceListProjectionTestCase(TestCase):
+    def setUp(self):
+        self.supplier = Supplier.objects.create(company="Test Supplier", cnpj="00000000000000", trade="Test")
+        self.user = ProfessionalUser.objects.create_user(email="test@example.com", password="password", first_name="Test", last_name="User")
+        self.sector = Sector.objects.create(name="Test Sector")
+        bidding = Bidding.objects.create(name="Licitação 01", date=timezone.now().date())
+        self.material_bidding = MaterialBidding.objects.create(
+            material=Material.objects.create(name="Material A"),
+            bidding=bidding, supplier=self.supplier, price="10.00", quantity=1000,
+        )
+
+    def make_invoice(self, number, delivery_statuses=(), items=2):
+        invoice = Invoice.objects.create(
+            number=number, supplier=self.supplier, issue_date=timezone.now().date())
+        for _ in range(items):
+            InvoiceItem.objects.create(
+                invoice=invoice, material_bidding=self.material_bidding,
+                quantity=3, unit_price=Decimal("2.50"))
+        for status in delivery_statuses:
+            DeliveryNote.objects.create(
+                invoice=invoice, sector=self.sector, delivered_by=self.user, status=status)
+        return invoice
+
+    def test_annotations_match_properties(self):
+        """As anotações produzem os mesmos valores que as propriedades sem anotação."""
+        self.make_invoice("1")
+        self.make_invoice("2", delivery_statuses=["C", "P"])
+        self.make_invoice("3", delivery_statuses=["C", "C"], items=0)
+
+        expected = {
+            i.number: (i.delivery_process_status, i.has_stock_items)
+            for i in Invoice.objects.all()
+        }
+        for invoice in Invoice.objects.with_list_projection():
+            with self.assertNumQueries(0):
+                projected = (invoice.delivery_process_status, invoice.has_stock_items)
+            self.assertEqual(projected, expected[invoice.number])
+
+    def test_list_view_query_count_is_constant(self):
+        """A listagem não faz consultas por linha."""
+        self.user.first_login = False
+        self.user.save()
+        self.client.force_login(self.user)
+        self.make_invoice("1", delivery_statuses=["P"])
+
+        with CaptureQueriesContext(connection) as few:
+            self.assertEqual(self.client.get(reverse("fiscal:invoices")).status_code, 200)
+
+        for n in range(2, 12):
+            self.make_invoice(str(n), delivery_statuses=["C"])
+
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(reverse("fiscal:invoices"))
+
+        self.assertEqual(len(response.context["invoices"]), 11)
+        self.assertEqual(len(many), len(few))
+
+
+class InvoiceTotalsTestCase(TestCase):
+    def setUp(self):
+        self.supplier = Supplier.objects.create(company="Test Supplier", cnpj="00000000000000", trade="Test")
+        bidding = Bidding.objects.create(name="Licitação 01", date=timezone.now().date())
+        self.material_bidding = MaterialBidding.objects.create(
+            material=Material.objects.create(name="Material A"),
+            bidding=bidding, supplier=self.supplier, price="10.00", quantity=1000,
+        )
+        self.invoice = Invoice.objects.create(
+            number="123", supplier=self.supplier, issue_date=timezone.now().date())
+
+    def add_item(self, invoice, quantity, unit_price):
+        return InvoiceItem.objects.create(
+            invoice=invoice, material_bidding=self.material_bidding,
+            quantity=quantity, unit_price=Decimal(unit_price))
+
+    def assertTotals(self, invoice, total, count):
+        invoice.refresh_from_db()
+        self.assertEqual(invoice.total_value, Decimal(total))
+        self.assertEqual(invoice.item_count, count)
+
+    def test_totals_follow_item_changes(self):
+        """Criar, alterar e excluir itens mantém total_value/item_count."""
+        item = self.add_item(self.invoice, 2, "10.00")
+        self.add_item(self.invoice, 1, "5.50")
+        self.assertTotals(self.invoice, "25.50", 2)
+
+        item.quantity = 3
+        item.save()
+        self.assertTotals(self.invoice, "35.50", 2)
+
+        item.delete()
+        self.assertTotals(self.invoice, "5.50", 1)
+
+        self.invoice.items.all().delete()
+        self.assertTotals(self.invoice, "0.00", 0)
+
+    def test_item_moved_to_other_invoice(self):
+        other = Invoice.objects.create(
+            number="456", supplier=self.supplier, issue_date=timezone.now().date())
+        item = self.add_item(self.invoice, 2, "10.00")
+
+        item.invoice = other
+        item.save()
+
+        self.assertTotals(self.invoice, "0.00", 0)
+        self.assertTotals(other, "20.00", 1)
+
+    def test_full_invoice_save_keeps_totals(self):
+        """Salvar uma nota carregada antes dos itens não sobrescreve os totais."""
+        stale = Invoice.objects.get(pk=self.invoice.pk)
+        self.add_item(self.invoice, 2, "10.00")
+
+        stale.observations = "conferida"
+        stale.save()
+
+        self.assertTotals(self.invoice, "20.00", 1)
+
+    def test_reading_totals_does_not_query(self):
+        self.add_item(self.invoice, 2, "10.00")
+        invoice = Invoice.objects.get(pk=self.invoice.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(invoice.total_value, Decimal("20.00"))
+
+    def test_rebuild_command_fixes_divergent_totals(self):
+        self.add_item(self.invoice, 2, "10.00")
+        Invoice.objects.filter(pk=self.invoice.pk).update(total_value=0, item_count=7)
+        self.assertEqual(Invoice.objects.with_stale_totals().count(), 1)
+
+        call_command("rebuild_invoice_totals", "--dry-run", stdout=StringIO())
+        self.assertEqual(Invoice.objects.with_stale_totals().count(), 1)
+
+        call_command("rebuild_invoice_totals", stdout=StringIO())
+        self.assertEqual(Invoice.objects.with_stale_totals().count(), 0)
+        self.assertTotals(self.invoice, "20.00", 1)
@@ -0,0 +1,74 @@
+from datetime import date
+from decimal import Decimal
+
+from django.test import TestCase
+
+from authenticate.models import ProfessionalUser
+from bidding_procurement.models import Bidding, Material, MaterialBidding
+from bidding_supplier.models import Supplier
+from fiscal.models import Invoice, InvoiceItem
+from fiscal.services.matching import suggest_reports_for_invoice
+from organizational_structure.models import Sector
+from reports.models import MaterialReport, Report
+
+
+class SuggestReportsForInvoiceTest(TestCase):
+    def setUp(self):
+        self.user = ProfessionalUser.objects.create_user(
+            email="test@example.com", password="password", first_name="Test", last_name="User")
+        self.sector = Sector.objects.create(name="Setor A")
+        supplier = Supplier.objects.create(company="Fornecedor", cnpj="1", trade="Loja")
+        bidding = Bidding.objects.create(name="Licitação 01", date=date.today())
+        self.mb = [
+            MaterialBidding.objects.create(
+                material=Material.objects.create(name=f"Material {i}"),
+                bidding=bidding, supplier=supplier, price="10.00", quantity=100,
+            )
+            for i in range(3)
+        ]
+        self.invoice = Invoice.objects.create(
+            number="100", supplier=supplier, issue_date=date.today())
+        for mb in self.mb[:2]:
+            InvoiceItem.objects.create(
+                invoice=self.invoice, material_bidding=mb, quantity=1, unit_price=Decimal("10.00"))
+
+    def make_report(self, materials, status="1"):
+        report = Report.objects.create(
+            sector=self.sector, status=status, justification="teste",
+            professional=self.user, pro_accountable=self.user,
+        )
+        for mb in materials:
+            MaterialReport.objects.create(report=report, material_bidding=mb)
+        return report
+
+    def test_orders_open_reports_by_matching_items(self):
+        """Só laudos abertos com materiais em comum, ordenados por coincidências."""
+        partial = self.make_report([self.mb[0]])
+        full = self.make_report([self.mb[0], self.mb[1], self.mb[2]])
+        self.make_report([self.mb[0], self.mb[1]], status="3")  # finalizado
+        self.make_report([self.mb[2]])  # sem materiais em comum
+
+        suggestions = suggest_reports_for_invoice(self.invoice)
+
+        self.assertEqual([s["report"] for s in suggestions], [full, partial])
+        self.assertEqual(suggestions[0]["matching_items"], 2)
+        self.assertEqual(suggestions[0]["total_items"], 3)
+        self.assertEqual(suggestions[0]["match_percentage"], 100.0)
+        self.assertEqual(suggestions[1]["match_percentage"], 50.0)
+        self.assertEqual(suggestions[1]["sector_name"], self.sector.name)
+
+    def test_query_count_does_not_grow_with_open_reports(self):
+        """O número de consultas é constante, independente dos laudos abertos."""
+        for _ in range(10):
+            self.make_report([self.mb[0], self.mb[2]])
+
+        with self.assertNumQueries(2):
+            suggestions = suggest_reports_for_invoice(self.invoice, limit=3)
+            [s["sector_name"] for s in suggestions]
+
+        self.assertEqual(len(suggestions), 3)
+
+    def test_invoice_without_items(self):
+        invoice = Invoice.objects.create(
+            number="200", supplier=self.invoice.supplier, issue_date=date.today())
+        self.assertEqual(suggest_reports_for_invoice(invoice), [])
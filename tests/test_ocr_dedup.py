@@ -0,0 +1,206 @@
+import hashlib
+import os
+import tempfile
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest.mock import patch
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image, ImageDraw
+
+from authenticate.models import ProfessionalUser
+from fiscal.models import OCRJob
+from fiscal.services import image_hash
+from fiscal.services.image_hash import (
+    dhash, dhash_bytes, find_similar_job, hamming, hash_fields, stored_hash,
+)
+from fiscal.services.ocr_image import prepare_ocr_image
+
+
+def make_invoice_image(seed=0, size=(1200, 1600)):
+    """Imagem sintética com blocos de "texto" em posições que variam com o seed."""
+    image = Image.new('RGB', size, 'white')
+    draw = ImageDraw.Draw(image)
+    for i in range(12):
+        top = 80 + i * 120 + (seed * 37 % 90)
+        width = 300 + ((i + seed) * 173 % 700)
+        draw.rectangle([60, top, 60 + width, top + 40], fill=(30 + i * 10, 30, 30))
+    draw.ellipse([800 - seed * 40, 100, 1100 - seed * 40, 400], fill=(120, 120, 120))
+    return image
+
+
+def jpeg_bytes(image, quality=50, max_size=800):
+    image = image.copy()
+    image.thumbnail((max_size, max_size))
+    output = BytesIO()
+    image.save(output, format='JPEG', quality=quality)
+    return output.getvalue()
+
+
+class PerceptualHashTest(TestCase):
+    def test_recompressed_image_is_close(self):
+        original = make_invoice_image()
+        a = dhash_bytes(jpeg_bytes(original, quality=90, max_size=1200))
+        b = dhash_bytes(jpeg_bytes(original, quality=40, max_size=800))
+        self.assertLessEqual(hamming(a, b), 3)
+
+    def test_different_images_are_far(self):
+        a = dhash(make_invoice_image(seed=0))
+        b = dhash(make_invoice_image(seed=3))
+        self.assertGreater(hamming(a, b), 3)
+
+    def test_hash_fields_round_trip(self):
+        value = (1 << 63) | 0xABCD_0123_4567
+        fields = hash_fields(value)
+        self.assertLess(fields['perceptual_hash'], 0)  # cabe em BigInteger com sinal
+        self.assertEqual([fields[f'phash_band_{i}'] for i in range(4)], [0x8000, 0xABCD, 0x0123, 0x4567])
+
+        job = OCRJob.objects.create(image_path='x.jpg', **fields)
+        job.refresh_from_db()
+        self.assertEqual(stored_hash(job), value)
+
+    def test_find_similar_job_uses_bands_and_threshold(self):
+        value = 0x0F0F_F0F0_1234_5678
+        near = value ^ 0b101  # 2 bits na última faixa
+        far = value ^ 0x0001_0001_0001_0001  # 4 bits, um em cada faixa
+
+        completed = OCRJob.objects.create(image_path='a.jpg', status='completed', **hash_fields(near))
+        OCRJob.objects.create(image_path='b.jpg', status='pending', **hash_fields(value))
+        OCRJob.objects.create(image_path='c.jpg', status='completed', **hash_fields(far))
+
+        self.assertEqual(find_similar_job(value, max_distance=3), (completed, 2))
+        self.assertIsNone(find_similar_job(value, max_distance=1))
+        self.assertIsNone(find_similar_job(value, max_distance=0))
+
+    def test_max_distance_limited_to_band_recall(self):
+        """Acima de 3 o índice de 4 faixas perderia imagens: valor rejeitado."""
+        with self.assertRaises(ValueError):
+            find_similar_job(0, max_distance=4)
+        for value in ('4', '-1'):
+            with self.subTest(value=value), patch.dict(os.environ, {'OCR_PHASH_MAX_DISTANCE': value}):
+                with self.assertRaises(ImproperlyConfigured):
+                    image_hash._configured_max_distance()
+        with patch.dict(os.environ, {'OCR_PHASH_MAX_DISTANCE': '3'}):
+            self.assertEqual(image_hash._configured_max_distance(), 3)
+
+
+class NonSeekableStream:
+    """Stream que só permite leitura sequencial (como um corpo de requisição)."""
+    def __init__(self, data):
+        self._buffer = BytesIO(data)
+
+    def read(self, size=-1):
+        return self._buffer.read(size)
+
+
+class PrepareOCRImageTest(TestCase):
+    def test_large_jpeg_is_hashed_and_downscaled(self):
+        original = jpeg_bytes(make_invoice_image(size=(3000, 4000)), quality=90, max_size=4000)
+        upload = SimpleUploadedFile('nota.jpg', original, content_type='image/jpeg')
+
+        prepared = prepare_ocr_image(upload)
+
+        self.assertEqual(prepared.md5, hashlib.md5(original).hexdigest())
+        self.assertEqual(prepared.original_size, (3000, 4000))
+        self.assertEqual(prepared.perceptual_hash, dhash_bytes(prepared.image_bytes))
+        with Image.open(BytesIO(prepared.image_bytes)) as image:
+            self.assertEqual(image.format, 'JPEG')
+            self.assertEqual(image.size, (600, 800))
+
+    def test_reduced_decode_keeps_perceptual_hash(self):
+        # A decodificação reduzida (draft) não pode afastar o hash do preparo antigo
+        original = jpeg_bytes(make_invoice_image(size=(3000, 4000)), quality=90, max_size=4000)
+        prepared = prepare_ocr_image(SimpleUploadedFile('nota.jpg', original))
+        legacy = jpeg_bytes(Image.open(BytesIO(original)))
+        self.assertLessEqual(hamming(prepared.perceptual_hash, dhash_bytes(legacy)), 3)
+
+    def test_non_seekable_png_stream(self):
+        image = make_invoice_image().convert('RGBA')
+        output = BytesIO()
+        image.save(output, format='PNG')
+        data = output.getvalue()
+
+        prepared = prepare_ocr_image(NonSeekableStream(data))
+
+        self.assertEqual(prepared.md5, hashlib.md5(data).hexdigest())
+        with Image.open(BytesIO(prepared.image_bytes)) as result:
+            self.assertEqual(result.mode, 'RGB')
+            self.assertEqual(max(result.size), 800)
+
+
+@override_settings(MEDIA_ROOT=Path(tempfile.mkdtemp()))
+@patch('fiscal.views.ocr._use_supabase', return_value=False)
+class OCRSubmitDedupTest(TestCase):
+    def setUp(self):
+        user = ProfessionalUser.objects.create_user(
+            email="t@example.com", password="p", first_name="Test", last_name="User")
+        user.first_login = False
+        user.save()
+        self.client.force_login(user)
+
+    def submit(self, image_bytes):
+        photo = SimpleUploadedFile('nota.jpg', image_bytes, content_type='image/jpeg')
+        return self.client.post(reverse('fiscal:ocr_submit'), {'photo': photo}).json()
+
+    def test_reencoded_photo_reuses_completed_job(self, _):
+        original = make_invoice_image()
+        first = self.submit(jpeg_bytes(original, quality=95, max_size=1600))
+        job = OCRJob.objects.get(pk=first['job_id'])
+        self.assertIsNotNone(job.perceptual_hash)
+        job.mark_completed({'number': '123', 'access_key': ''})
+
+        # Mesma nota, recomprimida pelo celular: outro MD5, mesmo resultado
+        second = self.submit(jpeg_bytes(original, quality=60, max_size=1400))
+        self.assertTrue(second.get('reused'))
+        self.assertEqual(second['job_id'], first['job_id'])
+        self.assertEqual(OCRJob.objects.count(), 1)
+
+    def test_different_photo_creates_new_job(self, _):
+        first = self.submit(jpeg_bytes(make_invoice_image(seed=0)))
+        OCRJob.objects.get(pk=first['job_id']).mark_completed({'number': '1'})
+
+        second = self.submit(jpeg_bytes(make_invoice_image(seed=3)))
+        self.assertNotIn('reused', second)
+        self.assertEqual(OCRJob.objects.count(), 2)
+
+
+class BackfillOCRHashesTest(TestCase):
+    def test_backfill_hashes_completed_jobs(self):
+        media = Path(tempfile.mkdtemp())
+        image_bytes = jpeg_bytes(make_invoice_image())
+        (media / 'ocr_jobs').mkdir()
+        (media / 'ocr_jobs' / 'a.jpg').write_bytes(image_bytes)
+        job = OCRJob.objects.create(image_path='local/ocr_jobs/a.jpg', status='completed')
+        missing = OCRJob.objects.create(image_path='local/ocr_jobs/nao-existe.jpg', status='completed')
+
+        with override_settings(MEDIA_ROOT=media):
+            call_command('backfill_ocr_hashes', '--dry-run', stdout=StringIO())
+            job.refresh_from_db()
+            self.assertIsNone(job.perceptual_hash)
+
+            call_command('backfill_ocr_hashes', stdout=StringIO())
+
+        job.refresh_from_db()
+        missing.refresh_from_db()
+        self.assertEqual(stored_hash(job), dhash_bytes(image_bytes))
+        self.assertIsNone(missing.perceptual_hash)
+
+
+class BenchmarkOCRUploadTest(TestCase):
+    @patch('fiscal.management.commands.benchmark_ocr.traceback.print_exc')
+    def test_failing_file_is_reported_and_skipped(self, _):
+        folder = Path(tempfile.mkdtemp())
+        (folder / 'a.jpg').write_bytes(jpeg_bytes(make_invoice_image()))
+        (folder / 'quebrado.jpg').write_bytes(b'isto nao e uma imagem')
+        out = StringIO()
+
+        call_command('benchmark_ocr', '--upload', '--dir', str(folder), stdout=out)
+
+        output = out.getvalue()
+        self.assertIn('[ERRO] quebrado.jpg: processo de medição falhou (_legacy_prepare', output)
+        self.assertEqual(output.count('Benchmark Concluído'), 1)
+        self.assertEqual(len([line for line in output.splitlines() if line.startswith('a.jpg ')]), 1)
@@ -0,0 +1,182 @@
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from authenticate.models import ProfessionalUser
+from fiscal.models import APIKeyStatus, OCRJob
+from fiscal.services.ocr_types import ExtractedInvoiceData
+from fiscal.services.ocr_worker import OCRWorker, next_quota_reset
+
+MEDIA_ROOT = Path(tempfile.mkdtemp())
+
+
+class StubOCRService:
+    """Substitui o InvoiceOCRService: devolve as respostas na ordem."""
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def extract_from_bytes(self, image_bytes, mime_type='image/png'):
+        self.calls += 1
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+def make_job(name='nota.jpg', **kwargs):
+    (MEDIA_ROOT / 'ocr_jobs').mkdir(exist_ok=True)
+    (MEDIA_ROOT / 'ocr_jobs' / name).write_bytes(b'jpeg')
+    return OCRJob.objects.create(image_path=f'local/ocr_jobs/{name}', **kwargs)
+
+
+def extracted(number='123'):
+    return ExtractedInvoiceData(number=number, supplier_name='Fornecedor', confidence=1.0)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class OCRWorkerTest(TestCase):
+    def make_worker(self, *responses, **kwargs):
+        self.service = StubOCRService(*responses)
+        return OCRWorker(service_factory=lambda: self.service, key_count=1, **kwargs)
+
+    def test_claim_reserves_oldest_ready_jobs(self):
+        first = make_job('a.jpg')
+        second = make_job('b.jpg')
+        make_job('c.jpg', next_attempt_at=timezone.now() + timedelta(minutes=5))
+        make_job('d.jpg', status='completed')
+
+        worker = self.make_worker()
+        claimed = worker.claim(5)
+
+        self.assertEqual([job.id for job in claimed], [first.id, second.id])
+        self.assertTrue(all(job.status == 'processing' and job.started_at for job in claimed))
+        self.assertEqual(worker.claim(5), [])
+
+    def test_process_completes_job(self):
+        job = make_job()
+        worker = self.make_worker(extracted('456'))
+
+        self.assertEqual(worker.process(worker.claim(1)[0]), 'completed')
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual(job.result['number'], '456')
+
+    def test_transient_errors_back_off_then_fail(self):
+        job = make_job()
+        worker = self.make_worker(
+            ExtractedInvoiceData(error='timeout'), RuntimeError('conexão'), ExtractedInvoiceData(error='timeout'),
+            max_attempts=3, backoff_seconds=10,
+        )
+
+        before = timezone.now()
+        self.assertEqual(worker.process(worker.claim(1)[0]), 'retry')
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('pending', 1))
+        self.assertGreaterEqual(job.next_attempt_at, before + timedelta(seconds=10))
+        self.assertEqual(worker.claim(1), [])  # ainda aguardando o backoff
+
+        OCRJob.objects.filter(pk=job.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(worker.process(worker.claim(1)[0]), 'retry')
+        job.refresh_from_db()
+        self.assertEqual(job.attempts, 2)
+        self.assertGreaterEqual(job.next_attempt_at, before + timedelta(seconds=20))
+
+        OCRJob.objects.filter(pk=job.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(worker.process(worker.claim(1)[0]), 'failed')
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.error_message), ('failed', 3, 'timeout'))
+
+    def test_quota_error_waits_for_next_day_without_counting_attempt(self):
+        job = make_job()
+        worker = self.make_worker(ExtractedInvoiceData(error='429 RESOURCE_EXHAUSTED quota'))
+
+        self.assertEqual(worker.process(worker.claim(1)[0]), 'quota')
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('pending', 0))
+        self.assertEqual(job.next_attempt_at, next_quota_reset())
+
+    def test_missing_image_fails_immediately(self):
+        job = OCRJob.objects.create(image_path='local/ocr_jobs/nao-existe.jpg')
+        worker = self.make_worker()
+
+        self.assertEqual(worker.process(worker.claim(1)[0]), 'failed')
+        self.assertEqual(self.service.calls, 0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+
+    def test_has_quota_follows_api_key_status(self):
+        worker = OCRWorker(service_factory=StubOCRService, key_count=2)
+        self.assertTrue(worker.has_quota())
+        APIKeyStatus.mark_key_exhausted(0)
+        self.assertTrue(worker.has_quota())
+        APIKeyStatus.mark_key_exhausted(1)
+        self.assertFalse(worker.has_quota())
+
+    def test_release_stale_returns_interrupted_jobs(self):
+        job = make_job(status='processing', started_at=timezone.now() - timedelta(hours=1))
+        recent = make_job('b.jpg', status='processing', started_at=timezone.now())
+
+        self.assertEqual(self.make_worker().release_stale(timedelta(minutes=10)), 1)
+
+        job.refresh_from_db()
+        recent.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('pending', 1))
+        self.assertEqual(recent.status, 'processing')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+@patch('fiscal.views.ocr._use_supabase', return_value=False)
+class OCRStatusReadOnlyTest(TestCase):
+    def test_status_does_not_process_pending_job(self, _):
+        user = ProfessionalUser.objects.create_user(
+            email="t@example.com", password="p", first_name="Test", last_name="User")
+        user.first_login = False
+        user.save()
+        self.client.force_login(user)
+        job = make_job()
+
+        with patch('fiscal.views.ocr._process_ocr_job_locally') as process:
+            response = self.client.get(reverse('fiscal:ocr_status', args=[job.id]))
+
+        self.assertEqual(response.json()['status'], 'pending')
+        process.assert_not_called()
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'pending')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+@patch('fiscal.views.ocr._use_supabase', return_value=False)
+@patch('fiscal.services.ocr.get_api_keys', return_value=['chave'])
+class ProcessOCRJobsCommandTest(TransactionTestCase):
+    def test_once_drains_queue(self, *_):
+        jobs = [make_job(f'{i}.jpg') for i in range(3)]
+        service = StubOCRService(extracted('1'), extracted('2'), extracted('3'))
+
+        with patch('fiscal.services.ocr_worker._default_service', return_value=service):
+            # Uma thread: no SQLite em memória dos testes, escritas concorrentes
+            # falham com "table is locked" em vez de esperar o lock
+            call_command('process_ocr_jobs', '--once', '--threads', '1', stdout=StringIO())
+
+        self.assertEqual(service.calls, 3)
+        self.assertEqual(
+            set(OCRJob.objects.filter(id__in=[j.id for j in jobs]).values_list('status', flat=True)),
+            {'completed'},
+        )
+
+    def test_dry_run(self, *_):
+        job = make_job()
+        out = StringIO()
+        call_command('process_ocr_jobs', '--dry-run', stdout=out)
+        self.assertIn('1 job(s)', out.getvalue())
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'pending')
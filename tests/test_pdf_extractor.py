@@ -0,0 +1,102 @@
+import os
+import re
+import tempfile
+from datetime import date
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase
+
+from bidding_procurement.management.commands import benchmark_pdf_extraction
+from bidding_procurement.management.commands.benchmark_pdf_extraction import write_synthetic_bidding_pdf
+from bidding_procurement.utils import pdf_extractor
+from bidding_procurement.utils.pdf_extractor import BiddingPDFExtractor
+
+PAGES = [
+    "Proc. Administrativo : 77\n"
+    "Modalidade : PREGÃO Nº Modalidade Licit. : 3\n"
+    "Fornecedor / Proponente : 10 - ALFA LTDA\n"
+    "1 001.002.003 CIMENTO CP II MARCA VOTORAN UN 10 25,50 255,00",
+    # Continuação da seção da ALFA, e o cabeçalho restante só aparece aqui
+    "2 001.002.004 AREIA MEDIA PC 3 1.200,00 3.600,00\n"
+    "Nº Proc. Licitatório : 5/25\n"
+    "Fornecedor / Proponente : 0 - FIORILLI SOFTWARE\n"
+    "3 009.009.009 ITEM DO RODAPE UN 1 1,00 1,00\n"
+    "Fornecedor / Proponente : 11 - BETA ME\n"
+    "4 001.002.005 TIJOLO 8 FUROS 100 0,80 80,00",
+    "",
+    "Prazo de Validade : 31/12/2026\n"
+    "Fornecedor / Proponente : 10 - ALFA LTDA",
+]
+
+
+class BiddingPDFExtractorTest(SimpleTestCase):
+    def extract(self, pages):
+        extractor = BiddingPDFExtractor('licitacao.pdf')
+        with patch.object(extractor, 'iter_page_texts', return_value=iter(pages)):
+            return extractor.extract()
+
+    def test_single_pass_across_pages(self):
+        data = self.extract(PAGES)
+
+        self.assertEqual(data['administrative_process'], '77/25')
+        self.assertEqual(data['modality'], 'PREGÃO')
+        self.assertEqual(data['modality_number'], 3)
+        self.assertEqual(data['validity_date'], date(2026, 12, 31))
+        self.assertEqual(data['suppliers'], ['ALFA LTDA', 'BETA ME'])
+        self.assertEqual(
+            [(m['code'], m['description'], m['quantity'], m['unit_price'], m['supplier']) for m in data['materials']],
+            [
+                ('001.002.003', 'CIMENTO CP II MARCA VOTORAN', 10, 25.5, 'ALFA LTDA'),
+                ('001.002.004', 'AREIA MEDIA', 3, 1200.0, 'ALFA LTDA'),
+                ('001.002.005', 'TIJOLO 8 FUROS', 100, 0.8, 'BETA ME'),
+            ],
+        )
+        self.assertEqual(data['materials'][0]['brand'], 'VOTORAN')
+
+    def test_modality_without_number_only_at_end_of_document(self):
+        """Mesma regra do texto completo antigo: sem "Nº", só na última linha do documento."""
+        def legacy(pages):
+            full_text = "".join(page + "\n" for page in pages if page)
+            match = re.search(r'Modalidade\s*:\s*([^\n]+?)(?:Nº|$)', full_text, re.IGNORECASE)
+            return match.group(1).strip() if match else ""
+
+        cases = [
+            (["Modalidade : CONVITE\nFornecedor / Proponente : 10 - ALFA LTDA", "Fim"], ""),
+            (["Modalidade : CONVITE", "Modalidade : PREGÃO Nº Modalidade Licit. : 3"], "PREGÃO"),
+            (["Cabeçalho", "Modalidade : CONVITE\nFim", "Modalidade : TOMADA DE PREÇOS", ""], "TOMADA DE PREÇOS"),
+        ]
+        for pages, expected in cases:
+            with self.subTest(pages=pages):
+                self.assertEqual(legacy(pages), expected)
+                self.assertEqual(self.extract(pages)['modality'], expected)
+
+    def test_parallel_matches_sequential(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'licitacao.pdf')
+            lines = write_synthetic_bidding_pdf(path, pages=4)
+
+            sequential = BiddingPDFExtractor(path, workers=1).extract()
+            with patch.object(pdf_extractor, 'PARALLEL_MIN_PAGES', 2):
+                parallel = BiddingPDFExtractor(path, workers=2).extract()
+
+        self.assertEqual(len(sequential['materials']), lines)
+        self.assertEqual(sequential['administrative_process'], '321/26')
+        self.assertEqual(parallel, sequential)
+
+
+class BenchmarkPDFExtractionTest(SimpleTestCase):
+    @patch.object(benchmark_pdf_extraction.traceback, 'print_exc')
+    def test_failed_measurement_is_reported(self, _):
+        def failing_extract(path, workers):
+            raise ValueError('falhou')
+
+        out = StringIO()
+        with patch.object(benchmark_pdf_extraction, '_extract', failing_extract):
+            with self.assertRaisesMessage(CommandError, 'Nenhuma medição concluída'):
+                call_command('benchmark_pdf_extraction', '--pages', '1', '--workers', '1',
+                             '--skip-legacy', stdout=out)
+
+        self.assertIn('[ERRO] uma passada: processo de medição falhou', out.getvalue())
@@ -0,0 +1,145 @@
+import json
+import os
+import tempfile
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+from types import SimpleNamespace
+from unittest.mock import patch
+from uuid import uuid4
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from bidding_procurement.management.commands import import_bidding_pdf
+from bidding_procurement.management.commands.benchmark_pdf_extraction import write_synthetic_bidding_pdf
+from bidding_procurement.models import Bidding, Material, MaterialBidding
+from bidding_supplier.models import Supplier
+from fiscal.models import MaterialBalance
+
+
+def pdf_data(materials, suppliers=('ALFA MATERIAIS LTDA',)):
+    return {
+        'administrative_process': '77/26',
+        'bidding_name': 'Processo Licitatório 77/26',
+        'modality': 'PREGÃO',
+        'modality_number': 3,
+        'validity_date': date(2026, 12, 31),
+        'object_description': 'MATERIAIS',
+        'suppliers': list(suppliers),
+        'materials': materials,
+    }
+
+
+def pdf_material(description, supplier='ALFA MATERIAIS LTDA', quantity=10, unit_price=2.5):
+    return {
+        'item': '', 'code': '', 'description': description, 'brand': '',
+        'quantity': quantity, 'unit_price': unit_price, 'supplier': supplier,
+    }
+
+
+class ImportBiddingPDFCommandTest(TestCase):
+    def run_import(self, data, *args):
+        extractor = SimpleNamespace(extract=lambda: data, get_summary=lambda: '')
+        with patch.object(import_bidding_pdf, 'BiddingPDFExtractor', return_value=extractor):
+            call_command('import_bidding_pdf', 'licitacao.pdf', *args, stdout=StringIO())
+
+    def test_import_resolves_and_writes_in_bulk(self):
+        alfa = Supplier.objects.create(company='ALFA MATERIAIS LTDA')
+        beta = Supplier.objects.create(company='BETA COMERCIO LTDA')
+        cimento = Material.objects.create(name='CIMENTO PORTLAND CP II')
+        bidding = Bidding.objects.create(name='Antiga', administrative_process='77/26', date=date.today())
+        MaterialBidding.objects.create(material=cimento, bidding=bidding, supplier=beta, quantity=1)
+
+        self.run_import(pdf_data(
+            [
+                pdf_material('Cimento Portland CP II', quantity=40, unit_price=31.9),
+                pdf_material('Areia média lavada', supplier='BETA COMERCIO LTDA.'),
+                pdf_material('Areia média lavada', supplier='BETA COMERCIO LTDA.', quantity=12),
+                pdf_material('Tubo PVC 25mm', supplier='GAMA ME'),
+            ],
+            suppliers=['ALFA MATERIAIS LTDA', 'BETA COMERCIO LTDA.', 'GAMA ME'],
+        ), '--auto-merge')
+
+        beta.refresh_from_db()
+        self.assertEqual(beta.company, 'BETA COMERCIO LTDA.')
+        gama = Supplier.objects.get(company='GAMA ME')
+        self.assertEqual((gama.trade, gama.slug), ('GAMA ME', 'gama-me'))
+        self.assertEqual(Supplier.objects.count(), 3)
+
+        links = {mb.material.name: mb for mb in MaterialBidding.objects.filter(bidding=bidding).select_related('material')}
+        self.assertEqual(set(links), {'CIMENTO PORTLAND CP II', 'AREIA MÉDIA LAVADA', 'TUBO PVC 25MM'})
+        updated = links['CIMENTO PORTLAND CP II']
+        self.assertEqual((updated.supplier, updated.quantity, updated.price), (alfa, 40, Decimal('31.90')))
+        self.assertEqual((links['AREIA MÉDIA LAVADA'].quantity, links['AREIA MÉDIA LAVADA'].status), (12, '1'))
+        self.assertTrue(links['TUBO PVC 25MM'].material.slug)
+        self.assertEqual(Material.objects.filter(name='AREIA MÉDIA LAVADA').count(), 1)
+        self.assertEqual(
+            dict(MaterialBalance.objects.filter(material_bidding__bidding=bidding).values_list('material_bidding', 'licensed')),
+            {mb.pk: mb.quantity for mb in links.values()},
+        )
+
+    def test_query_count_and_invalidations_do_not_grow_with_materials(self):
+        def run(count):
+            MaterialBidding.objects.all().delete()
+            # Nomes aleatórios: todos novos e sem similaridade com os existentes
+            materials = [pdf_material(f'MATERIAL {uuid4().hex}') for _ in range(count)]
+            with CaptureQueriesContext(connection) as queries, \
+                    patch('core.cache.bump_cache_version') as bump:
+                self.run_import(pdf_data(materials))
+            return len(queries), bump.call_count
+
+        run(1)  # cria licitação e fornecedor
+        small, small_bumps = run(5)
+        large, large_bumps = run(60)
+        self.assertEqual(small, large)
+        self.assertEqual(small_bumps, 1)
+        self.assertEqual(large_bumps, 1)
+
+    def test_import_data_reports_ambiguous_items(self):
+        Supplier.objects.create(company='ALFA MATERIAIS LTDA')
+        Material.objects.create(name='CABO FLEXIVEL 2,5MM AZUL')
+
+        report = import_bidding_pdf.Command(stdout=StringIO()).import_data(pdf_data(
+            [pdf_material('CABO FLEXIVEL 2,5MM AZUL ROLO', supplier='ALFA MATERIAIS LTDA - ME')],
+            suppliers=['ALFA MATERIAIS LTDA - ME'],
+        ))
+
+        self.assertEqual(report['bidding'], 'created')
+        self.assertEqual(report['created'], {'suppliers': 1, 'materials': 1, 'material_biddings': 1})
+        self.assertEqual(
+            [(item['kind'], item['name'], item['candidates'][0]['name']) for item in report['ambiguous']],
+            [
+                ('supplier', 'ALFA MATERIAIS LTDA - ME', 'ALFA MATERIAIS LTDA'),
+                ('material', 'CABO FLEXIVEL 2,5MM AZUL ROLO', 'CABO FLEXIVEL 2,5MM AZUL'),
+            ],
+        )
+
+
+class ImportBiddingPDFsCommandTest(TestCase):
+    def test_batch_import_with_json_summary(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            lines = write_synthetic_bidding_pdf(os.path.join(tmp, 'a.pdf'), pages=2, process_number=101)
+            write_synthetic_bidding_pdf(os.path.join(tmp, 'b.PDF'), pages=2, seed=7, process_number=102)
+            with open(os.path.join(tmp, 'quebrado.pdf'), 'wb') as f:
+                f.write(b'isto nao e um pdf')
+            output = os.path.join(tmp, 'resumo.json')
+
+            call_command('import_bidding_pdfs', tmp, '--workers', '2', '--output', output, stdout=StringIO())
+
+            with open(output, encoding='utf-8') as f:
+                summary = json.load(f)
+
+        totals = summary['totals']
+        self.assertEqual((totals['files'], totals['imported'], totals['errors']), (3, 2, 1))
+        self.assertEqual(totals['biddings'], {'created': 2, 'updated': 0})
+        self.assertEqual(totals['created']['material_biddings'], MaterialBidding.objects.count())
+        self.assertEqual(
+            set(Bidding.objects.values_list('administrative_process', flat=True)), {'101/26', '102/26'})
+
+        files = {os.path.basename(entry['file']): entry for entry in summary['files']}
+        self.assertEqual((files['quebrado.pdf']['status'], files['quebrado.pdf']['stage']), ('error', 'extract'))
+        self.assertEqual(files['a.pdf']['status'], 'ok')
+        self.assertEqual(files['a.pdf']['materials_in_pdf'], lines)
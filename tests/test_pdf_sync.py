@@ -0,0 +1,124 @@
+from datetime import date
+from io import StringIO
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from authenticate.models import ProfessionalUser
+from bidding_procurement.management.commands import sync_bidding_with_pdf
+from bidding_procurement.models import Bidding, Material, MaterialBidding
+from bidding_procurement.utils.pdf_sync import match_pdf_materials
+from fiscal.models import MaterialBalance
+from reports.models import MaterialReport, Report
+
+
+def db_item(pk, name):
+    return SimpleNamespace(pk=pk, material=SimpleNamespace(name=name))
+
+
+def pdf_item(code, description, **extra):
+    return {'code': code, 'description': description, 'unit_price': 1, 'quantity': 10, **extra}
+
+
+class MatchPDFMaterialsTest(TestCase):
+    def test_code_then_name_one_to_one(self):
+        db = [
+            db_item(1, '001.002.003 - CIMENTO'),
+            db_item(2, 'AREIA MEDIA LAVADA'),
+            db_item(3, 'AREIA MEDIA LAVADA'),  # duplicado: só um pode ficar com o item do PDF
+            db_item(4, 'TIJOLO'),
+            db_item(5, 'MATERIAL SEM PAR'),
+        ]
+        pdf = [
+            pdf_item('001.002.003', 'CIMENTO PORTLAND CP II'),
+            pdf_item('', 'Areia média lavada'),
+            pdf_item('', 'TIJOLO CERAMICO 8 FUROS'),  # contém o nome do banco
+            pdf_item('', 'TUBO PVC 25MM'),
+        ]
+
+        plan = match_pdf_materials(db, pdf)
+
+        matched = {mb.pk: (m['description'], score) for mb, m, score in plan.matches}
+        self.assertEqual(matched[1], ('CIMENTO PORTLAND CP II', 1.0))
+        self.assertEqual(matched[2], ('Areia média lavada', 1.0))
+        self.assertEqual(matched[4], ('TIJOLO CERAMICO 8 FUROS', 1.0))
+        self.assertEqual([mb.pk for mb in plan.to_remove], [3, 5])
+        self.assertEqual([m['description'] for m in plan.to_create], ['TUBO PVC 25MM'])
+        self.assertEqual(
+            [(mb.pk, name) for mb, name in plan.to_update],
+            [(1, 'CIMENTO PORTLAND CP II'), (2, 'Areia média lavada'), (4, 'TIJOLO CERAMICO 8 FUROS')],
+        )
+
+    def test_best_global_pair_wins(self):
+        # O primeiro do banco é parecido com os dois do PDF, mas o segundo só
+        # casa com "ARGAMASSA AC2": atribuição pelo maior score
+        db = [db_item(1, 'ARGAMASSA AC1 20KG'), db_item(2, 'ARGAMASSA AC2 20KG')]
+        pdf = [pdf_item('', 'ARGAMASSA AC2 20KG'), pdf_item('', 'ARGAMASSA AC1 20 KG')]
+
+        plan = match_pdf_materials(db, pdf)
+
+        matched = {mb.pk: m['description'] for mb, m, _ in plan.matches}
+        self.assertEqual(matched, {1: 'ARGAMASSA AC1 20 KG', 2: 'ARGAMASSA AC2 20KG'})
+        self.assertEqual(plan.to_create, [])
+
+
+@patch('builtins.input', return_value='s')
+class SyncBiddingWithPDFCommandTest(TestCase):
+    def setUp(self):
+        self.bidding = Bidding.objects.create(
+            name="Licitação", date=date.today(), administrative_process="123/2026")
+
+    def link(self, name):
+        return MaterialBidding.objects.create(
+            material=Material.objects.create(name=name), bidding=self.bidding, quantity=5)
+
+    def run_sync(self, materials, *args):
+        data = {'administrative_process': '123/2026', 'materials': materials}
+        extractor = SimpleNamespace(extract=lambda: data)
+        out = StringIO()
+        with patch.object(sync_bidding_with_pdf, 'BiddingPDFExtractor', return_value=extractor):
+            call_command('sync_bidding_with_pdf', 'licitacao.pdf', *args, stdout=out)
+        return out.getvalue()
+
+    def test_sync_updates_creates_and_removes(self, _):
+        renamed = self.link('001.000.001 CABO FLEXIVEL')
+        removed = self.link('PARAFUSO')
+        in_report = self.link('LIXA')
+        user = ProfessionalUser.objects.create_user(
+            email="r@example.com", password="p", first_name="Test", last_name="User")
+        report = Report.objects.create(status="1", justification="x", professional=user, pro_accountable=user)
+        MaterialReport.objects.create(report=report, material_bidding=in_report, quantity=1)
+        existing = Material.objects.create(name='TINTA ACRILICA')
+
+        self.run_sync([
+            pdf_item('001.000.001', 'Cabo flexível 2,5mm'),
+            pdf_item('', 'TINTA ACRILICA'),
+            pdf_item('', 'FITA ISOLANTE', quantity=7),
+        ])
+
+        renamed.material.refresh_from_db()
+        self.assertEqual(renamed.material.name, 'CABO FLEXÍVEL 2,5MM')
+        self.assertFalse(MaterialBidding.objects.filter(pk=removed.pk).exists())
+        self.assertTrue(MaterialBidding.objects.filter(pk=in_report.pk).exists())
+
+        tinta = MaterialBidding.objects.get(bidding=self.bidding, material=existing)
+        fita = MaterialBidding.objects.get(bidding=self.bidding, material__name='FITA ISOLANTE')
+        self.assertEqual(fita.quantity, 7)
+        self.assertTrue(fita.material.slug)
+        self.assertEqual(MaterialBalance.objects.get(material_bidding=fita).licensed, 7)
+        self.assertEqual(MaterialBalance.objects.get(material_bidding=tinta).licensed, 10)
+
+    def test_dry_run_changes_nothing(self, input_mock):
+        self.link('PARAFUSO')
+        with CaptureQueriesContext(connection) as queries:
+            output = self.run_sync([pdf_item('', 'FITA ISOLANTE')], '--dry-run')
+
+        input_mock.assert_not_called()
+        self.assertIn('[DRY-RUN] 1 materiais seriam removidos', output)
+        self.assertEqual(MaterialBidding.objects.count(), 1)
+        # Licitação + materiais com uso em laudos em uma consulta, sem N+1
+        self.assertEqual(len(queries), 2)
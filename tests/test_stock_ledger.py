@@ -0,0 +1,344 @@
+import threading
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from authenticate.models import ProfessionalUser
+from bidding_procurement.models import Bidding, Material, MaterialBidding
+from bidding_supplier.models import Supplier
+from fiscal.models import (
+    DeliveryNote, DeliveryNoteItem, Invoice, InvoiceItem, StockItem, StockMovement, StockSnapshot,
+)
+from fiscal.services.delivery import DeliveryService
+from fiscal.services.stock import StockLedgerService
+from organizational_structure.models import Sector
+
+
+def make_material_bidding(supplier, bidding, name):
+    return MaterialBidding.objects.create(
+        material=Material.objects.create(name=name),
+        bidding=bidding, supplier=supplier, price="10.00", quantity=10_000,
+    )
+
+
+class StockLedgerServiceTest(TestCase):
+    def setUp(self):
+        self.supplier = Supplier.objects.create(company="Fornecedor", cnpj="1", trade="Loja")
+        bidding = Bidding.objects.create(name="Licitação 01", date=date.today())
+        self.mb_a = make_material_bidding(self.supplier, bidding, "Material A")
+        self.mb_b = make_material_bidding(self.supplier, bidding, "Material B")
+        self.invoice = Invoice.objects.create(number="1", supplier=self.supplier, issue_date=date.today())
+
+    def stock(self, material_bidding):
+        return StockItem.objects.get(material_bidding=material_bidding).quantity
+
+    def test_apply_upserts_and_clamps_at_zero(self):
+        """Cria o StockItem ausente e nunca deixa o saldo negativo."""
+        StockLedgerService.apply(stock={self.mb_a.pk: 5, self.mb_b.pk: 2})
+        StockLedgerService.apply(stock={self.mb_a.pk: -3, self.mb_b.pk: -10})
+
+        self.assertEqual(self.stock(self.mb_a), 2)
+        self.assertEqual(self.stock(self.mb_b), 0)
+
+    def test_apply_uses_constant_queries(self):
+        """Vários materiais: número fixo de comandos, sem SELECT por material."""
+        with CaptureQueriesContext(connection) as queries:
+            StockLedgerService.apply(stock={self.mb_a.pk: 5, self.mb_b.pk: 2})
+
+        statements = [q["sql"] for q in queries if "SAVEPOINT" not in q["sql"]]
+        # upsert, SELECT FOR UPDATE do saldo anterior, UPDATE, bulk_create dos
+        # movimentos e refresh do MaterialBalance (SELECT + upsert)
+        self.assertEqual(len(statements), 6)
+
+    def test_invoice_item_edit_and_delete(self):
+        """Editar a quantidade aplica a diferença; excluir estorna estoque e compras."""
+        item = InvoiceItem.objects.create(
+            invoice=self.invoice, material_bidding=self.mb_a, quantity=10, unit_price=Decimal("1.00"))
+        item.quantity = 12
+        item.save()
+        self.assertEqual(self.stock(self.mb_a), 12)
+
+        item.material_bidding = self.mb_b
+        item.save()
+        self.assertEqual(self.stock(self.mb_a), 0)
+        self.assertEqual(self.stock(self.mb_b), 12)
+
+        item.delete()
+        self.mb_b.refresh_from_db()
+        self.assertEqual(self.mb_b.quantity_purchased, 0)
+        self.assertEqual(self.stock(self.mb_b), 0)
+
+    def test_complete_delivery_is_idempotent(self):
+        """Concluir a entrega baixa o estoque uma vez só, em lote."""
+        user = ProfessionalUser.objects.create_user(
+            email="t@example.com", password="p", first_name="Test", last_name="User")
+        items = [
+            InvoiceItem.objects.create(
+                invoice=self.invoice, material_bidding=mb, quantity=10, unit_price=Decimal("1.00"))
+            for mb in (self.mb_a, self.mb_b)
+        ]
+        delivery = DeliveryNote.objects.create(
+            invoice=self.invoice, sector=Sector.objects.create(name="Setor"), delivered_by=user)
+        for item in items:
+            DeliveryNoteItem.objects.create(delivery_note=delivery, invoice_item=item, quantity_delivered=4)
+
+        delivery.status = 'C'
+        delivery.save()
+        delivery.save()
+
+        self.assertEqual(self.stock(self.mb_a), 6)
+        self.assertEqual(self.stock(self.mb_b), 6)
+        self.assertEqual(StockLedgerService.complete_delivery(delivery), 0)
+
+
+class StockMovementLedgerTest(TestCase):
+    def setUp(self):
+        supplier = Supplier.objects.create(company="Fornecedor", cnpj="1", trade="Loja")
+        bidding = Bidding.objects.create(name="Licitação 01", date=date.today())
+        self.mb = make_material_bidding(supplier, bidding, "Material A")
+        self.invoice = Invoice.objects.create(number="1", supplier=supplier, issue_date=date.today())
+        self.user = ProfessionalUser.objects.create_user(
+            email="t@example.com", password="p", first_name="Test", last_name="User")
+
+    def movements(self):
+        return list(StockMovement.objects.values_list("kind", "quantity"))
+
+    def test_operations_write_movements(self):
+        """Entrada, correção, saída e estorno ficam registrados no livro-razão."""
+        item = InvoiceItem.objects.create(
+            invoice=self.invoice, material_bidding=self.mb, quantity=10, unit_price=Decimal("1.00"))
+        item.quantity = 8
+        item.save()
+
+        delivery = DeliveryNote.objects.create(
+            invoice=self.invoice, sector=Sector.objects.create(name="Setor"), delivered_by=self.user)
+        delivery_item = DeliveryNoteItem.objects.create(
+            delivery_note=delivery, invoice_item=item, quantity_delivered=3)
+        delivery.status = "C"
+        delivery.save()
+        delivery_item.refresh_from_db()
+        delivery_item.delete()
+
+        self.assertEqual(
+            self.movements(),
+            [("E", 10), ("R", -10), ("E", 8), ("S", -3), ("R", 3)],
+        )
+        self.assertEqual(StockLedgerService.balances(), {self.mb.pk: 8})
+        self.assertEqual(StockItem.objects.get(material_bidding=self.mb).quantity, 8)
+
+    def test_clamped_exit_records_applied_delta(self):
+        """Saída maior que o saldo: o livro-razão grava só o que saiu (fica igual ao StockItem)."""
+        StockLedgerService.apply(stock={self.mb.pk: 2})
+        StockLedgerService.apply(stock={self.mb.pk: -5})
+        StockLedgerService.apply(stock={self.mb.pk: 10})
+
+        self.assertEqual(self.movements(), [("A", 2), ("A", -2), ("A", 10)])
+        self.assertEqual(StockItem.objects.get(material_bidding=self.mb).quantity, 10)
+        self.assertEqual(StockLedgerService.balances(), {self.mb.pk: 10})
+        self.assertEqual(StockLedgerService.stale_stock_items(), {})
+
+        StockLedgerService.take_snapshots()
+        self.assertEqual(StockSnapshot.objects.get().quantity, 10)
+        self.assertEqual(StockLedgerService.rebuild_stock_items(), 0)
+
+    def test_clamp_with_several_movements_adds_adjustment(self):
+        """Vários movimentos do mesmo material: a diferença entra como ajuste."""
+        StockLedgerService.apply(
+            stock={self.mb.pk: -4},
+            movements=[
+                StockMovement(material_bidding=self.mb, kind="R", quantity=-6),
+                StockMovement(material_bidding=self.mb, kind="E", quantity=2),
+            ],
+        )
+
+        self.assertEqual(self.movements(), [("R", -6), ("E", 2), ("A", 4)])
+        self.assertEqual(StockLedgerService.balances(), {self.mb.pk: 0})
+        self.assertEqual(StockLedgerService.stale_stock_items(), {})
+
+    def test_balance_at_point_in_time_with_snapshots(self):
+        """Saldo em uma data = snapshot + movimentos posteriores até a data."""
+        StockLedgerService.apply(stock={self.mb.pk: 10})
+        StockMovement.objects.update(created_at=timezone.now() - timedelta(days=2))
+        self.assertEqual(StockLedgerService.take_snapshots(), 1)
+        self.assertEqual(StockLedgerService.take_snapshots(), 0)
+
+        StockLedgerService.apply(stock={self.mb.pk: -4})
+
+        yesterday = timezone.now() - timedelta(days=1)
+        self.assertEqual(StockLedgerService.balances(at=yesterday), {self.mb.pk: 10})
+        self.assertEqual(StockLedgerService.balances(), {self.mb.pk: 6})
+
+        StockLedgerService.take_snapshots()
+        self.assertEqual(StockSnapshot.objects.count(), 2)
+        with self.assertNumQueries(2):
+            self.assertEqual(StockLedgerService.balances(), {self.mb.pk: 6})
+
+    def test_rebuild_command_restores_stock_from_ledger(self):
+        StockLedgerService.apply(stock={self.mb.pk: 7})
+        StockItem.objects.filter(material_bidding=self.mb).update(quantity=99)
+
+        call_command("rebuild_stock_from_ledger", "--dry-run", stdout=StringIO())
+        self.assertEqual(StockItem.objects.get(material_bidding=self.mb).quantity, 99)
+
+        call_command("rebuild_stock_from_ledger", stdout=StringIO())
+        self.assertEqual(StockItem.objects.get(material_bidding=self.mb).quantity, 7)
+        self.assertEqual(StockLedgerService.stale_stock_items(), {})
+
+
+class DeliveryServiceTest(TestCase):
+    def setUp(self):
+        supplier = Supplier.objects.create(company="Fornecedor", cnpj="1", trade="Loja")
+        bidding = Bidding.objects.create(name="Licitação 01", date=date.today())
+        self.mb_a = make_material_bidding(supplier, bidding, "Material A")
+        self.mb_b = make_material_bidding(supplier, bidding, "Material B")
+        invoice = Invoice.objects.create(number="1", supplier=supplier, issue_date=date.today())
+        self.items = [
+            InvoiceItem.objects.create(
+                invoice=invoice, material_bidding=mb, quantity=100, unit_price=Decimal("1.00"))
+            for mb in (self.mb_a, self.mb_b)
+        ]
+        self.invoice = invoice
+        self.sector = Sector.objects.create(name="Setor")
+        self.user = ProfessionalUser.objects.create_user(
+            email="t@example.com", password="p", first_name="Test", last_name="User")
+
+    def make_deliveries(self, count, status="A"):
+        deliveries = []
+        for _ in range(count):
+            delivery = DeliveryNote.objects.create(
+                invoice=self.invoice, sector=self.sector, delivered_by=self.user, status="A")
+            for item in self.items:
+                DeliveryNoteItem.objects.create(delivery_note=delivery, invoice_item=item, quantity_delivered=2)
+            if status != delivery.status:
+                delivery.status = status
+                delivery.save()
+            deliveries.append(delivery)
+        return deliveries
+
+    def stock(self, material_bidding):
+        return StockItem.objects.get(material_bidding=material_bidding).quantity
+
+    def test_complete_many_updates_status_and_stock(self):
+        deliveries = self.make_deliveries(3)
+        done = self.make_deliveries(1, status="C")[0]
+
+        result = DeliveryService.complete_many(
+            [d.pk for d in deliveries] + [done.pk], received_by="Fechado em massa")
+
+        self.assertTrue(result.success)
+        self.assertEqual(result.data, {"updated": 3, "items": 6})
+        self.assertEqual(
+            DeliveryNote.objects.filter(status="C", received_by="Fechado em massa").count(), 3)
+        self.assertFalse(DeliveryNoteItem.objects.filter(stock_updated=False).exists())
+        # 100 de entrada - 2 da entrega já concluída - 3 x 2 da conclusão em massa
+        self.assertEqual(self.stock(self.mb_a), 92)
+        self.assertEqual(self.stock(self.mb_b), 92)
+
+        again = DeliveryService.complete_many([d.pk for d in deliveries], received_by="x")
+        self.assertEqual(again.data, {"updated": 0, "items": 0})
+        self.assertEqual(self.stock(self.mb_a), 92)
+
+    def test_complete_many_query_count_does_not_grow(self):
+        """Mesmo número de comandos para 2 ou 10 entregas."""
+        def count_statements(deliveries):
+            with CaptureQueriesContext(connection) as queries:
+                DeliveryService.complete_many([d.pk for d in deliveries], received_by="x")
+            return len([q for q in queries if "SAVEPOINT" not in q["sql"]])
+
+        self.assertEqual(count_statements(self.make_deliveries(2)), count_statements(self.make_deliveries(10)))
+
+
+class StockLedgerInterleavingTest(TestCase):
+    """
+    Concorrência intercalada em sequência, com instâncias desatualizadas em
+    memória: roda em qualquer banco (inclusive SQLite); a versão com threads
+    fica em StockLedgerConcurrencyTest.
+    """
+
+    def setUp(self):
+        supplier = Supplier.objects.create(company="Fornecedor", cnpj="1", trade="Loja")
+        bidding = Bidding.objects.create(name="Licitação 01", date=date.today())
+        self.mb = make_material_bidding(supplier, bidding, "Material A")
+        self.invoice = Invoice.objects.create(number="1", supplier=supplier, issue_date=date.today())
+
+    def assert_totals(self, quantity):
+        self.mb.refresh_from_db()
+        self.invoice.refresh_from_db()
+        self.assertEqual(StockItem.objects.get(material_bidding=self.mb).quantity, quantity)
+        self.assertEqual(self.mb.quantity_purchased, quantity)
+        self.assertEqual(self.invoice.total_value, Decimal(quantity))
+        self.assertEqual(StockLedgerService.stale_stock_items(), {})
+
+    def test_stale_invoice_item_edit_uses_current_row(self):
+        """Duas cópias do mesmo item editadas em sequência: a segunda parte do valor gravado pela primeira."""
+        item = InvoiceItem.objects.create(
+            invoice=self.invoice, material_bidding=self.mb, quantity=10, unit_price=Decimal("1.00"))
+        first = InvoiceItem.objects.get(pk=item.pk)
+        second = InvoiceItem.objects.get(pk=item.pk)
+
+        first.quantity = 12
+        first.save()
+        second.quantity = 15
+        second.save()
+
+        self.assert_totals(15)
+
+    def test_stale_material_bidding_does_not_overwrite_balances(self):
+        """Itens criados com um MaterialBidding desatualizado somam via F(), sem regravar o valor em memória."""
+        stale = MaterialBidding.objects.get(pk=self.mb.pk)
+        InvoiceItem.objects.create(
+            invoice=self.invoice, material_bidding=self.mb, quantity=10, unit_price=Decimal("1.00"))
+        InvoiceItem.objects.create(
+            invoice=self.invoice, material_bidding=stale, quantity=5, unit_price=Decimal("1.00"))
+
+        self.assertEqual(stale.quantity_purchased, 0)
+        self.assert_totals(15)
+
+
+# Precisa de escrita concorrente com travas por linha (PostgreSQL); o banco de
+# teste em memória do SQLite falha com "database table is locked".
+@skipUnlessDBFeature('has_select_for_update')
+class StockLedgerConcurrencyTest(TransactionTestCase):
+    def setUp(self):
+        supplier = Supplier.objects.create(company="Fornecedor", cnpj="1", trade="Loja")
+        bidding = Bidding.objects.create(name="Licitação 01", date=date.today())
+        self.material_bidding = make_material_bidding(supplier, bidding, "Material A")
+
+    def test_concurrent_increments_are_not_lost(self):
+        """Threads somando no mesmo material ao mesmo tempo não perdem incrementos."""
+        threads, per_thread = 8, 25
+        errors = []
+        barrier = threading.Barrier(threads)
+
+        def worker():
+            try:
+                barrier.wait()
+                for _ in range(per_thread):
+                    StockLedgerService.apply(
+                        stock={self.material_bidding.pk: 1},
+                        purchased={self.material_bidding.pk: 1},
+                    )
+            except Exception as e:  # pragma: no cover - reportado abaixo
+                errors.append(e)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.material_bidding.refresh_from_db()
+        self.assertEqual(self.material_bidding.quantity_purchased, threads * per_thread)
+        self.assertEqual(
+            StockItem.objects.get(material_bidding=self.material_bidding).quantity,
+            threads * per_thread,
+        )
@@ -0,0 +1,181 @@
+from datetime import date, timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from authenticate.models import ProfessionalUser
+from bidding_procurement.models import Bidding, Material, MaterialBidding
+from bidding_supplier.models import Supplier
+from core.pagination import KeysetPaginator
+from fiscal.models import MaterialBalance
+from fiscal.services.balance import MaterialBalanceService
+from fiscal.services.stock import StockLedgerService
+from fiscal.views.stock import StockOverviewView
+from reports.models import MaterialReport, Report
+
+
+class StockOverviewTestBase(TestCase):
+    def setUp(self):
+        self.supplier = Supplier.objects.create(company="Fornecedor", cnpj="1", trade="Loja")
+        self.bidding_a = Bidding.objects.create(name="Licitação A", date=date.today())
+        self.bidding_b = Bidding.objects.create(name="Licitação B", date=date.today())
+
+    def make(self, bidding, name, quantity=100, purchased=0):
+        return MaterialBidding.objects.create(
+            material=Material.objects.create(name=name), bidding=bidding, supplier=self.supplier,
+            price="1.00", quantity=quantity, quantity_purchased=purchased,
+        )
+
+
+class MaterialBiddingUsageTest(StockOverviewTestBase):
+    def test_annotations_match_properties(self):
+        cases = [(100, 0), (100, 79), (100, 80), (8, 5), (3, 3), (0, 0), (10, 12)]
+        for i, (quantity, purchased) in enumerate(cases):
+            self.make(self.bidding_a, f"Material {i}", quantity, purchased)
+
+        for annotated in MaterialBidding.objects.with_usage():
+            plain = MaterialBidding.objects.get(pk=annotated.pk)
+            self.assertEqual(annotated.usage_percentage, plain.usage_percentage)
+            self.assertEqual(annotated.available_for_purchase, plain.available_for_purchase)
+            self.assertEqual(annotated.is_near_limit, plain.is_near_limit)
+            self.assertEqual(annotated.is_at_limit, plain.is_at_limit)
+
+    def test_balance_follows_sources(self):
+        """MaterialBalance acompanha compras, estoque e laudos."""
+        material = self.make(self.bidding_a, "Material", 100, 0)
+        self.assertEqual(material.balance.available_for_purchase, 100)
+
+        StockLedgerService.apply(stock={material.pk: 85}, purchased={material.pk: 85})
+        balance = MaterialBalance.objects.get(material_bidding=material)
+        self.assertEqual((balance.purchased, balance.in_stock), (85, 85))
+        self.assertTrue(balance.near_limit)
+        self.assertFalse(balance.at_limit)
+
+        user = ProfessionalUser.objects.create_user(
+            email="r@example.com", password="p", first_name="Test", last_name="User")
+        report = Report.objects.create(
+            status="1", justification="x", professional=user, pro_accountable=user)
+        MaterialReport.objects.create(report=report, material_bidding=material, quantity=30)
+        material.refresh_from_db()
+        self.assertEqual(material.get_available_quantity(), 70)
+
+        MaterialReport.objects.filter(report=report).delete()
+        self.assertEqual(MaterialBalance.objects.get(material_bidding=material).used_in_reports, 0)
+
+    def test_material_report_move_uses_audit_snapshot(self):
+        """Trocar o material do laudo atualiza os dois saldos sem SELECT extra do item."""
+        old = self.make(self.bidding_a, "Material antigo")
+        new = self.make(self.bidding_a, "Material novo")
+        user = ProfessionalUser.objects.create_user(
+            email="r@example.com", password="p", first_name="Test", last_name="User")
+        report = Report.objects.create(
+            status="1", justification="x", professional=user, pro_accountable=user)
+        created = MaterialReport.objects.create(report=report, material_bidding=old, quantity=30)
+
+        item = MaterialReport.objects.get(pk=created.pk)
+        item.material_bidding = new
+        with CaptureQueriesContext(connection) as queries:
+            item.save()
+        self.assertFalse([
+            q["sql"] for q in queries
+            if q["sql"].startswith('SELECT "reports_materialreport"."material_bidding_id"')
+        ])
+        balances = dict(MaterialBalance.objects.values_list("material_bidding", "used_in_reports"))
+        self.assertEqual((balances[old.pk], balances[new.pk]), (0, 30))
+
+        # Sem snapshot (instância montada à mão): consulta o material anterior
+        MaterialReport(pk=created.pk, report=report, material_bidding=old, quantity=30).save()
+        balances = dict(MaterialBalance.objects.values_list("material_bidding", "used_in_reports"))
+        self.assertEqual((balances[old.pk], balances[new.pk]), (30, 0))
+
+    def test_refresh_command(self):
+        material = self.make(self.bidding_a, "Material", 100, 10)
+        MaterialBalance.objects.filter(material_bidding=material).update(purchased=0)
+
+        call_command("refresh_material_balances", "--dry-run", stdout=StringIO())
+        self.assertEqual(MaterialBalanceService.stale(), [material.pk])
+
+        call_command("refresh_material_balances", stdout=StringIO())
+        self.assertEqual(MaterialBalanceService.stale(), [])
+
+
+class KeysetPaginatorTest(StockOverviewTestBase):
+    def setUp(self):
+        super().setUp()
+        for bidding in (self.bidding_b, self.bidding_a):
+            for name in ("Cabo", "Mouse", "Teclado"):
+                self.make(bidding, f"{name} {bidding.name[-1]}")
+        self.ordering = ("bidding__name", "material__name", "id")
+        self.expected = list(
+            MaterialBidding.objects.order_by(*self.ordering).values_list("pk", flat=True))
+
+    def test_walks_forward_and_back(self):
+        paginator = KeysetPaginator(MaterialBidding.objects.all(), self.ordering, per_page=4)
+
+        first = paginator.page()
+        self.assertFalse(first.has_previous)
+        second = paginator.page(after=first.next_cursor)
+        self.assertFalse(second.has_next)
+        self.assertEqual([m.pk for m in first] + [m.pk for m in second], self.expected)
+
+        back = paginator.page(before=second.previous_cursor)
+        self.assertEqual([m.pk for m in back], [m.pk for m in first])
+        self.assertFalse(back.has_previous)
+
+    def test_invalid_cursor_returns_first_page(self):
+        paginator = KeysetPaginator(MaterialBidding.objects.all(), self.ordering, per_page=4)
+        self.assertEqual(
+            [m.pk for m in paginator.page(after="não-é-cursor")], self.expected[:4])
+
+
+class StockOverviewViewTest(StockOverviewTestBase):
+    def setUp(self):
+        super().setUp()
+        self.user = ProfessionalUser.objects.create_user(
+            email="t@example.com", password="p", first_name="Test", last_name="User")
+        self.user.first_login = False
+        self.user.save()
+        self.client.force_login(self.user)
+        self.url = reverse("fiscal:stock_overview")
+
+    def test_paginates_and_query_count_is_bounded(self):
+        materials = [self.make(self.bidding_a, f"Material {i:02}", 100, i * 20) for i in range(6)]
+        StockLedgerService.apply(stock={m.pk: 1 for m in materials})
+
+        with patch.object(StockOverviewView, "paginate_by", 4):
+            with CaptureQueriesContext(connection) as few:
+                response = self.client.get(self.url)
+            self.assertEqual(len(response.context["materials_balance"]), 4)
+            self.assertEqual(response.context["total_materials"], 6)
+            self.assertEqual(response.context["total_near_limit"], 2)  # 80% e 100%
+            self.assertEqual(response.context["total_at_limit"], 1)
+            self.assertEqual(response.context["total_stock_items"], 6)
+
+            next_url = response.context["materials_balance"].next_url
+            response = self.client.get(self.url + next_url)
+            self.assertEqual(len(response.context["materials_balance"]), 2)
+            self.assertEqual(response.context["active_tab"], "saldo")
+
+            more = [self.make(self.bidding_b, f"Outro {i:02}") for i in range(20)]
+            StockLedgerService.apply(stock={m.pk: 1 for m in more})
+            with CaptureQueriesContext(connection) as many:
+                self.client.get(self.url)
+
+        self.assertEqual(len(few), len(many))
+
+    def test_stock_at_past_date(self):
+        material = self.make(self.bidding_a, "Material")
+        StockLedgerService.apply(stock={material.pk: 5})
+        MaterialBalance.objects.update(in_stock=0)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.context["total_stock_items"], 0)
+
+        tomorrow = (date.today() + timedelta(days=1)).isoformat()
+        response = self.client.get(self.url, {"data": tomorrow})
+        self.assertEqual([item.in_stock for item in response.context["stock_items"]], [5])